@@ -1,8 +1,12 @@
 from fastapi import APIRouter
-from app.api import v1_ocr, v1_brmed, v1_validacao, v1_faq
+from app.api import v1_ocr, v1_brmed, v1_validacao, v1_faq, v1_metricas, v1_auditoria, v1_artefatos
 
 api_router = APIRouter()
 api_router.include_router(v1_ocr.router, prefix="/v1")
 api_router.include_router(v1_brmed.router, prefix="/v1")
 api_router.include_router(v1_validacao.router, prefix="/v1")
-api_router.include_router(v1_faq.router, prefix="/v1") 
\ No newline at end of file
+api_router.include_router(v1_faq.router, prefix="/v1")
+api_router.include_router(v1_metricas.router, prefix="/v1")
+api_router.include_router(v1_metricas.router_prometheus)
+api_router.include_router(v1_auditoria.router, prefix="/v1")
+api_router.include_router(v1_artefatos.router, prefix="/v1") 
\ No newline at end of file
@@ -0,0 +1,28 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from app.core.artefatos import armazem_artefatos
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/artefatos", summary="Lista artefatos (markdown do OCR, guias e dumps do RPA) por tipo e/ou chave")
+async def listar_artefatos(
+    tipo: Optional[str] = Query(None, description="ocr_markdown, brmed_guia ou brmed_debug"),
+    chave: Optional[str] = Query(None, description="CPF ou nome do arquivo"),
+    limite: int = Query(50, ge=1, le=500)
+):
+    try:
+        artefatos = await armazem_artefatos.listar(tipo=tipo, chave=chave, limite=limite)
+    except Exception as e:
+        logger.exception(f"Erro ao listar artefatos: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao listar artefatos.")
+    return {"total": len(artefatos), "artefatos": artefatos}
+
+@router.get("/artefatos/{id_artefato}", summary="Conteúdo original de um artefato", response_class=PlainTextResponse)
+async def obter_artefato(id_artefato: str):
+    conteudo = await armazem_artefatos.obter(id_artefato)
+    if conteudo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Artefato não encontrado.")
+    return conteudo
@@ -0,0 +1,28 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, status
+from app.services.auditoria_service import armazem_auditoria
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/auditoria", summary="Histórico de validações por CPF e/ou período")
+async def consultar_auditoria(
+    cpf: Optional[str] = Query(None, description="CPF apenas com dígitos"),
+    inicio: Optional[str] = Query(None, description="Data/hora inicial (ISO, ex.: 2025-07-01)"),
+    fim: Optional[str] = Query(None, description="Data/hora final (ISO, ex.: 2025-07-31T23:59:59)"),
+    limite: int = Query(50, ge=1, le=500)
+):
+    try:
+        registros = await armazem_auditoria.consultar(cpf=cpf, inicio=inicio, fim=fim, limite=limite)
+    except Exception as e:
+        logger.exception(f"Erro ao consultar auditoria: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro ao consultar auditoria.")
+    return {"total": len(registros), "registros": registros}
+
+@router.get("/auditoria/{id_registro}", summary="Registro de auditoria pelo identificador")
+async def obter_auditoria(id_registro: str):
+    registro = await armazem_auditoria.obter(id_registro)
+    if registro is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Registro de auditoria não encontrado.")
+    return registro
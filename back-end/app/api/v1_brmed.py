@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, status, UploadFile, File, Body
+from fastapi import APIRouter, HTTPException, status, UploadFile, File, Body, Header
 from fastapi.responses import StreamingResponse
-from app.services import workflow_service, brmed_service
+from app.services import workflow_service, brmed_service, prefetch_brmed
+from app.core.config import settings
+from app.core import prazo
+from typing import List, Optional
 import logging
 import json
 import asyncio
@@ -8,10 +11,17 @@ import asyncio
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _prazo_requisicao(prazo_segundos: Optional[float]) -> float:
+    """Prazo total da requisição; o cliente pode pedir um prazo menor que o configurado."""
+    if prazo_segundos and prazo_segundos > 0:
+        return min(prazo_segundos, settings.PRAZO_PROCESSAMENTO_DOCUMENTO)
+    return settings.PRAZO_PROCESSAMENTO_DOCUMENTO
+
 @router.post("/processar-documento", summary="Processar documento completo com OCR, BRMED e Validação")
 async def processar_documento_completo_api(
     arquivo: UploadFile = File(...),
-    exames_obrigatorios: str = Body(..., embed=True) # Recebe como string JSON
+    exames_obrigatorios: str = Body(..., embed=True), # Recebe como string JSON
+    prazo_segundos: Optional[float] = Header(None, alias="X-Prazo-Segundos")
 ):
     if not arquivo:
         logger.warning("Arquivo não enviado na requisição de processamento completo.")
@@ -36,6 +46,7 @@ async def processar_documento_completo_api(
         logger.error("Formato inválido para exames_obrigatorios. Esperado JSON array de strings.")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Exames obrigatórios devem ser um array JSON válido.")
 
+    prazo.iniciar(_prazo_requisicao(prazo_segundos))
     try:
         resultado = await workflow_service.processar_documento_completo(arquivo, exames_obrigatorios_list)
         logger.info(f"[REQUEST] Processamento concluído com sucesso para: {arquivo.filename}")
@@ -47,7 +58,8 @@ async def processar_documento_completo_api(
 @router.post("/processar-documento-stream", summary="Processar documento com feedback em tempo real (SSE)")
 async def processar_documento_stream_api(
     arquivo: UploadFile = File(...),
-    exames_obrigatorios: str = Body(..., embed=True)
+    exames_obrigatorios: str = Body(..., embed=True),
+    prazo_segundos: Optional[float] = Header(None, alias="X-Prazo-Segundos")
 ):
     """Endpoint com Server-Sent Events para feedback de progresso em tempo real."""
 
@@ -75,6 +87,8 @@ async def processar_documento_stream_api(
 
     async def event_generator():
         """Gerador de eventos SSE."""
+        # Definido aqui: o gerador roda na tarefa que envia a resposta
+        prazo.iniciar(_prazo_requisicao(prazo_segundos))
         try:
             # Enviar evento inicial
             yield f"data: {json.dumps({'progress': 0, 'step': 'inicio', 'message': 'Documento recebido, iniciando processamento...'})}\n\n"
@@ -134,4 +148,29 @@ async def consultar_brmed_api(cpf: str = Body(..., embed=True)):
     except Exception as e:
         logger.exception(f"Erro inesperado ao consultar BRMED para CPF {cpf}: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Erro inesperado ao consultar BRMED.")
- 
\ No newline at end of file
+ 
+@router.post("/brmed/prefetch", status_code=status.HTTP_202_ACCEPTED, summary="Pré-carregar guias BRMED de uma lista de CPFs")
+async def prefetch_brmed_api(cpfs: List[str] = Body(..., embed=True), recarregar: bool = Body(False, embed=True)):
+    """Consulta as guias em segundo plano e guarda no cache por CPF; acompanhe pelo id retornado."""
+    cpfs_validos = prefetch_brmed.normalizar_cpfs(cpfs)
+    if not cpfs_validos:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Informe ao menos um CPF.")
+    if len(cpfs_validos) > settings.BRMED_PREFETCH_MAX_CPFS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.BRMED_PREFETCH_MAX_CPFS} CPFs por pré-carga."
+        )
+    id_prefetch = prefetch_brmed.iniciar_prefetch(cpfs_validos, recarregar=recarregar)
+    logger.info(f"[REQUEST] Pré-carga BRMED {id_prefetch} iniciada para {len(cpfs_validos)} CPF(s).")
+    return prefetch_brmed.obter_prefetch(id_prefetch)
+
+@router.get("/brmed/prefetch", summary="Listar pré-cargas BRMED recentes")
+async def listar_prefetch_brmed_api():
+    return prefetch_brmed.listar_prefetches()
+
+@router.get("/brmed/prefetch/{id_prefetch}", summary="Progresso de uma pré-carga BRMED")
+async def obter_prefetch_brmed_api(id_prefetch: str):
+    estado = prefetch_brmed.obter_prefetch(id_prefetch)
+    if estado is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Pré-carga não encontrada.")
+    return estado
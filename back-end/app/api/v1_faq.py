@@ -1,9 +1,11 @@
 
 from fastapi import APIRouter, HTTPException, status, Body
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any
 from app.services import faq_service
 import logging
+import json
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -21,7 +23,7 @@ async def responder_faq(request: FAQRequest):
             detail="O campo 'pergunta' é obrigatório."
         )
     try:
-        resultado = faq_service.buscar_e_responder(request.pergunta, request.historico)
+        resultado = await faq_service.buscar_e_responder(request.pergunta, request.historico)
         return resultado
     except ConnectionError as e:
         logger.error(f"Erro de conexão no serviço de FAQ: {e}")
@@ -35,3 +37,32 @@ async def responder_faq(request: FAQRequest):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocorreu um erro inesperado ao processar sua pergunta."
         )
+
+@router.post("/faq/stream", summary="Responder perguntas do FAQ com streaming da resposta (SSE)")
+async def responder_faq_stream(request: FAQRequest):
+    """Envia os metadados da recuperação e, em seguida, os trechos da resposta conforme são gerados."""
+    if not request.pergunta:
+        logger.warning("Requisição para o FAQ (stream) sem o campo 'pergunta'.")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="O campo 'pergunta' é obrigatório."
+        )
+
+    async def event_generator():
+        """Gerador de eventos SSE."""
+        try:
+            async for evento in faq_service.buscar_e_responder_stream(request.pergunta, request.historico):
+                yield f"data: {json.dumps(evento, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.exception(f"Erro no streaming do FAQ: {e}")
+            yield f"data: {json.dumps({'tipo': 'erro', 'mensagem': 'Ocorreu um erro inesperado ao processar sua pergunta.'})}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"  # Desabilita buffering do nginx
+        }
+    )
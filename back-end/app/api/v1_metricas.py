@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core import llm, lotes, disjuntor, metricas, monitor_loop
+from app.core.cache_respostas import cache_respostas
+import logging
+
+router = APIRouter()
+# Exposto na raiz (/metrics), fora do prefixo /v1, como esperado pelo Prometheus
+router_prometheus = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/metricas/llm", summary="Percentis de latência e estatísticas de hedging das chamadas ao LLM")
+async def metricas_llm():
+    return llm.obter_metricas_llm()
+
+@router.get("/metricas/cache-llm", summary="Estatísticas do cache de respostas determinísticas do LLM")
+async def metricas_cache_llm():
+    return cache_respostas.estatisticas()
+
+@router.get("/metricas/lotes", summary="Tamanho dos lotes de embeddings e buscas FAISS agrupados")
+async def metricas_lotes():
+    return lotes.obter_metricas_lotes()
+
+@router.get("/metricas/faq-cache", summary="Cache semântico e recuperação híbrida do FAQ")
+async def metricas_faq_cache():
+    # Importação tardia: o serviço de FAQ carrega o índice FAISS ao ser importado
+    from app.services import faq_service
+    return faq_service.estatisticas_faq()
+
+@router.get("/metricas/rpa", summary="Tempo de cada etapa da automação BRMED, por modo")
+async def metricas_rpa():
+    # Importação tardia: o serviço BRMED depende do Playwright
+    from app.services import brmed_service
+    return brmed_service.obter_metricas_rpa()
+
+@router.get("/metricas/disjuntores", summary="Estado dos circuit breakers (ex: portal BRMED)")
+async def metricas_disjuntores():
+    return disjuntor.obter_metricas_disjuntores()
+
+@router.get("/metricas/loop", summary="Atraso do event loop e pilhas capturadas durante bloqueios")
+async def metricas_loop():
+    return monitor_loop.monitor_loop.estatisticas()
+
+@router_prometheus.get("/metrics", include_in_schema=False)
+async def metrics_prometheus():
+    return PlainTextResponse(metricas.exportar_texto(), media_type="text/plain; version=0.0.4; charset=utf-8")
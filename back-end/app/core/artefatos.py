@@ -0,0 +1,226 @@
+import os
+import gzip
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# zstd é opcional: sem o pacote zstandard, os artefatos são comprimidos com gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+NOME_INDICE = "indice.sqlite3"
+
+SQL_CRIAR_INDICE = """
+CREATE TABLE IF NOT EXISTS objetos (
+    hash TEXT PRIMARY KEY,
+    caminho TEXT NOT NULL,
+    tamanho INTEGER NOT NULL,
+    tamanho_original INTEGER NOT NULL,
+    criado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artefatos (
+    id TEXT PRIMARY KEY,
+    tipo TEXT NOT NULL,
+    chave TEXT,
+    hash TEXT NOT NULL,
+    criado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artefatos_tipo_chave ON artefatos (tipo, chave, criado_em);
+CREATE INDEX IF NOT EXISTS idx_artefatos_hash ON artefatos (hash);
+CREATE INDEX IF NOT EXISTS idx_artefatos_data ON artefatos (criado_em);
+"""
+
+def _comprimir(dados: bytes) -> tuple:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(dados), ".zst"
+    return gzip.compress(dados, compresslevel=6), ".gz"
+
+def _descomprimir(dados: bytes, caminho: str) -> bytes:
+    if caminho.endswith(".zst"):
+        return zstandard.ZstdDecompressor().decompress(dados)
+    return gzip.decompress(dados)
+
+class ArmazemArtefatos:
+    """
+    Armazém de artefatos endereçado por conteúdo: cada conteúdo é gravado uma única vez
+    (objetos/<hash>), comprimido, e cada gravação vira uma referência no índice SQLite
+    com tipo, chave (CPF, nome do arquivo) e data. As gravações acontecem fora do event loop.
+    """
+
+    def __init__(self, diretorio: str, retencao_dias: float, max_bytes: int, retencao_a_cada: int):
+        self.diretorio = diretorio
+        self.retencao_dias = retencao_dias
+        self.max_bytes = max_bytes
+        self.retencao_a_cada = retencao_a_cada
+        self._indice_pronto = False
+        # O SQLite aceita um escritor por vez; o lock também evita gravar o mesmo objeto duas vezes
+        self._lock_escrita = threading.Lock()
+        self._tarefas = set()
+        self.gravados = 0
+        self.deduplicados = 0
+        self.descartados_amostragem = 0
+
+    def _conectar(self) -> sqlite3.Connection:
+        os.makedirs(self.diretorio, exist_ok=True)
+        conexao = sqlite3.connect(os.path.join(self.diretorio, NOME_INDICE), timeout=30)
+        if not self._indice_pronto:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(SQL_CRIAR_INDICE)
+            self._indice_pronto = True
+        return conexao
+
+    # ─── Gravação (executada em thread) ──────────────────────────────────────
+    def _gravar(self, id_artefato: str, tipo: str, chave: Optional[str], dados: bytes, criado_em: str):
+        hash_conteudo = hashlib.sha256(dados).hexdigest()
+        with self._lock_escrita, self._conectar() as conexao:
+            existente = conexao.execute("SELECT 1 FROM objetos WHERE hash = ?", (hash_conteudo,)).fetchone()
+            if existente:
+                self.deduplicados += 1
+            else:
+                comprimido, extensao = _comprimir(dados)
+                caminho = os.path.join("objetos", hash_conteudo[:2], hash_conteudo + extensao)
+                caminho_completo = os.path.join(self.diretorio, caminho)
+                os.makedirs(os.path.dirname(caminho_completo), exist_ok=True)
+                with open(caminho_completo, "wb") as f:
+                    f.write(comprimido)
+                conexao.execute(
+                    "INSERT OR IGNORE INTO objetos (hash, caminho, tamanho, tamanho_original, criado_em) VALUES (?, ?, ?, ?, ?)",
+                    (hash_conteudo, caminho, len(comprimido), len(dados), criado_em)
+                )
+            conexao.execute(
+                "INSERT INTO artefatos (id, tipo, chave, hash, criado_em) VALUES (?, ?, ?, ?, ?)",
+                (id_artefato, tipo, chave, hash_conteudo, criado_em)
+            )
+        self.gravados += 1
+        if self.retencao_a_cada and self.gravados % self.retencao_a_cada == 0:
+            self.aplicar_retencao()
+
+    def _remover_objetos(self, conexao: sqlite3.Connection, objetos: List[tuple]) -> int:
+        for hash_conteudo, caminho in objetos:
+            try:
+                os.remove(os.path.join(self.diretorio, caminho))
+            except FileNotFoundError:
+                pass
+            conexao.execute("DELETE FROM objetos WHERE hash = ?", (hash_conteudo,))
+            conexao.execute("DELETE FROM artefatos WHERE hash = ?", (hash_conteudo,))
+        return len(objetos)
+
+    def aplicar_retencao(self) -> Dict[str, int]:
+        """Remove referências vencidas, objetos sem referência e, acima do limite de tamanho, os objetos mais antigos."""
+        limite_data = (datetime.now() - timedelta(days=self.retencao_dias)).isoformat(timespec="seconds")
+        with self._lock_escrita, self._conectar() as conexao:
+            vencidos = conexao.execute("DELETE FROM artefatos WHERE criado_em < ?", (limite_data,)).rowcount
+            orfaos = conexao.execute(
+                "SELECT hash, caminho FROM objetos WHERE hash NOT IN (SELECT DISTINCT hash FROM artefatos)"
+            ).fetchall()
+            removidos = self._remover_objetos(conexao, orfaos)
+
+            total = conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM objetos").fetchone()[0]
+            if total > self.max_bytes:
+                # Mais antigos pelo último uso (última referência criada)
+                candidatos = conexao.execute("""
+                    SELECT o.hash, o.caminho, o.tamanho FROM objetos o
+                    LEFT JOIN artefatos a ON a.hash = o.hash
+                    GROUP BY o.hash ORDER BY MAX(COALESCE(a.criado_em, o.criado_em))
+                """).fetchall()
+                excedentes = []
+                for hash_conteudo, caminho, tamanho in candidatos:
+                    if total <= self.max_bytes * 0.9:
+                        break
+                    excedentes.append((hash_conteudo, caminho))
+                    total -= tamanho
+                removidos += self._remover_objetos(conexao, excedentes)
+        if vencidos or removidos:
+            logger.info(f"[ARTEFATOS] Retenção: {vencidos} referência(s) vencida(s), {removidos} objeto(s) removido(s).")
+        return {"referencias_vencidas": vencidos, "objetos_removidos": removidos}
+
+    # ─── API assíncrona ──────────────────────────────────────────────────────
+    def salvar(self, tipo: str, conteudo: str, chave: Optional[str] = None, amostragem: float = 1.0) -> Optional[str]:
+        """
+        Agenda a gravação do artefato e retorna seu id sem esperar o disco.
+        Com amostragem < 1, só essa fração das chamadas é gravada (None quando descartada).
+        """
+        if amostragem < 1.0 and random.random() >= amostragem:
+            self.descartados_amostragem += 1
+            return None
+        id_artefato = uuid.uuid4().hex
+        criado_em = datetime.now().isoformat(timespec="seconds")
+        tarefa = asyncio.get_running_loop().create_task(
+            self._gravar_em_segundo_plano(id_artefato, tipo, chave, conteudo.encode("utf-8"), criado_em)
+        )
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+        return id_artefato
+
+    async def _gravar_em_segundo_plano(self, id_artefato: str, tipo: str, chave: Optional[str], dados: bytes, criado_em: str):
+        try:
+            await asyncio.to_thread(self._gravar, id_artefato, tipo, chave, dados, criado_em)
+        except Exception as e:
+            logger.warning(f"[ARTEFATOS] Falha ao gravar artefato '{tipo}' ({chave}): {e}")
+
+    async def descarregar(self):
+        """Aguarda as gravações em andamento (usado no desligamento e em testes)."""
+        if self._tarefas:
+            await asyncio.gather(*list(self._tarefas), return_exceptions=True)
+
+    def _listar(self, tipo: Optional[str], chave: Optional[str], limite: int) -> List[Dict[str, Any]]:
+        filtros, parametros = [], []
+        if tipo:
+            filtros.append("a.tipo = ?")
+            parametros.append(tipo)
+        if chave:
+            filtros.append("a.chave = ?")
+            parametros.append(chave)
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        with self._conectar() as conexao:
+            linhas = conexao.execute(f"""
+                SELECT a.id, a.tipo, a.chave, a.hash, a.criado_em, o.tamanho, o.tamanho_original
+                FROM artefatos a JOIN objetos o ON o.hash = a.hash
+                {where} ORDER BY a.criado_em DESC LIMIT ?
+            """, (*parametros, limite)).fetchall()
+        campos = ("id", "tipo", "chave", "hash", "criado_em", "tamanho", "tamanho_original")
+        return [dict(zip(campos, linha)) for linha in linhas]
+
+    def _obter(self, id_artefato: str) -> Optional[str]:
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT o.caminho FROM artefatos a JOIN objetos o ON o.hash = a.hash WHERE a.id = ?", (id_artefato,)
+            ).fetchone()
+        if not linha:
+            return None
+        with open(os.path.join(self.diretorio, linha[0]), "rb") as f:
+            return _descomprimir(f.read(), linha[0]).decode("utf-8")
+
+    async def listar(self, tipo: str = None, chave: str = None, limite: int = 50) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._listar, tipo, chave, limite)
+
+    async def obter(self, id_artefato: str) -> Optional[str]:
+        """Conteúdo original (descomprimido) do artefato, ou None se não existir."""
+        return await asyncio.to_thread(self._obter, id_artefato)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "gravados": self.gravados,
+            "deduplicados": self.deduplicados,
+            "descartados_amostragem": self.descartados_amostragem,
+            "compressao": "zstd" if zstandard is not None else "gzip"
+        }
+
+armazem_artefatos = ArmazemArtefatos(
+    diretorio=os.path.join(settings.BASE_DIR, settings.ARTEFATOS_DIRETORIO),
+    retencao_dias=settings.ARTEFATOS_RETENCAO_DIAS,
+    max_bytes=settings.ARTEFATOS_MAX_MB * 1024 * 1024,
+    retencao_a_cada=settings.ARTEFATOS_RETENCAO_A_CADA
+)
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core import metricas
+
+logger = logging.getLogger(__name__)
+
+REGEX_ESPACOS_FIM_DE_LINHA = re.compile(r'[ \t]+\n')
+
+def _normalizar_conteudo(conteudo: Any) -> Any:
+    """
+    Unifica quebras de linha (CRLF/CR), espaços no fim das linhas e nas pontas do texto.
+    O restante do layout (indentação, tabelas em markdown) faz parte do prompt e é mantido.
+    """
+    if isinstance(conteudo, str):
+        texto = conteudo.replace("\r\n", "\n").replace("\r", "\n")
+        return REGEX_ESPACOS_FIM_DE_LINHA.sub("\n", texto).strip()
+    if isinstance(conteudo, list):
+        return [_normalizar_conteudo(item) for item in conteudo]
+    if isinstance(conteudo, dict):
+        return {chave: _normalizar_conteudo(valor) for chave, valor in conteudo.items()}
+    return conteudo
+
+def gerar_chave(modelo: str, mensagens: list, response_format: Optional[dict], versao: str = "") -> str:
+    """Chave do cache: modelo + mensagens normalizadas + response_format + versão (salt)."""
+    payload = {
+        "versao": f"{settings.LLM_CACHE_VERSAO}:{versao}",
+        "modelo": modelo,
+        "mensagens": _normalizar_conteudo(mensagens),
+        "response_format": response_format
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class CacheRespostas:
+    """
+    Cache de respostas do LLM em dois níveis: LRU em memória e arquivos JSON em disco,
+    ambos com TTL. O disco é limitado por tamanho total, removendo os arquivos mais antigos.
+
+    Os arquivos guardam as respostas em texto puro (nomes, CPFs e exames extraídos dos
+    documentos); o nome é o hash da chave, não o prompt. O diretório é criado só para o
+    usuário do processo e com um .gitignore próprio, para ficar fora de commits e pacotes
+    mesmo quando LLM_CACHE_DIRETORIO aponta para fora de data/.
+    """
+
+    def __init__(self, diretorio: str, ttl_segundos: float, max_itens_memoria: int, max_bytes_disco: int, nome: str = "llm"):
+        self.nome = nome
+        self.diretorio = diretorio
+        self.ttl_segundos = ttl_segundos
+        self.max_itens_memoria = max_itens_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes_disco: Optional[int] = None
+        self.acertos_memoria = 0
+        self.acertos_disco = 0
+        self.falhas = 0
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f"{chave}.json")
+
+    def _expirado(self, registro: Dict[str, Any]) -> bool:
+        return time.time() - registro["criado_em"] > self.ttl_segundos
+
+    def _guardar_memoria(self, chave: str, registro: Dict[str, Any]):
+        self._memoria[chave] = registro
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.max_itens_memoria:
+            self._memoria.popitem(last=False)
+
+    def _ler_disco(self, chave: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._caminho(chave), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _arquivos(self) -> list:
+        return [e for e in os.scandir(self.diretorio) if e.is_file() and e.name.endswith(".json")]
+
+    def _preparar_diretorio(self):
+        if os.path.isdir(self.diretorio):
+            return
+        os.makedirs(self.diretorio, mode=0o700, exist_ok=True)
+        with open(os.path.join(self.diretorio, ".gitignore"), "w", encoding="utf-8") as f:
+            f.write("# Respostas do LLM com dados pessoais: não versionar nem exportar\n*\n")
+
+    def _escrever_disco(self, chave: str, registro: Dict[str, Any]):
+        self._preparar_diretorio()
+        if self._bytes_disco is None:
+            self._bytes_disco = sum(e.stat().st_size for e in self._arquivos())
+        conteudo = json.dumps(registro, ensure_ascii=False)
+        with open(self._caminho(chave), "w", encoding="utf-8") as f:
+            f.write(conteudo)
+        self._bytes_disco += len(conteudo.encode("utf-8"))
+        if self._bytes_disco > self.max_bytes_disco:
+            self._podar_disco()
+
+    def _podar_disco(self):
+        """Remove os arquivos mais antigos até voltar a 90% do limite de tamanho."""
+        arquivos = sorted(self._arquivos(), key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in arquivos)
+        for entrada in arquivos:
+            if total <= self.max_bytes_disco * 0.9:
+                break
+            total -= entrada.stat().st_size
+            try:
+                os.remove(entrada.path)
+            except FileNotFoundError:
+                pass
+        self._bytes_disco = total
+
+    async def obter(self, chave: str, ignorar_ttl: bool = False) -> Optional[Dict[str, Any]]:
+        """`ignorar_ttl` devolve também registros expirados que ainda estejam guardados."""
+        registro = self._memoria.get(chave)
+        if registro and (ignorar_ttl or not self._expirado(registro)):
+            self._memoria.move_to_end(chave)
+            self.acertos_memoria += 1
+            metricas.ACESSOS_CACHE.inc(cache=self.nome, resultado="acerto")
+            return registro["resposta"]
+        registro = await asyncio.to_thread(self._ler_disco, chave)
+        if registro and (ignorar_ttl or not self._expirado(registro)):
+            self._guardar_memoria(chave, registro)
+            self.acertos_disco += 1
+            metricas.ACESSOS_CACHE.inc(cache=self.nome, resultado="acerto")
+            return registro["resposta"]
+        self.falhas += 1
+        metricas.ACESSOS_CACHE.inc(cache=self.nome, resultado="falha")
+        return None
+
+    async def salvar(self, chave: str, resposta: Dict[str, Any]):
+        registro = {"criado_em": time.time(), "resposta": resposta}
+        self._guardar_memoria(chave, registro)
+        try:
+            await asyncio.to_thread(self._escrever_disco, chave, registro)
+        except OSError as e:
+            logger.warning(f"[CACHE-LLM] Falha ao gravar resposta em disco: {e}")
+
+    def estatisticas(self) -> Dict[str, Any]:
+        consultas = self.acertos_memoria + self.acertos_disco + self.falhas
+        return {
+            "acertos_memoria": self.acertos_memoria,
+            "acertos_disco": self.acertos_disco,
+            "falhas": self.falhas,
+            "taxa_acerto": (self.acertos_memoria + self.acertos_disco) / consultas if consultas else None,
+            "itens_memoria": len(self._memoria),
+            "bytes_disco": self._bytes_disco
+        }
+
+cache_respostas = CacheRespostas(
+    diretorio=os.path.join(settings.BASE_DIR, settings.LLM_CACHE_DIRETORIO),
+    ttl_segundos=settings.LLM_CACHE_TTL_HORAS * 3600,
+    max_itens_memoria=settings.LLM_CACHE_MAX_ITENS_MEMORIA,
+    max_bytes_disco=settings.LLM_CACHE_MAX_MB_DISCO * 1024 * 1024
+)
@@ -1,5 +1,29 @@
-from openai import AsyncOpenAI
+import httpx
+from openai import AsyncOpenAI, OpenAI
 from app.core.config import settings
 
-# Centralized OpenAI client
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+
+def _limites() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONEXOES,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE
+    )
+
+def criar_cliente_sync() -> OpenAI:
+    """Cliente síncrono com as mesmas configurações, para scripts de linha de comando."""
+    return OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        timeout=_timeout(),
+        max_retries=settings.OPENAI_MAX_RETRIES,
+        http_client=httpx.Client(limits=_limites(), timeout=_timeout())
+    )
+
+# Centralized OpenAI client (pool HTTP compartilhado por todos os serviços)
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    timeout=_timeout(),
+    max_retries=settings.OPENAI_MAX_RETRIES,
+    http_client=httpx.AsyncClient(limits=_limites(), timeout=_timeout())
+)
@@ -16,5 +16,87 @@ class Settings:
     MODELO_EMBEDDING = os.getenv("MODELO_EMBEDDING", "text-embedding-3-large")
     K_VIZINHOS_FAQ = int(os.getenv("K_VIZINHOS_FAQ", 2))
     MAX_DISTANCIA_FAQ = float(os.getenv("MAX_DISTANCIA_FAQ", 1.0))
+    # Cliente OpenAI compartilhado (pool HTTP, timeouts e limites de concorrência)
+    OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 60))
+    OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 10))
+    OPENAI_MAX_CONEXOES = int(os.getenv("OPENAI_MAX_CONEXOES", 100))
+    OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", 20))
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+    LLM_CONCORRENCIA_POR_MODELO = int(os.getenv("LLM_CONCORRENCIA_POR_MODELO", 8))
+    LLM_REQUISICOES_POR_MINUTO = int(os.getenv("LLM_REQUISICOES_POR_MINUTO", 500))
+    LLM_RAJADA_MAXIMA = int(os.getenv("LLM_RAJADA_MAXIMA", 20))
+    LLM_MAX_TENTATIVAS_RATE_LIMIT = int(os.getenv("LLM_MAX_TENTATIVAS_RATE_LIMIT", 3))
+    # Prazos e hedging das chamadas ao LLM
+    LLM_PRAZO_PADRAO = float(os.getenv("LLM_PRAZO_PADRAO", 90))
+    LLM_HEDGE_HABILITADO = os.getenv("LLM_HEDGE_HABILITADO", "true").lower() == "true"
+    LLM_HEDGE_PERCENTIL = float(os.getenv("LLM_HEDGE_PERCENTIL", 95))
+    LLM_HEDGE_FRACAO_MAXIMA = float(os.getenv("LLM_HEDGE_FRACAO_MAXIMA", 0.1))
+    LLM_HEDGE_ATRASO_PADRAO = float(os.getenv("LLM_HEDGE_ATRASO_PADRAO", 8.0))
+    LLM_HEDGE_AMOSTRAS_MINIMAS = int(os.getenv("LLM_HEDGE_AMOSTRAS_MINIMAS", 20))
+    # Cache de respostas determinísticas (temperature=0) do LLM
+    LLM_CACHE_HABILITADO = os.getenv("LLM_CACHE_HABILITADO", "true").lower() == "true"
+    LLM_CACHE_DIRETORIO = os.getenv("LLM_CACHE_DIRETORIO", "data/cache_llm")
+    LLM_CACHE_TTL_HORAS = float(os.getenv("LLM_CACHE_TTL_HORAS", 168))
+    LLM_CACHE_MAX_ITENS_MEMORIA = int(os.getenv("LLM_CACHE_MAX_ITENS_MEMORIA", 512))
+    LLM_CACHE_MAX_MB_DISCO = int(os.getenv("LLM_CACHE_MAX_MB_DISCO", 200))
+    LLM_CACHE_VERSAO = os.getenv("LLM_CACHE_VERSAO", "1")
+    # Agrupamento (micro-batching) de embeddings e buscas FAISS entre requisições concorrentes
+    LOTE_HABILITADO = os.getenv("LOTE_HABILITADO", "true").lower() == "true"
+    LOTE_JANELA_MS = float(os.getenv("LOTE_JANELA_MS", 10))
+    LOTE_MAX_EMBEDDINGS = int(os.getenv("LOTE_MAX_EMBEDDINGS", 64))
+    LOTE_MAX_BUSCAS_FAISS = int(os.getenv("LOTE_MAX_BUSCAS_FAISS", 32))
+    # Prazo total de uma requisição de processamento de documento (OCR + BRMED + validação)
+    PRAZO_PROCESSAMENTO_DOCUMENTO = float(os.getenv("PRAZO_PROCESSAMENTO_DOCUMENTO", 180))
+    # Reserva mínima para a validação: sem ela, as tentativas de CPFs alternativos param antes
+    PRAZO_RESERVA_VALIDACAO = float(os.getenv("PRAZO_RESERVA_VALIDACAO", 20))
+    # Compactação do markdown antes da extração via LLM
+    COMPACTAR_MARKDOWN = os.getenv("COMPACTAR_MARKDOWN", "true").lower() == "true"
+    MAX_TOKENS_EXTRACAO = int(os.getenv("MAX_TOKENS_EXTRACAO", 3000))
+    # Automação BRMED: "completo" (padrão) segue o fluxo original, com esperas por carga da página;
+    # "enxuto" bloqueia recursos não essenciais e troca esperas fixas por esperas por seletor;
+    # "hibrido": o navegador só faz o login; a busca e a guia são obtidas via HTTP com os cookies da sessão
+    BRMED_MODO = os.getenv("BRMED_MODO", "completo")
+    BRMED_URL_BASE = os.getenv("BRMED_URL_BASE", "https://operacoes.grupobrmed.com.br/")
+    BRMED_SESSAO_TTL_MINUTOS = float(os.getenv("BRMED_SESSAO_TTL_MINUTOS", 20))
+    BRMED_TIMEOUT_HTTP = float(os.getenv("BRMED_TIMEOUT_HTTP", 20))
+    # Cache das guias por CPF e pré-carga em lote das listas de pacientes agendados
+    BRMED_CACHE_HABILITADO = os.getenv("BRMED_CACHE_HABILITADO", "true").lower() == "true"
+    BRMED_CACHE_DIRETORIO = os.getenv("BRMED_CACHE_DIRETORIO", "data/cache_brmed")
+    BRMED_CACHE_TTL_HORAS = float(os.getenv("BRMED_CACHE_TTL_HORAS", 18))
+    BRMED_CACHE_MAX_ITENS_MEMORIA = int(os.getenv("BRMED_CACHE_MAX_ITENS_MEMORIA", 2000))
+    BRMED_CACHE_MAX_MB = int(os.getenv("BRMED_CACHE_MAX_MB", 50))
+    BRMED_PREFETCH_CONTEXTOS = int(os.getenv("BRMED_PREFETCH_CONTEXTOS", 3))
+    BRMED_PREFETCH_INTERVALO = float(os.getenv("BRMED_PREFETCH_INTERVALO", 2.0))
+    BRMED_PREFETCH_MAX_CPFS = int(os.getenv("BRMED_PREFETCH_MAX_CPFS", 500))
+    # Circuit breaker do portal BRMED: abre por taxa de falhas ou de consultas lentas na janela
+    BRMED_DISJUNTOR_HABILITADO = os.getenv("BRMED_DISJUNTOR_HABILITADO", "true").lower() == "true"
+    BRMED_DISJUNTOR_JANELA = int(os.getenv("BRMED_DISJUNTOR_JANELA", 20))
+    BRMED_DISJUNTOR_MINIMO_CHAMADAS = int(os.getenv("BRMED_DISJUNTOR_MINIMO_CHAMADAS", 5))
+    BRMED_DISJUNTOR_TAXA_FALHAS = float(os.getenv("BRMED_DISJUNTOR_TAXA_FALHAS", 0.5))
+    BRMED_DISJUNTOR_LIMITE_LENTO = float(os.getenv("BRMED_DISJUNTOR_LIMITE_LENTO", 60))
+    BRMED_DISJUNTOR_TAXA_LENTAS = float(os.getenv("BRMED_DISJUNTOR_TAXA_LENTAS", 0.8))
+    BRMED_DISJUNTOR_TEMPO_ABERTO = float(os.getenv("BRMED_DISJUNTOR_TEMPO_ABERTO", 60))
+    BRMED_RECURSOS_BLOQUEADOS = set(filter(None, os.getenv("BRMED_RECURSOS_BLOQUEADOS", "image,media,font,stylesheet").split(",")))
+    # Armazenamento de auditoria (JSONL comprimido em segmentos + índice SQLite)
+    AUDITORIA_DIRETORIO = os.getenv("AUDITORIA_DIRETORIO", "data/auditoria")
+    AUDITORIA_MAX_MB_SEGMENTO = int(os.getenv("AUDITORIA_MAX_MB_SEGMENTO", 16))
+    AUDITORIA_INTERVALO_FLUSH = float(os.getenv("AUDITORIA_INTERVALO_FLUSH", 1.0))
+    AUDITORIA_MAX_LOTE = int(os.getenv("AUDITORIA_MAX_LOTE", 200))
+    # Artefatos (markdown do OCR, dumps do RPA): comprimidos, deduplicados por hash e com retenção
+    ARTEFATOS_DIRETORIO = os.getenv("ARTEFATOS_DIRETORIO", "data/artefatos")
+    ARTEFATOS_RETENCAO_DIAS = float(os.getenv("ARTEFATOS_RETENCAO_DIAS", 30))
+    ARTEFATOS_MAX_MB = int(os.getenv("ARTEFATOS_MAX_MB", 500))
+    ARTEFATOS_AMOSTRAGEM_DEBUG = float(os.getenv("ARTEFATOS_AMOSTRAGEM_DEBUG", 0.1))
+    ARTEFATOS_RETENCAO_A_CADA = int(os.getenv("ARTEFATOS_RETENCAO_A_CADA", 100))
+    # Rastreamento por requisição: spans no formato OTLP/JSON gravados em JSONL rotativo
+    RASTREAMENTO_HABILITADO = os.getenv("RASTREAMENTO_HABILITADO", "true").lower() == "true"
+    RASTREAMENTO_ARQUIVO = os.getenv("RASTREAMENTO_ARQUIVO", "logs/spans.jsonl")
+    RASTREAMENTO_MAX_MB = int(os.getenv("RASTREAMENTO_MAX_MB", 50))
+    RASTREAMENTO_BACKUPS = int(os.getenv("RASTREAMENTO_BACKUPS", 5))
+    # Monitor do event loop: amostra o atraso de agendamento e captura a pilha de quem o bloqueia
+    MONITOR_LOOP_HABILITADO = os.getenv("MONITOR_LOOP_HABILITADO", "true").lower() == "true"
+    MONITOR_LOOP_INTERVALO = float(os.getenv("MONITOR_LOOP_INTERVALO", 0.1))
+    MONITOR_LOOP_LIMITE = float(os.getenv("MONITOR_LOOP_LIMITE", 0.25))
+    MONITOR_LOOP_MAX_CAPTURAS = int(os.getenv("MONITOR_LOOP_MAX_CAPTURAS", 20))
 
 settings = Settings() 
\ No newline at end of file
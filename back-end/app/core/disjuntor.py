@@ -0,0 +1,126 @@
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, Optional
+
+from app.core import metricas
+
+logger = logging.getLogger(__name__)
+
+RECUSAS = metricas.Contador("disjuntor_recusas_total", "Chamadas recusadas pelo circuit breaker.", ("nome",))
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+SEMI_ABERTO = "semi_aberto"
+
+class DisjuntorCircuito:
+    """
+    Circuit breaker por janela das últimas chamadas: abre quando a taxa de falhas ou de
+    chamadas lentas passa do limite, recusa chamadas enquanto aberto e, passado o tempo de
+    espera, libera uma chamada de sonda (semi-aberto) que fecha ou reabre o circuito.
+    """
+
+    def __init__(
+        self, nome: str, janela: int, minimo_chamadas: int, taxa_falhas: float,
+        limite_lento: float, taxa_lentas: float, tempo_aberto: float
+    ):
+        self.nome = nome
+        self.minimo_chamadas = minimo_chamadas
+        self.taxa_falhas = taxa_falhas
+        self.limite_lento = limite_lento
+        self.taxa_lentas = taxa_lentas
+        self.tempo_aberto = tempo_aberto
+        # (sucesso, latência em s ou None quando não deve contar como lenta)
+        self.resultados: deque = deque(maxlen=janela)
+        self._estado = FECHADO
+        self._aberto_em = 0.0
+        self._sonda_em_andamento = False
+        self.aberturas = 0
+        self.recusadas = 0
+        self.motivo: Optional[str] = None
+
+    @property
+    def estado(self) -> str:
+        if self._estado == ABERTO and time.monotonic() - self._aberto_em >= self.tempo_aberto:
+            self._estado = SEMI_ABERTO
+            self._sonda_em_andamento = False
+            logger.info(f"[DISJUNTOR] {self.nome}: semi-aberto, liberando chamada de sonda.")
+        return self._estado
+
+    def permitir(self) -> bool:
+        """True se a chamada pode seguir; no semi-aberto, apenas uma sonda por vez."""
+        estado = self.estado
+        if estado == FECHADO:
+            return True
+        if estado == SEMI_ABERTO and not self._sonda_em_andamento:
+            self._sonda_em_andamento = True
+            return True
+        self.recusadas += 1
+        RECUSAS.inc(nome=self.nome)
+        return False
+
+    def liberar_sonda(self):
+        """Desiste de uma chamada sem registrar resultado (ex: cancelada pelo chamador)."""
+        self._sonda_em_andamento = False
+
+    def registrar(self, sucesso: bool, latencia: Optional[float] = None):
+        lenta = latencia is not None and latencia > self.limite_lento
+        if self._estado == SEMI_ABERTO:
+            self._sonda_em_andamento = False
+            if sucesso and not lenta:
+                self.resultados.clear()
+                self._estado, self.motivo = FECHADO, None
+                logger.info(f"[DISJUNTOR] {self.nome}: sonda bem-sucedida, circuito fechado.")
+            else:
+                self._abrir("sonda falhou" if not sucesso else f"sonda lenta ({latencia:.1f}s)")
+            return
+        self.resultados.append((sucesso, latencia))
+        if self._estado != FECHADO or len(self.resultados) < self.minimo_chamadas:
+            return
+        total = len(self.resultados)
+        falhas = sum(1 for ok, _ in self.resultados if not ok)
+        lentas = sum(1 for _, lat in self.resultados if lat is not None and lat > self.limite_lento)
+        if falhas / total >= self.taxa_falhas:
+            self._abrir(f"{falhas}/{total} falhas")
+        elif lentas / total >= self.taxa_lentas:
+            self._abrir(f"{lentas}/{total} chamadas acima de {self.limite_lento:.0f}s")
+
+    def _abrir(self, motivo: str):
+        self._estado, self.motivo = ABERTO, motivo
+        self._aberto_em = time.monotonic()
+        self.aberturas += 1
+        logger.warning(f"[DISJUNTOR] {self.nome}: circuito aberto por {self.tempo_aberto:.0f}s ({motivo}).")
+
+    def segundos_para_sonda(self) -> float:
+        if self.estado != ABERTO:
+            return 0.0
+        return max(self.tempo_aberto - (time.monotonic() - self._aberto_em), 0.0)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        total = len(self.resultados)
+        return {
+            "estado": self.estado,
+            "motivo": self.motivo,
+            "segundos_para_sonda": round(self.segundos_para_sonda(), 1),
+            "chamadas_na_janela": total,
+            "taxa_falhas": sum(1 for ok, _ in self.resultados if not ok) / total if total else None,
+            "taxa_lentas": sum(1 for _, lat in self.resultados if lat is not None and lat > self.limite_lento) / total if total else None,
+            "aberturas": self.aberturas,
+            "recusadas": self.recusadas
+        }
+
+_disjuntores: Dict[str, DisjuntorCircuito] = {}
+
+def obter_disjuntor(nome: str, **config) -> DisjuntorCircuito:
+    if nome not in _disjuntores:
+        _disjuntores[nome] = DisjuntorCircuito(nome, **config)
+    return _disjuntores[nome]
+
+def obter_metricas_disjuntores() -> Dict[str, Any]:
+    return {nome: disjuntor.estatisticas() for nome, disjuntor in _disjuntores.items()}
+
+CODIGOS_ESTADO = {FECHADO: 0, SEMI_ABERTO: 1, ABERTO: 2}
+metricas.Medidor(
+    "disjuntor_estado", "Estado do circuit breaker (0 = fechado, 1 = semi-aberto, 2 = aberto).", ("nome",),
+    funcao=lambda: {(nome,): CODIGOS_ESTADO[d.estado] for nome, d in _disjuntores.items()}
+)
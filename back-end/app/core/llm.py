@@ -0,0 +1,367 @@
+import re
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, Optional
+
+import openai
+
+from openai.types.chat import ChatCompletion
+
+from app.core.clients import client
+from app.core.config import settings
+from app.core import prazo as prazo_requisicao
+from app.core import metricas, rastreamento
+from app.core.cache_respostas import cache_respostas, gerar_chave
+
+logger = logging.getLogger(__name__)
+
+# Abaixo desta quantidade de requisições/tokens restantes, o limitador espera o reset informado pela API
+LIMIAR_REQUISICOES_RESTANTES = 2
+LIMIAR_TOKENS_RESTANTES = 2000
+ESPERA_PADRAO_RATE_LIMIT = 5.0  # segundos, quando a API não informa o Retry-After
+
+REGEX_DURACAO = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+FATORES_DURACAO = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def _converter_duracao(valor: Optional[str]) -> Optional[float]:
+    """Converte durações no formato dos headers da OpenAI ('1s', '6m0s', '20ms') para segundos."""
+    if not valor:
+        return None
+    try:
+        return float(valor)
+    except ValueError:
+        pass
+    partes = REGEX_DURACAO.findall(valor)
+    if not partes:
+        return None
+    return sum(float(numero) * FATORES_DURACAO[unidade] for numero, unidade in partes)
+
+class LimitadorTaxa:
+    """
+    Token bucket por modelo. Reabastece continuamente até a rajada máxima e pode
+    ser pausado quando a API sinaliza limite (429 ou headers x-ratelimit-*).
+    """
+
+    def __init__(self, requisicoes_por_minuto: int, rajada_maxima: int):
+        self.taxa = requisicoes_por_minuto / 60.0
+        self.capacidade = max(1, rajada_maxima)
+        self.tokens = float(self.capacidade)
+        self.ultima_recarga = time.monotonic()
+        self.pausado_ate = 0.0
+        self._lock = asyncio.Lock()
+
+    def _recarregar(self):
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.ultima_recarga) * self.taxa)
+        self.ultima_recarga = agora
+
+    async def adquirir(self):
+        async with self._lock:
+            while True:
+                agora = time.monotonic()
+                if agora < self.pausado_ate:
+                    await asyncio.sleep(self.pausado_ate - agora)
+                    continue
+                self._recarregar()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.taxa)
+
+    def pausar(self, segundos: float):
+        self.pausado_ate = max(self.pausado_ate, time.monotonic() + segundos)
+        self.tokens = 0
+
+    def atualizar_por_headers(self, headers):
+        """Pausa o bucket quando os headers indicam que a cota está quase esgotada."""
+        if not headers:
+            return
+        for recurso, limiar in (("requests", LIMIAR_REQUISICOES_RESTANTES), ("tokens", LIMIAR_TOKENS_RESTANTES)):
+            restantes = headers.get(f"x-ratelimit-remaining-{recurso}")
+            reset = _converter_duracao(headers.get(f"x-ratelimit-reset-{recurso}"))
+            if restantes is None or reset is None:
+                continue
+            try:
+                if int(restantes) <= limiar:
+                    logger.warning(f"[LLM] Cota de {recurso} quase esgotada ({restantes}); aguardando {reset:.2f}s.")
+                    self.pausar(reset)
+            except ValueError:
+                continue
+
+_semaforos: Dict[str, asyncio.Semaphore] = {}
+_limitadores: Dict[str, LimitadorTaxa] = {}
+
+def _semaforo(modelo: str) -> asyncio.Semaphore:
+    if modelo not in _semaforos:
+        _semaforos[modelo] = asyncio.Semaphore(settings.LLM_CONCORRENCIA_POR_MODELO)
+    return _semaforos[modelo]
+
+def _limitador(modelo: str) -> LimitadorTaxa:
+    if modelo not in _limitadores:
+        _limitadores[modelo] = LimitadorTaxa(settings.LLM_REQUISICOES_POR_MINUTO, settings.LLM_RAJADA_MAXIMA)
+    return _limitadores[modelo]
+
+def _tempo_retry_after(erro: openai.RateLimitError) -> float:
+    headers = getattr(getattr(erro, "response", None), "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        return _converter_duracao(headers["retry-after-ms"] + "ms") or ESPERA_PADRAO_RATE_LIMIT
+    return _converter_duracao(headers.get("retry-after")) or ESPERA_PADRAO_RATE_LIMIT
+
+async def _executar(modelo: str, chamada, **kwargs) -> Any:
+    """Executa a chamada respeitando o semáforo e o limitador do modelo, reagindo a 429."""
+    limitador = _limitador(modelo)
+    for tentativa in range(1, settings.LLM_MAX_TENTATIVAS_RATE_LIMIT + 1):
+        async with _semaforo(modelo):
+            await limitador.adquirir()
+            try:
+                resposta_bruta = await chamada(**kwargs)
+            except openai.RateLimitError as e:
+                espera = _tempo_retry_after(e)
+                limitador.pausar(espera)
+                metricas.TENTATIVAS_LLM.inc(modelo=modelo, motivo="rate_limit")
+                logger.warning(f"[LLM] Rate limit (429) no modelo {modelo}, tentativa {tentativa}; pausando {espera:.2f}s.")
+                # Sem nova tentativa se a pausa já passa do prazo restante da requisição
+                if tentativa == settings.LLM_MAX_TENTATIVAS_RATE_LIMIT or prazo_requisicao.limitar(espera) < espera:
+                    raise
+                continue
+        limitador.atualizar_por_headers(resposta_bruta.headers)
+        return resposta_bruta.parse()
+
+# ─── Prazos e hedging ─────────────────────────────────────────────────────────
+JANELA_LATENCIAS = 1000  # amostras mantidas por operação para os percentis
+
+class EstatisticasOperacao:
+    """Latências e contadores de hedging de um tipo de chamada (ex: 'extrair_documento')."""
+
+    def __init__(self):
+        # Latência de cada tentativa primária, como seria sem hedging
+        self.latencias_primarias = deque(maxlen=JANELA_LATENCIAS)
+        # Latência percebida pelo chamador (primeira tentativa bem-sucedida)
+        self.latencias_efetivas = deque(maxlen=JANELA_LATENCIAS)
+        self.requisicoes = 0
+        self.hedges_disparados = 0
+        self.hedges_vencedores = 0
+        self.prazos_estourados = 0
+
+_estatisticas: Dict[str, EstatisticasOperacao] = {}
+
+def _estatisticas_operacao(operacao: str) -> EstatisticasOperacao:
+    if operacao not in _estatisticas:
+        _estatisticas[operacao] = EstatisticasOperacao()
+    return _estatisticas[operacao]
+
+def percentil(amostras, p: float) -> Optional[float]:
+    """Percentil p (0-100) das amostras, por vizinho mais próximo."""
+    if not amostras:
+        return None
+    ordenadas = sorted(amostras)
+    indice = min(len(ordenadas) - 1, max(0, math.ceil(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+def _resumo_percentis(amostras) -> Dict[str, Optional[float]]:
+    return {f"p{p}": percentil(amostras, p) for p in (50, 95, 99)}
+
+def obter_metricas_llm() -> Dict[str, Any]:
+    """Percentis de latência (com e sem hedging) e contadores de hedge por operação."""
+    return {
+        operacao: {
+            "requisicoes": stats.requisicoes,
+            "hedges_disparados": stats.hedges_disparados,
+            "hedges_vencedores": stats.hedges_vencedores,
+            "prazos_estourados": stats.prazos_estourados,
+            "latencia_sem_hedge": _resumo_percentis(stats.latencias_primarias),
+            "latencia_com_hedge": _resumo_percentis(stats.latencias_efetivas)
+        }
+        for operacao, stats in _estatisticas.items()
+    }
+
+def _atraso_hedge(stats: EstatisticasOperacao) -> float:
+    """Espera antes de disparar a duplicata: o percentil configurado das latências observadas."""
+    if len(stats.latencias_primarias) >= settings.LLM_HEDGE_AMOSTRAS_MINIMAS:
+        return percentil(stats.latencias_primarias, settings.LLM_HEDGE_PERCENTIL)
+    return settings.LLM_HEDGE_ATRASO_PADRAO
+
+def _pode_disparar_hedge(stats: EstatisticasOperacao) -> bool:
+    return stats.hedges_disparados < settings.LLM_HEDGE_FRACAO_MAXIMA * stats.requisicoes
+
+def _registrar_metricas(operacao: str, kwargs: Dict[str, Any], resposta: Any, duracao: float):
+    tipo = "embedding" if "input" in kwargs else "chat"
+    metricas.DURACAO_LLM.observar(duracao, tipo=tipo, operacao=operacao)
+    uso = getattr(resposta, "usage", None)
+    if uso is not None:
+        tokens_prompt = getattr(uso, "prompt_tokens", 0) or 0
+        tokens_completion = getattr(uso, "completion_tokens", 0) or 0
+        metricas.TOKENS_LLM.inc(tokens_prompt, operacao=operacao, tipo="prompt")
+        metricas.TOKENS_LLM.inc(tokens_completion, operacao=operacao, tipo="completion")
+        rastreamento.span_atual().definir(tokens_prompt=tokens_prompt, tokens_completion=tokens_completion)
+
+async def _executar_com_prazo(modelo: str, operacao: str, chamada, prazo: Optional[float], hedge: bool, **kwargs) -> Any:
+    """
+    Executa a chamada dentro do prazo. Com hedge, se a tentativa primária passar do
+    percentil configurado, dispara uma duplicata e usa a que terminar primeiro.
+    """
+    stats = _estatisticas_operacao(operacao)
+    stats.requisicoes += 1
+    inicio = time.monotonic()
+    # Nunca além do prazo restante da requisição em andamento (se houver)
+    prazo = prazo_requisicao.limitar(prazo or settings.LLM_PRAZO_PADRAO)
+    limite = inicio + prazo
+
+    def nova_tentativa() -> asyncio.Task:
+        # O timeout do SDK acompanha o prazo restante da requisição
+        restante = max(limite - time.monotonic(), 0.001)
+        return asyncio.ensure_future(_executar(modelo, chamada, **{**kwargs, "timeout": restante}))
+
+    def registrar_primaria(tarefa: asyncio.Task):
+        if not tarefa.cancelled() and tarefa.exception() is None:
+            stats.latencias_primarias.append(time.monotonic() - inicio)
+
+    def consumir_excecao(tarefa: asyncio.Task):
+        if not tarefa.cancelled():
+            tarefa.exception()
+
+    primaria = nova_tentativa()
+    primaria.add_done_callback(registrar_primaria)
+    pendentes = {primaria}
+    ultimo_erro: Optional[BaseException] = None
+    try:
+        if hedge and settings.LLM_HEDGE_HABILITADO:
+            espera = min(_atraso_hedge(stats), max(limite - time.monotonic(), 0))
+            concluidas, _ = await asyncio.wait(pendentes, timeout=espera)
+            if not concluidas and _pode_disparar_hedge(stats) and time.monotonic() < limite:
+                stats.hedges_disparados += 1
+                metricas.TENTATIVAS_LLM.inc(modelo=modelo, motivo="hedge")
+                rastreamento.span_atual().definir(hedge=True)
+                logger.info(f"[LLM] Disparando hedge para '{operacao}' após {espera:.2f}s.")
+                duplicata = nova_tentativa()
+                duplicata.add_done_callback(consumir_excecao)
+                pendentes.add(duplicata)
+
+        while pendentes:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            concluidas, pendentes = await asyncio.wait(pendentes, timeout=restante, return_when=asyncio.FIRST_COMPLETED)
+            for tarefa in concluidas:
+                if tarefa.exception() is None:
+                    if tarefa is not primaria:
+                        stats.hedges_vencedores += 1
+                    stats.latencias_efetivas.append(time.monotonic() - inicio)
+                    # Em streaming, duração e tokens só são conhecidos ao fim da leitura (_StreamMedido)
+                    if not kwargs.get("stream"):
+                        _registrar_metricas(operacao, kwargs, tarefa.result(), time.monotonic() - inicio)
+                    # A tentativa perdedora continua em segundo plano: sua latência alimenta a
+                    # distribuição "sem hedge" e a requisição já está paga de qualquer forma.
+                    return tarefa.result()
+                ultimo_erro = tarefa.exception()
+        if ultimo_erro is not None and not pendentes:
+            metricas.ERROS.inc(componente="llm", tipo=type(ultimo_erro).__name__)
+            raise ultimo_erro
+    except asyncio.CancelledError:
+        for tarefa in pendentes:
+            tarefa.cancel()
+        raise
+
+    for tarefa in pendentes:
+        tarefa.cancel()
+    stats.prazos_estourados += 1
+    metricas.ERROS.inc(componente="llm", tipo="prazo_esgotado")
+    raise asyncio.TimeoutError(f"Prazo de {prazo:.1f}s esgotado para '{operacao}'.")
+
+def _cacheavel(kwargs: Dict[str, Any]) -> bool:
+    """Só respostas determinísticas (temperature=0, sem streaming) podem ser reaproveitadas."""
+    return settings.LLM_CACHE_HABILITADO and kwargs.get("temperature", 1) == 0 and not kwargs.get("stream")
+
+class _StreamMedido:
+    """
+    Envolve o stream do SDK para que o span e as métricas cubram a leitura inteira:
+    a duração vai da criação da chamada até o último trecho e os tokens vêm do trecho
+    final de uso (stream_options={"include_usage": True}).
+    """
+
+    def __init__(self, stream, operacao: str, kwargs: Dict[str, Any], inicio: float, inicio_ns: int):
+        self._stream = stream
+        self.operacao = operacao
+        self.kwargs = kwargs
+        self.inicio = inicio
+        self.inicio_ns = inicio_ns
+
+    def __aiter__(self):
+        return self._iterar()
+
+    async def _iterar(self):
+        uso, erro = None, None
+        try:
+            async for chunk in self._stream:
+                uso = getattr(chunk, "usage", None) or uso
+                yield chunk
+        except BaseException as e:
+            erro = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            # O span é registrado já medido: o gerador pode ser encerrado fora do contexto que o criou
+            _registrar_stream(self.operacao, self.kwargs, uso, time.monotonic() - self.inicio, self.inicio_ns, erro)
+
+def _registrar_stream(operacao: str, kwargs: Dict[str, Any], uso: Any, duracao: float, inicio_ns: int, erro: Optional[str]):
+    metricas.DURACAO_LLM.observar(duracao, tipo="chat", operacao=operacao)
+    tokens = {}
+    if uso is not None:
+        tokens = {"tokens_prompt": getattr(uso, "prompt_tokens", 0) or 0, "tokens_completion": getattr(uso, "completion_tokens", 0) or 0}
+        metricas.TOKENS_LLM.inc(tokens["tokens_prompt"], operacao=operacao, tipo="prompt")
+        metricas.TOKENS_LLM.inc(tokens["tokens_completion"], operacao=operacao, tipo="completion")
+    rastreamento.registrar_span(
+        f"llm.{operacao}", inicio_ns, time.time_ns(), erro=erro, modelo=kwargs["model"], stream=True, **tokens
+    )
+
+async def chat_completion(
+    operacao: str = "chat",
+    prazo: Optional[float] = None,
+    hedge: bool = False,
+    versao_prompt: str = "",
+    **kwargs
+) -> Any:
+    """
+    Chat completion assíncrono pelo cliente compartilhado (demais argumentos iguais aos do SDK).
+    `prazo` limita a duração total em segundos e `hedge` habilita a requisição duplicada.
+    Chamadas com temperature=0 passam pelo cache de respostas; `versao_prompt` entra na
+    chave para invalidar as entradas quando o prompt muda. Com stream=True, devolve um
+    iterável assíncrono cujo span e métricas só fecham quando a leitura termina.
+    """
+    if kwargs.get("stream"):
+        inicio, inicio_ns = time.monotonic(), time.time_ns()
+        try:
+            stream = await _executar_com_prazo(
+                kwargs["model"], operacao, client.chat.completions.with_raw_response.create, prazo, hedge, **kwargs
+            )
+        except BaseException as e:
+            _registrar_stream(operacao, kwargs, None, time.monotonic() - inicio, inicio_ns, f"{type(e).__name__}: {e}")
+            raise
+        return _StreamMedido(stream, operacao, kwargs, inicio, inicio_ns)
+
+    with rastreamento.span(f"llm.{operacao}", modelo=kwargs["model"]) as span:
+        chave = None
+        if _cacheavel(kwargs):
+            chave = gerar_chave(kwargs["model"], kwargs.get("messages", []), kwargs.get("response_format"), f"{operacao}:{versao_prompt}")
+            em_cache = await cache_respostas.obter(chave)
+            span.definir(cache_acerto=em_cache is not None)
+            if em_cache is not None:
+                logger.info(f"[LLM] Resposta de '{operacao}' reaproveitada do cache.")
+                return ChatCompletion.model_validate(em_cache)
+
+        resposta = await _executar_com_prazo(
+            kwargs["model"], operacao, client.chat.completions.with_raw_response.create, prazo, hedge, **kwargs
+        )
+        if chave is not None:
+            await cache_respostas.salvar(chave, resposta.model_dump(mode="json"))
+        return resposta
+
+async def criar_embeddings(operacao: str = "embeddings", prazo: Optional[float] = None, **kwargs) -> Any:
+    """Embeddings assíncronos pelo cliente compartilhado (demais argumentos iguais aos do SDK)."""
+    entradas = kwargs.get("input")
+    with rastreamento.span(f"llm.{operacao}", modelo=kwargs["model"], textos=len(entradas) if isinstance(entradas, list) else 1):
+        return await _executar_com_prazo(
+            kwargs["model"], operacao, client.embeddings.with_raw_response.create, prazo, False, **kwargs
+        )
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core import llm, metricas, prazo, rastreamento
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class AgrupadorLotes:
+    """
+    Junta itens enviados por corrotinas concorrentes durante uma janela curta (ou até o
+    tamanho máximo do lote), processa todos de uma vez e devolve a cada uma o seu resultado.
+    O lote roda num contexto próprio, com o maior prazo restante entre as requisições que o
+    aguardam; cada requisição espera o resultado só até o seu próprio prazo.
+    """
+
+    def __init__(self, nome: str, processar: Callable[[List[Any]], Awaitable[List[Any]]], janela_segundos: float, max_lote: int):
+        self.nome = nome
+        self.processar = processar
+        self.janela_segundos = janela_segundos
+        self.max_lote = max_lote
+        self.pendentes: List[Tuple[Any, asyncio.Future, Optional[prazo.Orcamento]]] = []
+        self._temporizador = None
+        self._tarefas = set()
+        self.lotes = 0
+        self.itens = 0
+        self.maior_lote = 0
+
+    async def enviar(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self.pendentes.append((item, futuro, prazo.atual()))
+        if len(self.pendentes) >= self.max_lote:
+            self._disparar()
+        elif self._temporizador is None:
+            self._temporizador = loop.call_later(self.janela_segundos, self._disparar)
+        # O futuro cancelado pelo timeout é ignorado pelo lote
+        return await asyncio.wait_for(futuro, prazo.limitar(None))
+
+    def _disparar(self):
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+        lote, self.pendentes = self.pendentes, []
+        if not lote:
+            return
+        # Contexto vazio: o lote não herda o prazo nem o trace de quem o abriu ou completou
+        tarefa = contextvars.Context().run(asyncio.get_running_loop().create_task, self._processar_lote(lote))
+        # Mantém referência até o fim para a tarefa não ser coletada
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+
+    async def _processar_lote(self, lote: List[Tuple[Any, asyncio.Future, Optional[prazo.Orcamento]]]):
+        self.lotes += 1
+        self.itens += len(lote)
+        self.maior_lote = max(self.maior_lote, len(lote))
+        orcamentos = [orcamento for _, _, orcamento in lote]
+        if orcamentos and all(orcamento is not None for orcamento in orcamentos):
+            prazo.iniciar(max(orcamento.restante() for orcamento in orcamentos))
+        try:
+            with rastreamento.span(f"lote.{self.nome}", itens=len(lote)):
+                resultados = await self.processar([item for item, _, _ in lote])
+        except Exception as e:
+            for _, futuro, _ in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+        for (_, futuro, _), resultado in zip(lote, resultados):
+            if not futuro.done():
+                futuro.set_result(resultado)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "lotes": self.lotes,
+            "itens": self.itens,
+            "media_por_lote": self.itens / self.lotes if self.lotes else None,
+            "maior_lote": self.maior_lote
+        }
+
+# ─── Embeddings ───────────────────────────────────────────────────────────────
+def _processador_embeddings(modelo: str):
+    async def processar(textos: List[str]) -> List[np.ndarray]:
+        # Textos repetidos no mesmo lote são enviados uma única vez
+        unicos = list(dict.fromkeys(textos))
+        resp = await llm.criar_embeddings(operacao="embeddings_lote", input=unicos, model=modelo)
+        vetores = {
+            unicos[dado.index]: np.array(dado.embedding, dtype="float32").reshape(1, -1)
+            for dado in resp.data
+        }
+        return [vetores[texto] for texto in textos]
+    return processar
+
+_agrupadores_embeddings: Dict[str, AgrupadorLotes] = {}
+
+async def gerar_embedding(texto: str, modelo: str, operacao: str = "embeddings") -> np.ndarray:
+    """Embedding de um texto (shape 1 x d), agrupado com as demais requisições da janela."""
+    if not settings.LOTE_HABILITADO:
+        resp = await llm.criar_embeddings(operacao=operacao, input=[texto], model=modelo)
+        return np.array(resp.data[0].embedding, dtype="float32").reshape(1, -1)
+    agrupador = _agrupadores_embeddings.get(modelo)
+    if agrupador is None:
+        agrupador = _agrupadores_embeddings[modelo] = AgrupadorLotes(
+            f"embeddings:{modelo}", _processador_embeddings(modelo),
+            settings.LOTE_JANELA_MS / 1000, settings.LOTE_MAX_EMBEDDINGS
+        )
+    return await agrupador.enviar(texto)
+
+# ─── Buscas FAISS ─────────────────────────────────────────────────────────────
+def _buscar_cronometrado(index: Any, matriz: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    with metricas.DURACAO_FAISS.cronometrar():
+        return index.search(matriz, k)
+
+async def _processar_buscas(consultas: List[Tuple[Any, np.ndarray, int]]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Uma busca FAISS por índice com todas as consultas do lote empilhadas."""
+    por_indice: Dict[int, List[int]] = {}
+    for posicao, (index, _, _) in enumerate(consultas):
+        por_indice.setdefault(id(index), []).append(posicao)
+
+    resultados = [None] * len(consultas)
+    for posicoes in por_indice.values():
+        index = consultas[posicoes[0]][0]
+        k = max(consultas[p][2] for p in posicoes)
+        matriz = np.vstack([consultas[p][1] for p in posicoes])
+        # A busca é CPU-bound: roda fora do event loop
+        D, I = await asyncio.to_thread(_buscar_cronometrado, index, matriz, k)
+        for linha, p in enumerate(posicoes):
+            k_consulta = consultas[p][2]
+            resultados[p] = (D[linha:linha + 1, :k_consulta], I[linha:linha + 1, :k_consulta])
+    return resultados
+
+_agrupador_faiss = None
+
+async def buscar_faiss(index: Any, vetor: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """index.search para um vetor (1 x d), agrupado com as demais buscas da janela."""
+    global _agrupador_faiss
+    if not settings.LOTE_HABILITADO:
+        return await asyncio.to_thread(_buscar_cronometrado, index, vetor, k)
+    if _agrupador_faiss is None:
+        _agrupador_faiss = AgrupadorLotes(
+            "faiss", _processar_buscas, settings.LOTE_JANELA_MS / 1000, settings.LOTE_MAX_BUSCAS_FAISS
+        )
+    return await _agrupador_faiss.enviar((index, vetor, k))
+
+def _agrupadores() -> List[AgrupadorLotes]:
+    return list(_agrupadores_embeddings.values()) + ([_agrupador_faiss] if _agrupador_faiss else [])
+
+def obter_metricas_lotes() -> Dict[str, Any]:
+    return {agrupador.nome: agrupador.estatisticas() for agrupador in _agrupadores()}
+
+metricas.Medidor(
+    "lotes_itens_pendentes", "Itens aguardando o próximo lote, por agrupador.", ("agrupador",),
+    funcao=lambda: {(agrupador.nome,): len(agrupador.pendentes) for agrupador in _agrupadores()}
+)
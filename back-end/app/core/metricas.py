@@ -0,0 +1,207 @@
+import math
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Métricas no formato de exposição do Prometheus (texto), sem dependências externas.
+# Cada registro é um incremento ou uma busca binária sob um lock, barato o suficiente
+# para ficar sempre ligado; o texto só é montado quando /metrics é consultado.
+
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BUCKETS_RAPIDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+_registro: List["_Metrica"] = []
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _formatar_rotulos(nomes: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+def _formatar_numero(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, descricao: str, rotulos: Iterable[str] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def _chave(self, rotulos: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(rotulos.get(nome, "")) for nome in self.rotulos)
+
+    def _amostras(self) -> List[str]:
+        raise NotImplementedError
+
+    def exportar(self) -> str:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} {self.tipo}"]
+        return "\n".join(linhas + self._amostras())
+
+class Contador(_Metrica):
+    """Valor que só cresce (requisições, acertos de cache, tokens, erros)."""
+    tipo = "counter"
+
+    def __init__(self, nome: str, descricao: str, rotulos: Iterable[str] = ()):
+        super().__init__(nome, descricao, rotulos)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos) -> float:
+        return self._valores.get(self._chave(rotulos), 0)
+
+    def _amostras(self) -> List[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(v)}" for chave, v in itens]
+
+class Medidor(_Metrica):
+    """
+    Valor instantâneo (gauge). Com `funcao`, o valor é lido apenas na exportação; ela retorna
+    um número ou um dict {tupla de rótulos: número}.
+    """
+    tipo = "gauge"
+
+    def __init__(self, nome: str, descricao: str, rotulos: Iterable[str] = (), funcao: Optional[Callable] = None):
+        super().__init__(nome, descricao, rotulos)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self.funcao = funcao
+
+    def definir(self, valor: float, **rotulos):
+        with self._lock:
+            self._valores[self._chave(rotulos)] = valor
+
+    def inc(self, valor: float = 1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def dec(self, valor: float = 1, **rotulos):
+        self.inc(-valor, **rotulos)
+
+    def valor(self, **rotulos) -> float:
+        return self._valores.get(self._chave(rotulos), 0)
+
+    def _amostras(self) -> List[str]:
+        if self.funcao is not None:
+            try:
+                lido = self.funcao()
+            except Exception:
+                return []
+            itens = lido.items() if isinstance(lido, dict) else [((), lido)]
+        else:
+            with self._lock:
+                itens = list(self._valores.items())
+        return [
+            f"{self.nome}{_formatar_rotulos(self.rotulos, tuple(map(str, chave)))} {_formatar_numero(v)}"
+            for chave, v in itens if v is not None
+        ]
+
+class Histograma(_Metrica):
+    """Distribuição de durações (ou tamanhos) em buckets cumulativos, com soma e contagem."""
+    tipo = "histogram"
+
+    def __init__(self, nome: str, descricao: str, rotulos: Iterable[str] = (), buckets: Iterable[float] = BUCKETS_PADRAO):
+        super().__init__(nome, descricao, rotulos)
+        self.buckets = tuple(sorted(buckets))
+        # chave -> [contagens por bucket (não cumulativas, +Inf no fim), soma]
+        self._valores: Dict[Tuple[str, ...], list] = {}
+
+    def observar(self, valor: float, **rotulos):
+        chave = self._chave(rotulos)
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._valores.get(chave)
+            if serie is None:
+                serie = self._valores[chave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+
+    @contextmanager
+    def cronometrar(self, **rotulos):
+        """Observa a duração do bloco em segundos (também quando ele lança exceção)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def contagem(self, **rotulos) -> int:
+        serie = self._valores.get(self._chave(rotulos))
+        return sum(serie[0]) if serie else 0
+
+    def _amostras(self) -> List[str]:
+        with self._lock:
+            itens = [(chave, list(serie[0]), serie[1]) for chave, serie in self._valores.items()]
+        linhas = []
+        for chave, contagens, soma in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (math.inf,), contagens):
+                acumulado += contagem
+                le = f'le="{_formatar_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, le)} {acumulado}")
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{rotulos} {acumulado}")
+        return linhas
+
+def exportar_texto() -> str:
+    """Todas as métricas registradas, no formato de texto 0.0.4 do Prometheus."""
+    return "\n".join(metrica.exportar() for metrica in _registro) + "\n"
+
+# ─── Métricas da aplicação ────────────────────────────────────────────────────
+DURACAO_DOCLING = Histograma(
+    "ocr_docling_duracao_segundos", "Duração da conversão do documento pelo Docling."
+)
+DURACAO_LLM = Histograma(
+    "llm_chamada_duracao_segundos", "Duração das chamadas ao LLM e de embeddings, por tipo e operação.",
+    ("tipo", "operacao")
+)
+DURACAO_FAISS = Histograma(
+    "faiss_busca_duracao_segundos", "Duração de cada busca FAISS (um lote de consultas por índice).",
+    buckets=BUCKETS_RAPIDOS
+)
+DURACAO_BRMED_ETAPA = Histograma(
+    "brmed_etapa_duracao_segundos", "Duração de cada etapa da consulta BRMED (login, busca, guia...), por modo.",
+    ("modo", "etapa")
+)
+DURACAO_BRMED_CONSULTA = Histograma(
+    "brmed_consulta_duracao_segundos", "Duração total da consulta BRMED de um CPF, por resultado.",
+    ("resultado",)
+)
+DURACAO_AUDITORIA = Histograma(
+    "auditoria_gravacao_duracao_segundos", "Duração da gravação de um lote de registros de auditoria.",
+    buckets=BUCKETS_RAPIDOS
+)
+ACESSOS_CACHE = Contador(
+    "cache_acessos_total", "Consultas aos caches da aplicação, por cache e resultado (acerto/falha).",
+    ("cache", "resultado")
+)
+TENTATIVAS_LLM = Contador(
+    "llm_tentativas_extras_total", "Tentativas adicionais ao LLM (rate limit e hedging), por motivo.",
+    ("modelo", "motivo")
+)
+TOKENS_LLM = Contador(
+    "llm_tokens_total", "Tokens consumidos nas chamadas ao LLM, por operação e tipo (prompt/completion).",
+    ("operacao", "tipo")
+)
+ERROS = Contador(
+    "erros_total", "Erros por componente e tipo.", ("componente", "tipo")
+)
+NAVEGADORES_ATIVOS = Medidor(
+    "brmed_navegadores_ativos", "Navegadores Playwright abertos no momento."
+)
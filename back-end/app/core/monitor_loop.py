@@ -0,0 +1,143 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core import metricas
+
+logger = logging.getLogger(__name__)
+
+# Monitor de atraso do event loop. Uma tarefa no próprio loop mede o atraso de agendamento
+# (quanto o sleep passou do previsto) e atualiza um batimento; uma thread de vigia, que não
+# depende do loop, percebe quando o batimento para e captura a pilha da thread do loop nesse
+# momento, apontando a chamada síncrona que o está bloqueando.
+
+ATRASO_LOOP = metricas.Histograma(
+    "event_loop_atraso_segundos", "Atraso de agendamento do event loop (sleep além do previsto).",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+BLOQUEIOS_LOOP = metricas.Contador(
+    "event_loop_bloqueios_total", "Vezes em que o event loop ficou bloqueado acima do limite."
+)
+
+class MonitorLoop:
+    """Mede o atraso do event loop e registra a pilha das chamadas que o bloqueiam."""
+
+    def __init__(self, intervalo: float, limite: float, max_capturas: int):
+        self.intervalo = intervalo
+        self.limite = limite
+        self.capturas: deque = deque(maxlen=max_capturas)
+        self.atraso_maximo = 0.0
+        self.amostras = 0
+        self.bloqueios = 0
+        self._batimento = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_loop: Optional[int] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._vigia: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+
+    def iniciar(self):
+        """Chamado de dentro do loop monitorado (ex: no startup da aplicação)."""
+        if self._tarefa is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread_loop = threading.get_ident()
+        self._batimento = time.monotonic()
+        self._parar.clear()
+        self._tarefa = self._loop.create_task(self._medir(), name="monitor_loop")
+        self._vigia = threading.Thread(target=self._vigiar, name="monitor_loop_vigia", daemon=True)
+        self._vigia.start()
+        logger.info(f"[LOOP] Monitor iniciado (amostra a cada {self.intervalo * 1000:.0f}ms, limite {self.limite * 1000:.0f}ms).")
+
+    async def parar(self):
+        self._parar.set()
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+
+    async def _medir(self):
+        while True:
+            previsto = time.monotonic() + self.intervalo
+            await asyncio.sleep(self.intervalo)
+            agora = time.monotonic()
+            atraso = max(agora - previsto, 0.0)
+            self._batimento = agora
+            self.amostras += 1
+            self.atraso_maximo = max(self.atraso_maximo, atraso)
+            ATRASO_LOOP.observar(atraso)
+            if atraso >= self.limite:
+                logger.warning(f"[LOOP] Event loop atrasado em {atraso * 1000:.0f}ms.")
+
+    def _vigiar(self):
+        """Thread de vigia: a cada intervalo, confere se o batimento do loop está em dia."""
+        bloqueio_registrado = None
+        while not self._parar.wait(self.intervalo):
+            parado = time.monotonic() - self._batimento - self.intervalo
+            if parado < self.limite:
+                bloqueio_registrado = None
+            elif bloqueio_registrado != self._batimento:
+                # Um registro por episódio de bloqueio, com a pilha no momento em que passou do limite
+                bloqueio_registrado = self._batimento
+                self._capturar(parado)
+
+    def _capturar(self, parado: float):
+        quadro = sys._current_frames().get(self._thread_loop)
+        if quadro is None:
+            return
+        pilha = traceback.format_stack(quadro)
+        tarefa = None
+        try:
+            atual = asyncio.current_task(self._loop)
+            if atual is not None:
+                tarefa = f"{atual.get_name()} ({atual.get_coro().__qualname__})"
+        except Exception:
+            pass
+        self.bloqueios += 1
+        BLOQUEIOS_LOOP.inc()
+        self.capturas.append({
+            "em": datetime.now().isoformat(timespec="seconds"),
+            "bloqueado_ms": round(parado * 1000),
+            "tarefa": tarefa,
+            "pilha": [linha.rstrip() for linha in pilha[-15:]]
+        })
+        logger.warning(
+            f"[LOOP] Event loop bloqueado há {parado * 1000:.0f}ms pela tarefa {tarefa}. Pilha:\n{''.join(pilha[-15:])}"
+        )
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "ativo": self._tarefa is not None,
+            "amostras": self.amostras,
+            "atraso_maximo_ms": round(self.atraso_maximo * 1000, 1),
+            "limite_ms": round(self.limite * 1000),
+            "bloqueios": self.bloqueios,
+            "capturas": list(self.capturas)
+        }
+
+monitor_loop = MonitorLoop(
+    intervalo=settings.MONITOR_LOOP_INTERVALO,
+    limite=settings.MONITOR_LOOP_LIMITE,
+    max_capturas=settings.MONITOR_LOOP_MAX_CAPTURAS
+)
+metricas.Medidor(
+    "event_loop_atraso_maximo_segundos", "Maior atraso do event loop observado desde o início.",
+    funcao=lambda: monitor_loop.atraso_maximo
+)
+
+async def iniciar():
+    if settings.MONITOR_LOOP_HABILITADO:
+        monitor_loop.iniciar()
+
+async def parar():
+    await monitor_loop.parar()
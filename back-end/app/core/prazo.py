@@ -0,0 +1,83 @@
+import time
+import logging
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Prazo total de uma requisição, definido na camada de API e lido por cada etapa (OCR, RPA,
+# LLM) para dimensionar os próprios timeouts e tentativas pelo tempo que ainda resta.
+
+class PrazoEsgotado(Exception):
+    """O prazo da requisição acabou antes (ou durante) a etapa indicada."""
+
+    def __init__(self, etapa: str):
+        super().__init__(f"Prazo da requisição esgotado na etapa '{etapa}'.")
+        self.etapa = etapa
+
+class Orcamento:
+    """Prazo de uma requisição e o tempo consumido por etapa."""
+
+    def __init__(self, segundos: float):
+        self.total = segundos
+        self.inicio = time.monotonic()
+        self.limite = self.inicio + segundos
+        self._marco = self.inicio
+        self.consumo: Dict[str, float] = {}
+
+    def restante(self) -> float:
+        return max(self.limite - time.monotonic(), 0.0)
+
+    def esgotado(self) -> bool:
+        return time.monotonic() >= self.limite
+
+    def marcar(self, etapa: str):
+        """Registra o tempo desde a marca anterior como consumo da etapa."""
+        agora = time.monotonic()
+        duracao = agora - self._marco
+        self._marco = agora
+        self.consumo[etapa] = round(self.consumo.get(etapa, 0.0) + duracao, 3)
+        logger.info(f"[PRAZO] Etapa '{etapa}': {duracao:.2f}s | restante {self.restante():.1f}s de {self.total:.0f}s")
+
+    def resumo(self) -> Dict[str, Any]:
+        return {
+            "prazo_segundos": self.total,
+            "consumido_segundos": round(time.monotonic() - self.inicio, 3),
+            "restante_segundos": round(self.restante(), 3),
+            "etapas": dict(self.consumo)
+        }
+
+_orcamento_atual: ContextVar[Optional[Orcamento]] = ContextVar("orcamento_requisicao", default=None)
+
+def iniciar(segundos: float) -> Orcamento:
+    """Define o prazo da requisição atual (vale para as tarefas criadas a partir dela)."""
+    orcamento = Orcamento(segundos)
+    _orcamento_atual.set(orcamento)
+    return orcamento
+
+def atual() -> Optional[Orcamento]:
+    return _orcamento_atual.get()
+
+def esgotado() -> bool:
+    orcamento = atual()
+    return orcamento is not None and orcamento.esgotado()
+
+def limitar(timeout: Optional[float]) -> Optional[float]:
+    """Menor entre o timeout da etapa e o prazo restante da requisição (None = sem limite)."""
+    orcamento = atual()
+    if orcamento is None:
+        return timeout
+    return orcamento.restante() if timeout is None else min(timeout, orcamento.restante())
+
+# ─── Retentativas (tenacity) dentro do prazo ─────────────────────────────────
+def parar_se_esgotado(retry_state) -> bool:
+    """Condição de parada do tenacity: sem prazo restante, não há nova tentativa."""
+    return esgotado()
+
+def espera_no_prazo(espera):
+    """Limita a espera do tenacity entre tentativas ao prazo restante da requisição."""
+    def esperar(retry_state) -> float:
+        segundos = espera(retry_state)
+        restante = limitar(None)
+        return segundos if restante is None else min(segundos, restante)
+    return esperar
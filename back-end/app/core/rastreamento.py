@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import queue
+import logging
+import secrets
+import functools
+import inspect
+import logging.handlers
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rastreamento leve por requisição: spans aninhados (trace/span ids no formato W3C) gravados
+# em JSONL rotativo, uma linha por span no formato JSON de spans do OpenTelemetry (OTLP).
+# A gravação passa por uma fila e é feita por uma thread, fora do event loop.
+
+STATUS_NAO_DEFINIDO, STATUS_OK, STATUS_ERRO = 0, 1, 2
+TIPO_INTERNO, TIPO_SERVIDOR = 1, 2
+
+def _valor_otlp(valor: Any) -> Dict[str, Any]:
+    if isinstance(valor, bool):
+        return {"boolValue": valor}
+    if isinstance(valor, int):
+        return {"intValue": str(valor)}
+    if isinstance(valor, float):
+        return {"doubleValue": valor}
+    if isinstance(valor, str):
+        return {"stringValue": valor}
+    return {"stringValue": json.dumps(valor, ensure_ascii=False, default=str)}
+
+class Span:
+    """Trecho cronometrado de uma requisição, com atributos e status."""
+
+    __slots__ = ("trace_id", "span_id", "pai_id", "nome", "tipo", "inicio_ns", "fim_ns", "atributos", "status", "mensagem")
+
+    def __init__(self, nome: str, trace_id: str, pai_id: Optional[str], tipo: int = TIPO_INTERNO, **atributos):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.pai_id = pai_id
+        self.nome = nome
+        self.tipo = tipo
+        self.inicio_ns = time.time_ns()
+        self.fim_ns: Optional[int] = None
+        self.atributos: Dict[str, Any] = {chave: valor for chave, valor in atributos.items() if valor is not None}
+        self.status = STATUS_NAO_DEFINIDO
+        self.mensagem: Optional[str] = None
+
+    def definir(self, **atributos):
+        self.atributos.update({chave: valor for chave, valor in atributos.items() if valor is not None})
+
+    def marcar_erro(self, mensagem: str):
+        self.status, self.mensagem = STATUS_ERRO, mensagem[:500]
+
+    def para_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.nome,
+            "kind": self.tipo,
+            "startTimeUnixNano": str(self.inicio_ns),
+            "endTimeUnixNano": str(self.fim_ns or time.time_ns()),
+            "attributes": [{"key": chave, "value": _valor_otlp(valor)} for chave, valor in self.atributos.items()],
+            "status": {"code": self.status, **({"message": self.mensagem} if self.mensagem else {})}
+        }
+        if self.pai_id:
+            span["parentSpanId"] = self.pai_id
+        return span
+
+class _SpanInativo:
+    """Usado quando o rastreamento está desligado: aceita as mesmas chamadas e não grava nada."""
+    trace_id = span_id = None
+
+    def definir(self, **atributos):
+        pass
+
+    def marcar_erro(self, mensagem: str):
+        pass
+
+SPAN_INATIVO = _SpanInativo()
+_span_atual: ContextVar[Optional[Span]] = ContextVar("span_atual", default=None)
+
+class ExportadorJSONL:
+    """Fila em memória + thread que grava os spans num arquivo JSONL com rotação por tamanho."""
+
+    def __init__(self, caminho: str, max_bytes: int, backups: int):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self.caminho = caminho
+        self._fila: "queue.Queue" = queue.Queue(-1)
+        self._manipulador = logging.handlers.RotatingFileHandler(caminho, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        self._manipulador.setFormatter(logging.Formatter("%(message)s"))
+        self._ouvinte = logging.handlers.QueueListener(self._fila, self._manipulador)
+        self._ouvinte.start()
+        self.exportados = 0
+
+    def exportar(self, span: Span):
+        registro = logging.makeLogRecord({"msg": json.dumps(span.para_otlp(), ensure_ascii=False), "levelno": logging.INFO})
+        self._fila.put_nowait(registro)
+        self.exportados += 1
+
+    def descarregar(self):
+        """Grava o que estiver na fila (reinicia a thread de gravação)."""
+        self._ouvinte.stop()
+        self._ouvinte.start()
+
+_exportador: Optional[ExportadorJSONL] = None
+
+def _obter_exportador() -> ExportadorJSONL:
+    global _exportador
+    if _exportador is None:
+        _exportador = ExportadorJSONL(
+            os.path.join(settings.BASE_DIR, settings.RASTREAMENTO_ARQUIVO),
+            settings.RASTREAMENTO_MAX_MB * 1024 * 1024,
+            settings.RASTREAMENTO_BACKUPS
+        )
+    return _exportador
+
+def descarregar():
+    if _exportador is not None:
+        _exportador.descarregar()
+
+def span_atual():
+    return _span_atual.get() or SPAN_INATIVO
+
+def trace_id_atual() -> Optional[str]:
+    span = _span_atual.get()
+    return span.trace_id if span else None
+
+def _ler_traceparent(traceparent: Optional[str]):
+    """Cabeçalho W3C 'traceparent' (00-<trace_id>-<span_id>-<flags>) -> (trace_id, span_id)."""
+    partes = (traceparent or "").strip().split("-")
+    if len(partes) == 4 and len(partes[1]) == 32 and len(partes[2]) == 16 and partes[1] != "0" * 32:
+        return partes[1].lower(), partes[2].lower()
+    return None, None
+
+@contextmanager
+def span(nome: str, tipo: int = TIPO_INTERNO, traceparent: Optional[str] = None, **atributos):
+    """
+    Abre um span filho do span atual (ou a raiz de um novo trace). Exceções marcam o span
+    com erro e seguem adiante.
+    """
+    if not settings.RASTREAMENTO_HABILITADO:
+        yield SPAN_INATIVO
+        return
+    pai = _span_atual.get()
+    if pai is not None:
+        trace_id, pai_id = pai.trace_id, pai.span_id
+    else:
+        trace_id, pai_id = _ler_traceparent(traceparent)
+        trace_id = trace_id or secrets.token_hex(16)
+    atual = Span(nome, trace_id, pai_id, tipo, **atributos)
+    token = _span_atual.set(atual)
+    try:
+        yield atual
+    except BaseException as e:
+        atual.marcar_erro(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _span_atual.reset(token)
+        atual.fim_ns = time.time_ns()
+        try:
+            _obter_exportador().exportar(atual)
+        except Exception as e:
+            logger.warning(f"[RASTREAMENTO] Falha ao exportar span '{nome}': {e}")
+
+def registrar_span(nome: str, inicio_ns: int, fim_ns: int, erro: Optional[str] = None, **atributos):
+    """
+    Registra como filho do span atual um trecho já medido (ex: etapas do cronômetro do RPA
+    ou a leitura de um stream do LLM); `erro` marca o trecho com falha.
+    """
+    pai = _span_atual.get()
+    if not settings.RASTREAMENTO_HABILITADO or pai is None:
+        return
+    filho = Span(nome, pai.trace_id, pai.span_id, **atributos)
+    filho.inicio_ns, filho.fim_ns = inicio_ns, fim_ns
+    if erro:
+        filho.marcar_erro(erro)
+    _obter_exportador().exportar(filho)
+
+def rastrear(nome: str):
+    """Decorator: executa a função (síncrona ou assíncrona) dentro de um span."""
+    def decorador(funcao):
+        if inspect.iscoroutinefunction(funcao):
+            @functools.wraps(funcao)
+            async def envoltorio_async(*args, **kwargs):
+                with span(nome):
+                    return await funcao(*args, **kwargs)
+            return envoltorio_async
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            with span(nome):
+                return funcao(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+class MiddlewareRastreamento:
+    """
+    Middleware ASGI: um span raiz por requisição HTTP (que cobre também respostas em stream),
+    continuando o 'traceparent' recebido e devolvendo o id no cabeçalho X-Trace-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RASTREAMENTO_HABILITADO:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1") or None
+        with span(
+            f"{scope['method']} {scope['path']}", tipo=TIPO_SERVIDOR, traceparent=traceparent,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as raiz:
+            async def enviar(mensagem):
+                if mensagem["type"] == "http.response.start":
+                    raiz.definir(**{"http.status_code": mensagem["status"]})
+                    if mensagem["status"] >= 500:
+                        raiz.marcar_erro(f"HTTP {mensagem['status']}")
+                    mensagem["headers"] = list(mensagem.get("headers") or []) + [(b"x-trace-id", raiz.trace_id.encode())]
+                await send(mensagem)
+            await self.app(scope, receive, enviar)
+
+def _valor_de_otlp(valor: Dict[str, Any]) -> Any:
+    if "intValue" in valor:
+        return int(valor["intValue"])
+    for campo in ("stringValue", "doubleValue", "boolValue"):
+        if campo in valor:
+            return valor[campo]
+    return None
+
+def ler_spans(caminho: Optional[str] = None, trace_id: Optional[str] = None) -> list:
+    """
+    Lê os spans gravados (arquivo atual e rotacionados) em ordem de início, opcionalmente só
+    os de um trace, como dicts simples: trace_id, span_id, pai_id, nome, inicio_ns, fim_ns,
+    atributos e status.
+    """
+    caminho = caminho or os.path.join(settings.BASE_DIR, settings.RASTREAMENTO_ARQUIVO)
+    arquivos = [caminho] + [f"{caminho}.{n}" for n in range(1, settings.RASTREAMENTO_BACKUPS + 1)]
+    spans = []
+    for arquivo in arquivos:
+        if not os.path.exists(arquivo):
+            continue
+        with open(arquivo, "r", encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    bruto = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue  # linha truncada por uma interrupção na gravação
+                if trace_id and bruto.get("traceId") != trace_id:
+                    continue
+                spans.append({
+                    "trace_id": bruto["traceId"],
+                    "span_id": bruto["spanId"],
+                    "pai_id": bruto.get("parentSpanId"),
+                    "nome": bruto["name"],
+                    "inicio_ns": int(bruto["startTimeUnixNano"]),
+                    "fim_ns": int(bruto["endTimeUnixNano"]),
+                    "atributos": {a["key"]: _valor_de_otlp(a["value"]) for a in bruto.get("attributes", [])},
+                    "status": bruto.get("status", {})
+                })
+    return sorted(spans, key=lambda s: s["inicio_ns"])
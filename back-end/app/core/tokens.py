@@ -0,0 +1,42 @@
+import logging
+import math
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Média aproximada de caracteres por token para textos em português
+CARACTERES_POR_TOKEN = 4
+
+@lru_cache(maxsize=1)
+def _carregar_encoding():
+    """Carrega o tokenizer local (tiktoken), se disponível."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"Tokenizer tiktoken indisponível, usando estimativa por caracteres: {e}")
+        return None
+
+def contar_tokens(texto: str) -> int:
+    """Conta (ou estima, sem tiktoken) o número de tokens de um texto."""
+    if not texto:
+        return 0
+    encoding = _carregar_encoding()
+    if encoding is not None:
+        return len(encoding.encode(texto, disallowed_special=()))
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+def truncar_tokens(texto: str, max_tokens: int) -> str:
+    """Corta o texto nos primeiros `max_tokens` tokens (ou na estimativa por caracteres, sem tiktoken)."""
+    if contar_tokens(texto) <= max_tokens:
+        return texto
+    encoding = _carregar_encoding()
+    if encoding is None:
+        return texto[:max_tokens * CARACTERES_POR_TOKEN]
+    ids = encoding.encode(texto, disallowed_special=())[:max_tokens]
+    truncado = encoding.decode(ids)
+    # O corte pode cair no meio de um caractere multibyte, que volta como mais de um token
+    while ids and contar_tokens(truncado) > max_tokens:
+        ids = ids[:-1]
+        truncado = encoding.decode(ids)
+    return truncado
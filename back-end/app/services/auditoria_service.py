@@ -0,0 +1,215 @@
+import os
+import json
+import zlib
+import uuid
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core import metricas
+
+logger = logging.getLogger(__name__)
+
+# Formato em disco:
+# - segmentos "auditoria_<AAAAMMDD>_<NNN>.jsonl.gz": cada flush anexa um membro gzip com
+#   um registro JSON por linha (arquivos gzip aceitam membros concatenados);
+# - "indice.sqlite3": uma linha por registro com CPF, data e a posição do membro no segmento.
+NOME_INDICE = "indice.sqlite3"
+
+SQL_CRIAR_INDICE = """
+CREATE TABLE IF NOT EXISTS registros (
+    id TEXT PRIMARY KEY,
+    cpf TEXT NOT NULL,
+    criado_em TEXT NOT NULL,
+    segmento TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    tamanho INTEGER NOT NULL,
+    linha INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_registros_cpf_data ON registros (cpf, criado_em);
+CREATE INDEX IF NOT EXISTS idx_registros_data ON registros (criado_em);
+"""
+
+def _comprimir_gzip(dados: bytes) -> bytes:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(dados) + compressor.flush()
+
+def _descomprimir_gzip(dados: bytes) -> bytes:
+    return zlib.decompressobj(31).decompress(dados)
+
+class ArmazemAuditoria:
+    """
+    Armazém de auditoria somente-anexação. Os registros entram numa fila em memória e uma
+    tarefa em segundo plano grava-os em lotes, fora do event loop, nos segmentos comprimidos.
+    """
+
+    def __init__(self, diretorio: str, max_bytes_segmento: int, intervalo_flush: float, max_lote: int):
+        self.diretorio = diretorio
+        self.max_bytes_segmento = max_bytes_segmento
+        self.intervalo_flush = intervalo_flush
+        self.max_lote = max_lote
+        self._fila: Optional[asyncio.Queue] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._indice_pronto = False
+        self.registros_gravados = 0
+        self.lotes_gravados = 0
+
+    # ─── Gravação (executada em thread) ──────────────────────────────────────
+    def _conectar(self) -> sqlite3.Connection:
+        os.makedirs(self.diretorio, exist_ok=True)
+        conexao = sqlite3.connect(os.path.join(self.diretorio, NOME_INDICE))
+        if not self._indice_pronto:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(SQL_CRIAR_INDICE)
+            self._indice_pronto = True
+        return conexao
+
+    def _segmento_atual(self, data: str) -> str:
+        """Segmento do dia; passa para o próximo número quando atinge o tamanho máximo."""
+        prefixo = f"auditoria_{data}_"
+        existentes = sorted(n for n in os.listdir(self.diretorio) if n.startswith(prefixo))
+        if existentes:
+            ultimo = existentes[-1]
+            if os.path.getsize(os.path.join(self.diretorio, ultimo)) < self.max_bytes_segmento:
+                return ultimo
+            numero = int(ultimo[len(prefixo):].split(".")[0]) + 1
+        else:
+            numero = 1
+        return f"{prefixo}{numero:03d}.jsonl.gz"
+
+    def _gravar_lote(self, registros: List[Dict[str, Any]]):
+        with self._conectar() as conexao:
+            por_dia: Dict[str, List[Dict[str, Any]]] = {}
+            for registro in registros:
+                por_dia.setdefault(registro["criado_em"][:10].replace("-", ""), []).append(registro)
+            for data, registros_dia in por_dia.items():
+                segmento = self._segmento_atual(data)
+                caminho = os.path.join(self.diretorio, segmento)
+                conteudo = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in registros_dia).encode("utf-8")
+                membro = _comprimir_gzip(conteudo)
+                with open(caminho, "ab") as f:
+                    offset = f.tell()
+                    f.write(membro)
+                    f.flush()
+                    os.fsync(f.fileno())
+                conexao.executemany(
+                    "INSERT OR IGNORE INTO registros (id, cpf, criado_em, segmento, offset, tamanho, linha) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(r["id"], r["cpf"], r["criado_em"], segmento, offset, len(membro), i) for i, r in enumerate(registros_dia)]
+                )
+        self.registros_gravados += len(registros)
+        self.lotes_gravados += 1
+
+    # ─── Fila e tarefa em segundo plano ──────────────────────────────────────
+    def _garantir_tarefa(self):
+        if self._tarefa is None or self._tarefa.done():
+            # A fila fica presa ao event loop em que foi usada: recria, mantendo o que estiver pendente
+            anterior, self._fila = self._fila, asyncio.Queue()
+            while anterior is not None and not anterior.empty():
+                self._fila.put_nowait(anterior.get_nowait())
+            self._tarefa = asyncio.get_running_loop().create_task(self._consumir())
+
+    async def _coletar_lote(self) -> List[Dict[str, Any]]:
+        lote = [await self._fila.get()]
+        limite = asyncio.get_running_loop().time() + self.intervalo_flush
+        while len(lote) < self.max_lote:
+            restante = limite - asyncio.get_running_loop().time()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(self._fila.get(), restante))
+            except asyncio.TimeoutError:
+                break
+        return lote
+
+    async def _consumir(self):
+        while True:
+            lote = await self._coletar_lote()
+            try:
+                with metricas.DURACAO_AUDITORIA.cronometrar():
+                    await asyncio.to_thread(self._gravar_lote, lote)
+            except Exception as e:
+                metricas.ERROS.inc(componente="auditoria", tipo=type(e).__name__)
+                logger.exception(f"[AUDITORIA] Falha ao gravar lote de {len(lote)} registro(s): {e}")
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+
+    def registrar(self, cpf: str, dados: Dict[str, Any]) -> str:
+        """Enfileira um registro de auditoria e retorna seu identificador, sem bloquear."""
+        self._garantir_tarefa()
+        registro = {"id": uuid.uuid4().hex, "cpf": cpf, "criado_em": datetime.now().isoformat(timespec="seconds"), **dados}
+        self._fila.put_nowait(registro)
+        return registro["id"]
+
+    async def descarregar(self):
+        """Aguarda a gravação de tudo que está na fila (usado no desligamento e em testes)."""
+        if self._fila is not None and self._tarefa is not None and not self._tarefa.done():
+            await self._fila.join()
+
+    # ─── Consulta ────────────────────────────────────────────────────────────
+    def _ler_registros(self, linhas_indice: List[tuple]) -> List[Dict[str, Any]]:
+        membros: Dict[tuple, List[str]] = {}
+        registros = []
+        for segmento, offset, tamanho, linha in linhas_indice:
+            chave = (segmento, offset)
+            if chave not in membros:
+                with open(os.path.join(self.diretorio, segmento), "rb") as f:
+                    f.seek(offset)
+                    membros[chave] = _descomprimir_gzip(f.read(tamanho)).decode("utf-8").splitlines()
+            registros.append(json.loads(membros[chave][linha]))
+        return registros
+
+    def _consultar(self, cpf: Optional[str], inicio: Optional[str], fim: Optional[str], limite: int) -> List[Dict[str, Any]]:
+        filtros, parametros = [], []
+        if cpf:
+            filtros.append("cpf = ?")
+            parametros.append(cpf)
+        if inicio:
+            filtros.append("criado_em >= ?")
+            parametros.append(inicio)
+        if fim:
+            filtros.append("criado_em <= ?")
+            parametros.append(fim)
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        with self._conectar() as conexao:
+            linhas = conexao.execute(
+                f"SELECT segmento, offset, tamanho, linha FROM registros {where} ORDER BY criado_em DESC LIMIT ?",
+                (*parametros, limite)
+            ).fetchall()
+        return self._ler_registros(linhas)
+
+    def _obter(self, id_registro: str) -> Optional[Dict[str, Any]]:
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "SELECT segmento, offset, tamanho, linha FROM registros WHERE id = ?", (id_registro,)
+            ).fetchone()
+        return self._ler_registros([linha])[0] if linha else None
+
+    async def consultar(self, cpf: str = None, inicio: str = None, fim: str = None, limite: int = 50) -> List[Dict[str, Any]]:
+        """Registros mais recentes primeiro, filtrados por CPF e/ou intervalo de datas (ISO)."""
+        return await asyncio.to_thread(self._consultar, cpf, inicio, fim, limite)
+
+    async def obter(self, id_registro: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._obter, id_registro)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "registros_gravados": self.registros_gravados,
+            "lotes_gravados": self.lotes_gravados,
+            "pendentes": self._fila.qsize() if self._fila else 0
+        }
+
+armazem_auditoria = ArmazemAuditoria(
+    diretorio=os.path.join(settings.BASE_DIR, settings.AUDITORIA_DIRETORIO),
+    max_bytes_segmento=settings.AUDITORIA_MAX_MB_SEGMENTO * 1024 * 1024,
+    intervalo_flush=settings.AUDITORIA_INTERVALO_FLUSH,
+    max_lote=settings.AUDITORIA_MAX_LOTE
+)
+
+metricas.Medidor(
+    "auditoria_fila_itens", "Registros de auditoria aguardando gravação.",
+    funcao=lambda: armazem_auditoria.estatisticas()["pendentes"]
+)
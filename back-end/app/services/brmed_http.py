@@ -0,0 +1,182 @@
+import re
+import logging
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Consulta da guia BRMED sem navegador: reaproveita os cookies de uma sessão já autenticada
+# e refaz via HTTP o caminho busca por CPF -> paciente -> guia de encaminhamento.
+
+TEXTO_LINK_GUIA = "Guia de Encaminhamento"
+TAGS_BLOCO = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset", "figure",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol",
+    "p", "pre", "section", "table", "tr", "ul"
+}
+TAGS_IGNORADAS = {"script", "style", "head", "title", "noscript", "template"}
+REGEX_ESPACOS = re.compile(r"[ \t\r\n\f]+")
+
+class FalhaCaminhoDireto(Exception):
+    """O portal não respondeu como esperado no caminho HTTP; usar a automação pelo navegador."""
+
+class SessaoExpirada(FalhaCaminhoDireto):
+    """O portal devolveu a tela de login: os cookies da sessão não valem mais."""
+
+class PacienteNaoEncontrado(Exception):
+    """A busca respondeu normalmente, com a tabela de resultados vazia: não há paciente com o CPF."""
+
+class _ExtratorHTML(HTMLParser):
+    """Coleta formulários, links e o texto visível (aproximando o innerText do navegador)."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.formularios: List[Dict[str, Any]] = []
+        self.links: List[Dict[str, str]] = []
+        self.tabelas: List[str] = []
+        self.partes: List[str] = []
+        self._ignorando = 0
+        self._link_atual: Optional[Dict[str, str]] = None
+        self._primeira_celula = False
+        self._classes_tabela: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        atributos = {nome: (valor or "") for nome, valor in attrs}
+        if tag in TAGS_IGNORADAS:
+            self._ignorando += 1
+        if tag in TAGS_BLOCO:
+            self.partes.append("\n")
+        if tag == "table":
+            self._classes_tabela.append(atributos.get("class", ""))
+            self.tabelas.append(atributos.get("class", ""))
+        elif tag == "tr":
+            self._primeira_celula = True
+        elif tag in ("td", "th"):
+            if not self._primeira_celula:
+                self.partes.append("\t")
+            self._primeira_celula = False
+        elif tag == "form":
+            self.formularios.append({
+                "action": atributos.get("action", ""),
+                "method": atributos.get("method", "get").lower(),
+                "campos": []
+            })
+        elif tag in ("input", "button", "select", "textarea") and self.formularios:
+            self.formularios[-1]["campos"].append({"tag": tag, **atributos})
+        elif tag == "a" and "href" in atributos:
+            self._link_atual = {
+                "href": atributos["href"],
+                "texto": "",
+                "tabela": self._classes_tabela[-1] if self._classes_tabela else None
+            }
+            self.links.append(self._link_atual)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in TAGS_IGNORADAS and self._ignorando:
+            self._ignorando -= 1
+        if tag in TAGS_BLOCO:
+            self.partes.append("\n")
+        if tag == "table" and self._classes_tabela:
+            self._classes_tabela.pop()
+        elif tag == "a":
+            self._link_atual = None
+
+    def handle_data(self, data):
+        if self._ignorando:
+            return
+        texto = REGEX_ESPACOS.sub(" ", data)
+        if self._link_atual is not None:
+            self._link_atual["texto"] += texto
+        self.partes.append(texto)
+
+    def texto(self) -> str:
+        linhas = [linha.strip(" ") for linha in "".join(self.partes).split("\n")]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(linhas)).strip()
+
+def analisar_html(html: str) -> _ExtratorHTML:
+    extrator = _ExtratorHTML()
+    extrator.feed(html)
+    extrator.close()
+    return extrator
+
+def html_para_texto(html: str) -> str:
+    """Texto visível da página, com células de tabela separadas por tab, como no innerText."""
+    return analisar_html(html).texto()
+
+def _eh_tela_login(pagina: _ExtratorHTML) -> bool:
+    return any(campo.get("type") == "password" for form in pagina.formularios for campo in form["campos"])
+
+def _dados_formulario_busca(formulario: Dict[str, Any], cpf: str) -> Dict[str, str]:
+    """Preenche o formulário de busca como a automação: opção CPF marcada e o CPF no campo de texto."""
+    dados = {}
+    texto_preenchido = False
+    for campo in formulario["campos"]:
+        nome, tipo = campo.get("name"), campo.get("type", "text").lower()
+        if not nome:
+            continue
+        if tipo == "radio":
+            if campo.get("id") == "radio_cpf":
+                dados[nome] = campo.get("value", "on")
+        elif tipo == "checkbox":
+            if "checked" in campo:
+                dados[nome] = campo.get("value", "on")
+        elif tipo in ("submit", "button", "image"):
+            if "button-bold" in campo.get("class", ""):
+                dados[nome] = campo.get("value", "")
+        elif tipo == "text" and not texto_preenchido:
+            dados[nome] = cpf
+            texto_preenchido = True
+        elif campo["tag"] != "button":
+            dados[nome] = campo.get("value", "")
+    if not texto_preenchido:
+        raise FalhaCaminhoDireto("Campo de texto da busca não encontrado no formulário.")
+    return dados
+
+async def _obter(client: httpx.AsyncClient, url: str, **kwargs) -> tuple:
+    resposta = await client.request(kwargs.pop("method", "GET"), url, **kwargs)
+    if resposta.status_code >= 400:
+        raise FalhaCaminhoDireto(f"HTTP {resposta.status_code} em {url}")
+    pagina = analisar_html(resposta.text)
+    if _eh_tela_login(pagina):
+        raise SessaoExpirada(f"Tela de login retornada em {url}")
+    return resposta, pagina
+
+async def buscar_texto_guia(client: httpx.AsyncClient, url_busca: str, cpf: str) -> str:
+    """
+    Refaz por HTTP: formulário de busca -> submissão com o CPF -> primeiro paciente da
+    tabela de resultados -> link 'Guia de Encaminhamento'. Retorna o texto da guia. Tabela
+    de resultados vazia levanta PacienteNaoEncontrado (resposta válida, sem recorrer ao navegador).
+    """
+    resposta, pagina = await _obter(client, url_busca)
+    formulario = next(
+        (f for f in pagina.formularios if any(c.get("id") == "radio_cpf" for c in f["campos"])), None
+    )
+    if formulario is None:
+        raise FalhaCaminhoDireto("Formulário de busca por CPF não encontrado.")
+    acao = urljoin(str(resposta.url), formulario["action"] or str(resposta.url))
+    dados = _dados_formulario_busca(formulario, cpf)
+    if formulario["method"] == "post":
+        resposta, pagina = await _obter(client, acao, method="POST", data=dados)
+    else:
+        resposta, pagina = await _obter(client, acao, params=dados)
+
+    link_paciente = next(
+        (l for l in pagina.links if "/paciente/" in l["href"] and "tabledata" in (l["tabela"] or "")), None
+    )
+    if link_paciente is None:
+        if any("tabledata" in classes for classes in pagina.tabelas):
+            raise PacienteNaoEncontrado(f"Nenhum paciente encontrado para o CPF {cpf}.")
+        raise FalhaCaminhoDireto("Tabela de resultados da busca não encontrada.")
+    resposta, pagina = await _obter(client, urljoin(str(resposta.url), link_paciente["href"]))
+
+    link_guia = next((l for l in pagina.links if TEXTO_LINK_GUIA in l["texto"]), None)
+    if link_guia is None or link_guia["href"].startswith(("javascript:", "#")):
+        raise FalhaCaminhoDireto("Link direto para a guia de encaminhamento não encontrado.")
+    resposta, _ = await _obter(client, urljoin(str(resposta.url), link_guia["href"]))
+    return html_para_texto(resposta.text)
@@ -1,130 +1,472 @@
 import os
 import re
-from datetime import datetime
+import json
+import time
+import hashlib
+import asyncio
+import httpx
+from collections import deque
 from playwright.async_api import async_playwright
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
+from app.core import llm
+from app.core.config import settings
+from app.core.artefatos import armazem_artefatos
+from app.core.cache_respostas import CacheRespostas
+from app.core.disjuntor import obter_disjuntor
+from app.core import prazo, metricas, rastreamento
+from app.services import guia_parser, brmed_http
 
 logger = logging.getLogger(__name__)
 
 # Função para extrair nome e exames do conteúdo da página
 def extract_nome_e_exames(conteudo: str) -> Dict[str, Any]:
-    logger.info(f"Conteúdo recebido para extração: {conteudo[:500]}...") # Loga os primeiros 500 caracteres
-    # Extrai o nome (até o fim da linha)
-    nome_match = re.search(r"Nome / Name:\s*(.*?)(?:Identidade / ID Number:|\n)", conteudo)
-    logger.info(f"Nome match object: {nome_match}")
-    nome = nome_match.group(1).strip() if nome_match else None
-    logger.info(f"Nome extraído: {nome}")
-    if nome:
-        nome = nome.split("\t")[0].split("  ")[0].strip()
-
-    # Extrai a seção 4 (Exames) até o final do texto
-    exames_match = re.search(r"4\. Exames / Exams:[\s\S]*", conteudo)
-    exames_texto = exames_match.group(0).strip() if exames_match else ""
-    logger.info(f"Exames texto extraído: {exames_texto[:500]}...")
-
-    # Extrai todos os grupos de palavras (exames) em cada linha, ignora linha de seção
-    exames = []
-    for linha in exames_texto.splitlines():
-        linha_limpa = linha.strip().replace('\t', ' ')
-        logger.info(f"Linha limpa para extração de exames: {linha_limpa}")
-        if not linha_limpa or linha_limpa.lower().startswith("4. exames") or linha_limpa.lower().startswith("obrigatório") or "não requer preparo prévio" in linha_limpa.lower() or "jejum" in linha_limpa.lower() or "horas antes do exame" in linha_limpa.lower() or "evitar" in linha_limpa.lower() or "não ingerir" in linha_limpa.lower() or "manter dieta" in linha_limpa.lower() or "informar os medicamentos" in linha_limpa.lower() or "caso faça uso de óculos" in linha_limpa.lower() or "não se expor a sons fortes" in linha_limpa.lower() or "voltar imprimir" in linha_limpa.lower() or "copyright" in linha_limpa.lower():
-            continue
-        # Regex para capturar o nome do exame em português antes do '/' ou do final da linha
-        # Prioriza o texto antes do primeiro '/' para pegar o nome em português
-        match = re.match(r"^([A-ZÀ-Úa-zà-úÇçÊêÍíÓóÕõÂâÊêÔôÃãÕõÇç\s]+?)(?:\s*/.*)?$", linha_limpa)
-        if match:
-            exame = match.group(1).strip()
-            if exame and exame not in exames:
-                exames.append(exame)
-    logger.info(f"Exames extraídos: {exames}")
-    return {"nome": nome, "exames": exames}
+    return guia_parser.extrair_guia(conteudo)
 
-# Função principal de automação RPA
+# Hosts de analytics/rastreamento carregados pelo portal, desnecessários para a consulta
+HOSTS_RASTREADORES = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "facebook.net", "hotjar.com", "clarity.ms"
+)
+# Texto que indica que a guia terminou de renderizar
+MARCADOR_GUIA = "4. Exames / Exams:"
 
-async def consultar_exames_brmed(cpf: str) -> Dict[str, Any]:
-    """Executa automação Playwright para consultar exames obrigatórios na BRMED."""
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,  # Modo headless para melhor performance
-            args=["--disable-blink-features=AutomationControlled"]
-        )
-        ctx = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/124.0.0.0 Safari/537.36"
-            )
-        )
-        # Configura timeout padrão para evitar travamentos
-        ctx.set_default_timeout(60000)  # 60 segundos
-        page = await ctx.new_page()
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        fn = f"resultados/guia_{cpf}_{ts}.json"
-        debug_fn = f"resultados/debug_conteudo_{cpf}_{ts}.txt"
+_tempos_etapas: Dict[str, deque] = {}
+
+class CronometroEtapas:
+    """Mede o tempo de cada etapa da automação e guarda as amostras por modo e etapa."""
+
+    def __init__(self, modo: str):
+        self.modo = modo
+        self.tempos: Dict[str, float] = {}
+        self._inicio = self._marco = time.perf_counter()
+        self._marco_ns = time.time_ns()
+
+    def marcar(self, etapa: str):
+        agora = time.perf_counter()
+        self.tempos[etapa] = round(agora - self._marco, 3)
+        self._marco = agora
+        _tempos_etapas.setdefault(f"{self.modo}:{etapa}", deque(maxlen=500)).append(self.tempos[etapa])
+        metricas.DURACAO_BRMED_ETAPA.observar(self.tempos[etapa], modo=self.modo, etapa=etapa)
+        fim_ns = time.time_ns()
+        rastreamento.registrar_span(f"brmed.{etapa}", self._marco_ns, fim_ns, modo=self.modo)
+        self._marco_ns = fim_ns
+
+    def resumo(self) -> Dict[str, float]:
+        return {**self.tempos, "total": round(time.perf_counter() - self._inicio, 3)}
+
+def obter_metricas_rpa() -> Dict[str, Any]:
+    """Percentis do tempo (s) de cada etapa da automação, por modo."""
+    return {
+        chave: {"amostras": len(amostras), **{f"p{p}": llm.percentil(amostras, p) for p in (50, 95)}}
+        for chave, amostras in _tempos_etapas.items()
+    }
+
+async def _bloquear_recursos(route):
+    """Aborta imagens, fontes, CSS, mídia e rastreadores; o resto segue normalmente."""
+    requisicao = route.request
+    if requisicao.resource_type in settings.BRMED_RECURSOS_BLOQUEADOS or any(h in requisicao.url for h in HOSTS_RASTREADORES):
+        await route.abort()
+    else:
+        await route.continue_()
+
+def _timeout_ms(padrao_ms: int) -> int:
+    """Timeout do Playwright limitado ao prazo restante da requisição (0 desligaria o timeout)."""
+    return max(int(prazo.limitar(padrao_ms / 1000) * 1000), 1)
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/124.0.0.0 Safari/537.36"
+)
+
+def _finalizar_consulta(cpf: str, conteudo: str, cronometro: CronometroEtapas) -> Dict[str, Any]:
+    """Extrai nome e exames do texto da guia e guarda os artefatos da consulta."""
+    dados_filtrados = extract_nome_e_exames(conteudo)
+
+    # Conteúdo bruto para depuração: amostrado, mas sempre guardado se nenhum exame foi extraído
+    amostragem = 1.0 if not dados_filtrados["exames"] else settings.ARTEFATOS_AMOSTRAGEM_DEBUG
+    id_debug = armazem_artefatos.salvar("brmed_debug", conteudo, chave=cpf, amostragem=amostragem)
+    if id_debug:
+        logger.info(f"Conteúdo bruto da página enviado ao armazém de artefatos: {id_debug}")
+
+    # Salvar resultado
+    id_guia = armazem_artefatos.salvar("brmed_guia", json.dumps(dados_filtrados, ensure_ascii=False, indent=4), chave=cpf)
+    logger.info(f"Resultado da extração enviado ao armazém de artefatos: {id_guia}")
+    cronometro.marcar("extracao")
+    logger.info(f"[RPA] Tempos por etapa ({cronometro.modo}): {cronometro.resumo()}")
 
+    return {**dados_filtrados, "tempos_etapas": cronometro.resumo()}
+
+# Guias por CPF (hash do CPF como chave), preenchidas pelas consultas e pela pré-carga
+cache_guias = CacheRespostas(
+    diretorio=os.path.join(settings.BASE_DIR, settings.BRMED_CACHE_DIRETORIO),
+    ttl_segundos=settings.BRMED_CACHE_TTL_HORAS * 3600,
+    max_itens_memoria=settings.BRMED_CACHE_MAX_ITENS_MEMORIA,
+    max_bytes_disco=settings.BRMED_CACHE_MAX_MB * 1024 * 1024,
+    nome="brmed_guias"
+)
+
+disjuntor_brmed = obter_disjuntor(
+    "brmed",
+    janela=settings.BRMED_DISJUNTOR_JANELA,
+    minimo_chamadas=settings.BRMED_DISJUNTOR_MINIMO_CHAMADAS,
+    taxa_falhas=settings.BRMED_DISJUNTOR_TAXA_FALHAS,
+    limite_lento=settings.BRMED_DISJUNTOR_LIMITE_LENTO,
+    taxa_lentas=settings.BRMED_DISJUNTOR_TAXA_LENTAS,
+    tempo_aberto=settings.BRMED_DISJUNTOR_TEMPO_ABERTO
+)
+
+def chave_cpf(cpf: str) -> str:
+    return hashlib.sha256(re.sub(r"\D", "", cpf).encode("utf-8")).hexdigest()
+
+def _resposta_sem_paciente(cpf: str) -> Dict[str, Any]:
+    """Busca respondida com a tabela vazia: resposta válida do portal, não falha."""
+    logger.info(f"[RPA] Nenhum paciente encontrado no portal para o CPF {cpf[:3]}***.")
+    return {"erro": "Paciente não encontrado no portal BRMED para o CPF informado.", "falha_portal": False}
+
+# ─── Modo híbrido: login pelo navegador, consulta via HTTP ───────────────────
+# Sessão autenticada compartilhada entre consultas: cookies e URL da tela de busca
+_sessao: Dict[str, Any] = {"cookies": None, "url_busca": None, "obtida_em": 0.0}
+_lock_sessao = None
+
+@rastreamento.rastrear("brmed.login_navegador")
+async def _login_navegador() -> Dict[str, Any]:
+    """Faz apenas o login (e a entrada em Operações) no navegador e captura os cookies."""
+    async with async_playwright() as p:
+        browser = await abrir_navegador(p)
         try:
-            logger.info("Iniciando automação Playwright...")
-            # --- login ---
-            logger.info("Navegando para a página de login...")
-            await page.goto("https://operacoes.grupobrmed.com.br/")
+            ctx = await browser.new_context(user_agent=USER_AGENT)
+            ctx.set_default_timeout(_timeout_ms(60000))
+            await ctx.route("**/*", _bloquear_recursos)
+            page = await ctx.new_page()
+            await page.goto(settings.BRMED_URL_BASE, wait_until="domcontentloaded")
             await page.fill("input[name='username']", os.getenv("BRMED_USERNAME"))
             await page.fill("input[name='password']", os.getenv("BRMED_PASSWORD"))
             await page.click("button[type='submit']")
-            await page.wait_for_selector("text=Operações", timeout=30000)
+            await page.wait_for_selector("text=Operações", timeout=_timeout_ms(30000))
             await page.click("text=Operações")
-            await page.wait_for_load_state("networkidle", timeout=30000)
+            await page.wait_for_selector("#radio_cpf", state="attached", timeout=_timeout_ms(30000))
+            cookies = {c["name"]: c["value"] for c in await ctx.cookies()}
+            return {"cookies": cookies, "url_busca": page.url, "obtida_em": time.monotonic()}
+        finally:
+            await fechar_navegador(browser)
+
+async def _obter_sessao(renovar: bool = False) -> Dict[str, Any]:
+    global _sessao, _lock_sessao
+    if _lock_sessao is None:
+        _lock_sessao = asyncio.Lock()
+    async with _lock_sessao:
+        valida = _sessao["cookies"] and time.monotonic() - _sessao["obtida_em"] < settings.BRMED_SESSAO_TTL_MINUTOS * 60
+        if renovar or not valida:
+            logger.info("[RPA] Obtendo nova sessão do portal BRMED pelo navegador...")
+            _sessao = await _login_navegador()
+        return _sessao
+
+@rastreamento.rastrear("brmed.http")
+async def consultar_exames_brmed_http(cpf: str) -> Optional[Dict[str, Any]]:
+    """
+    Consulta a guia via HTTP reaproveitando os cookies da sessão. Renova a sessão uma vez se
+    ela expirou. Retorna None quando o caminho direto falha (o chamador usa o navegador); CPF
+    sem paciente no portal é resposta definitiva e não passa pelo navegador.
+    """
+    cronometro = CronometroEtapas("hibrido")
+    for tentativa in range(2):
+        try:
+            sessao = await _obter_sessao(renovar=tentativa > 0)
+            cronometro.marcar("sessao")
+            async with httpx.AsyncClient(
+                cookies=sessao["cookies"], headers={"User-Agent": USER_AGENT},
+                follow_redirects=True, timeout=prazo.limitar(settings.BRMED_TIMEOUT_HTTP)
+            ) as client:
+                conteudo = await brmed_http.buscar_texto_guia(client, sessao["url_busca"], cpf)
+            cronometro.marcar("guia")
+        except brmed_http.SessaoExpirada as e:
+            logger.info(f"[RPA] Sessão expirada ({e}); renovando login.")
+            continue
+        except brmed_http.PacienteNaoEncontrado:
+            return _resposta_sem_paciente(cpf)
+        except Exception as e:
+            logger.warning(f"[RPA] Caminho HTTP da guia falhou para o CPF {cpf}: {e}")
+            return None
+        if MARCADOR_GUIA not in conteudo:
+            logger.warning("[RPA] Página obtida via HTTP não parece uma guia; usando o navegador.")
+            return None
+        return _finalizar_consulta(cpf, conteudo, cronometro)
+    return None
+
+# Função principal de automação RPA
+
+@rastreamento.rastrear("brmed.consulta")
+async def consultar_exames_brmed(cpf: str, usar_cache: bool = True, browser=None, sessao: Optional["SessaoNavegador"] = None) -> Dict[str, Any]:
+    """
+    Consulta os exames obrigatórios na BRMED conforme BRMED_MODO (completo, enxuto ou hibrido).
+    Guias já obtidas (inclusive por pré-carga) são servidas do cache por CPF, sem RPA. Com o
+    circuito do portal aberto, falha imediatamente (ou devolve a guia expirada do cache).
+    `sessao` reaproveita um contexto já autenticado do navegador (ver SessaoNavegador).
+    """
+    chave = chave_cpf(cpf)
+    span = rastreamento.span_atual()
+    span.definir(modo=settings.BRMED_MODO)
+    if usar_cache and settings.BRMED_CACHE_HABILITADO:
+        em_cache = await cache_guias.obter(chave)
+        span.definir(cache_acerto=em_cache is not None)
+        if em_cache is not None:
+            logger.info(f"[RPA] Guia do CPF {cpf[:3]}*** servida do cache.")
+            span.definir(origem="cache", exames=len(em_cache.get("exames") or []))
+            return {**em_cache, "origem": "cache"}
+
+    if prazo.esgotado():
+        span.marcar_erro("prazo esgotado")
+        return {"erro": "Prazo da requisição esgotado antes da consulta BRMED.", "prazo_esgotado": True}
+    if settings.BRMED_DISJUNTOR_HABILITADO and not disjuntor_brmed.permitir():
+        span.definir(circuito=disjuntor_brmed.estado)
+        return await _resposta_circuito_aberto(cpf, chave)
+
+    inicio = time.perf_counter()
+    resultado = None
+    cancelada = False
+    try:
+        if settings.BRMED_MODO == "hibrido":
+            resultado = await consultar_exames_brmed_http(cpf)
+            if resultado is None:
+                logger.info("[RPA] Recorrendo à automação pelo navegador (modo enxuto).")
+        if resultado is None:
+            resultado = await _consultar_exames_navegador(cpf, settings.BRMED_MODO != "completo", browser, sessao)
+    except asyncio.CancelledError:
+        cancelada = True
+        raise
+    finally:
+        if settings.BRMED_DISJUNTOR_HABILITADO:
+            _registrar_no_disjuntor(resultado, time.perf_counter() - inicio, cancelada)
+        _registrar_metricas_consulta(resultado, time.perf_counter() - inicio)
+
+    if "erro" in resultado:
+        span.marcar_erro(resultado["erro"])
+    else:
+        span.definir(origem="portal", exames=len(resultado.get("exames") or []))
+    if settings.BRMED_CACHE_HABILITADO and "erro" not in resultado and resultado.get("exames"):
+        await cache_guias.salvar(chave, {"nome": resultado["nome"], "exames": resultado["exames"], "obtido_em": time.time()})
+    return resultado
+
+def _registrar_metricas_consulta(resultado: Optional[Dict[str, Any]], duracao: float):
+    if resultado is not None and "erro" not in resultado:
+        metricas.DURACAO_BRMED_CONSULTA.observar(duracao, resultado="sucesso")
+        return
+    tipo = "falha_portal" if resultado is None or resultado.get("falha_portal", True) else "sem_paciente"
+    metricas.DURACAO_BRMED_CONSULTA.observar(duracao, resultado=tipo)
+    metricas.ERROS.inc(componente="brmed", tipo=tipo)
+
+def _registrar_no_disjuntor(resultado: Optional[Dict[str, Any]], latencia: float, cancelada: bool = False):
+    """
+    Erros do portal (login, navegação, páginas que não carregam) contam como falha, com a
+    latência real. CPF sem paciente (tabela de resultados vazia) é resposta válida do portal
+    e não entra no cálculo de lentidão. Consultas canceladas (cliente desconectado, prazo de
+    quem aguardava) e falhas com o prazo da requisição esgotado não dizem nada sobre o portal.
+    """
+    if cancelada or (prazo.esgotado() and (resultado is None or "erro" in resultado)):
+        disjuntor_brmed.liberar_sonda()
+        return
+    if resultado is None:
+        disjuntor_brmed.registrar(False, latencia)
+    elif "erro" not in resultado:
+        disjuntor_brmed.registrar(True, latencia)
+    elif resultado.get("falha_portal", True):
+        disjuntor_brmed.registrar(False, latencia)
+    else:
+        disjuntor_brmed.registrar(True, None)
+
+async def _resposta_circuito_aberto(cpf: str, chave: str) -> Dict[str, Any]:
+    """Portal instável: devolve a guia expirada do cache, se houver, ou falha imediatamente."""
+    estado = disjuntor_brmed.estatisticas()
+    if settings.BRMED_CACHE_HABILITADO:
+        expirada = await cache_guias.obter(chave, ignorar_ttl=True)
+        if expirada is not None:
+            logger.warning(f"[RPA] Circuito do portal aberto; usando guia expirada do cache para o CPF {cpf[:3]}***.")
+            return {**expirada, "origem": "cache_expirado", "circuito": estado["estado"]}
+    logger.warning(f"[RPA] Circuito do portal aberto ({estado['motivo']}); consulta recusada para o CPF {cpf[:3]}***.")
+    return {
+        "erro": f"Portal BRMED indisponível (circuito aberto, nova tentativa em {estado['segundos_para_sonda']:.0f}s).",
+        "circuito": estado["estado"]
+    }
+
+async def abrir_navegador(p):
+    browser = await p.chromium.launch(
+        headless=True,  # Modo headless para melhor performance
+        args=["--disable-blink-features=AutomationControlled"]
+    )
+    metricas.NAVEGADORES_ATIVOS.inc()
+    return browser
+
+async def fechar_navegador(browser):
+    metricas.NAVEGADORES_ATIVOS.dec()
+    await browser.close()
+
+@rastreamento.rastrear("brmed.navegador")
+async def _consultar_exames_navegador(cpf: str, enxuto: bool, browser=None, sessao: Optional["SessaoNavegador"] = None) -> Dict[str, Any]:
+    """
+    Executa automação Playwright para consultar exames obrigatórios na BRMED. Com `browser`,
+    usa apenas um novo contexto do navegador já aberto (o chamador o fecha). Com `sessao`,
+    reaproveita o contexto já autenticado (pré-carga), sem novo login por CPF.
+    """
+    if sessao is not None:
+        return await _consultar_na_sessao(sessao, cpf, CronometroEtapas("enxuto" if sessao.enxuto else "completo"))
+    cronometro = CronometroEtapas("enxuto" if enxuto else "completo")
+    if browser is not None:
+        return await _consultar_no_contexto(browser, cpf, enxuto, cronometro)
+    async with async_playwright() as p:
+        browser = await abrir_navegador(p)
+        try:
+            return await _consultar_no_contexto(browser, cpf, enxuto, cronometro)
+        finally:
+            await fechar_navegador(browser)
+            logger.info("Navegador Playwright fechado.")
+
+class SessaoNavegador:
+    """
+    Contexto do navegador autenticado no portal e a página na tela de busca. A pré-carga
+    mantém uma por worker: o login acontece uma vez e cada CPF apenas volta à busca, como os
+    cookies compartilhados do modo híbrido. Após uma falha do portal ou com a sessão vencida
+    (BRMED_SESSAO_TTL_MINUTOS), a próxima consulta abre um contexto novo e refaz o login.
+    """
+
+    def __init__(self, browser, enxuto: bool):
+        self.browser = browser
+        self.enxuto = enxuto
+        self.ctx = None
+        self.page = None
+        self.url_busca: Optional[str] = None
+        self.obtida_em = 0.0
+        self.logins = 0
+
+    @property
+    def valida(self) -> bool:
+        return self.page is not None and time.monotonic() - self.obtida_em < settings.BRMED_SESSAO_TTL_MINUTOS * 60
+
+    async def abrir(self, cronometro: CronometroEtapas):
+        self.ctx = await self.browser.new_context(user_agent=USER_AGENT)
+        # Configura timeout padrão para evitar travamentos
+        self.ctx.set_default_timeout(_timeout_ms(60000))  # 60 segundos
+        if self.enxuto:
+            # Vale também para a aba da guia, aberta no mesmo contexto
+            await self.ctx.route("**/*", _bloquear_recursos)
+        self.page = await self.ctx.new_page()
+        cronometro.marcar("navegador")
+
+        logger.info(f"Iniciando automação Playwright (modo {cronometro.modo})...")
+        # --- login ---
+        logger.info("Navegando para a página de login...")
+        page = self.page
+        await page.goto(settings.BRMED_URL_BASE, wait_until="domcontentloaded" if self.enxuto else "load")
+        await page.fill("input[name='username']", os.getenv("BRMED_USERNAME"))
+        await page.fill("input[name='password']", os.getenv("BRMED_PASSWORD"))
+        await page.click("button[type='submit']")
+        await page.wait_for_selector("text=Operações", timeout=_timeout_ms(30000))
+        cronometro.marcar("login")
+
+        await page.click("text=Operações")
+        if self.enxuto:
+            await page.wait_for_selector("#radio_cpf", state="attached", timeout=_timeout_ms(30000))
+            await page.reload(wait_until="domcontentloaded")
+            await page.wait_for_selector("#radio_cpf", state="attached", timeout=_timeout_ms(30000))
+        else:
+            await page.wait_for_load_state("networkidle", timeout=_timeout_ms(30000))
             await page.reload()
             await page.wait_for_timeout(2000)
-            await page.evaluate("document.querySelector('#radio_cpf').click()")
+        self.url_busca = page.url
+        self.obtida_em = time.monotonic()
+        self.logins += 1
+
+    async def voltar_para_busca(self):
+        """Recarrega a tela de busca para o próximo CPF, já autenticado."""
+        await self.page.goto(self.url_busca, wait_until="domcontentloaded" if self.enxuto else "load")
+        await self.page.wait_for_selector("#radio_cpf", state="attached", timeout=_timeout_ms(30000))
+
+    async def fechar(self):
+        ctx, self.ctx, self.page = self.ctx, None, None
+        if ctx is not None:
+            await ctx.close()
+
+async def _consultar_no_contexto(browser, cpf: str, enxuto: bool, cronometro: CronometroEtapas) -> Dict[str, Any]:
+    """Consulta avulsa: login num contexto novo, fechado ao final."""
+    sessao = SessaoNavegador(browser, enxuto)
+    try:
+        return await _consultar_na_sessao(sessao, cpf, cronometro)
+    finally:
+        await sessao.fechar()
+
+async def _consultar_na_sessao(sessao: SessaoNavegador, cpf: str, cronometro: CronometroEtapas) -> Dict[str, Any]:
+    enxuto = sessao.enxuto
+    try:
+        if sessao.valida:
+            await sessao.voltar_para_busca()
+        else:
+            await sessao.fechar()
+            await sessao.abrir(cronometro)
+        ctx, page = sessao.ctx, sessao.page
+
+        await page.evaluate("document.querySelector('#radio_cpf').click()")
+        if enxuto:
+            await page.wait_for_selector("input[type='text']", state="visible", timeout=_timeout_ms(30000))
+        else:
             await page.wait_for_timeout(1000)
-            logger.info("Login e seleção de CPF concluídos.")
-
-            # --- consulta pelo CPF ---
-            logger.info(f"Consultando CPF: {cpf}")
-            await page.click("input[type='text']")
-            await page.type("input[type='text']", cpf, delay=50)
-            await page.locator("input[type='submit'].button-bold")\
-                .scroll_into_view_if_needed()
+        logger.info("Login e seleção de CPF concluídos.")
+        cronometro.marcar("selecao_cpf")
+
+        # --- consulta pelo CPF ---
+        logger.info(f"Consultando CPF: {cpf}")
+        await page.click("input[type='text']")
+        await page.type("input[type='text']", cpf, delay=50)
+        await page.locator("input[type='submit'].button-bold")\
+            .scroll_into_view_if_needed()
+        # A busca é um POST que recarrega a página: a tabela só é lida depois dessa navegação,
+        # para que a ausência do paciente não seja concluída ainda na página do formulário
+        async with page.expect_navigation(wait_until="domcontentloaded" if enxuto else "load", timeout=_timeout_ms(30000)):
             await page.click("input[type='submit'].button-bold", force=True)
-            await page.wait_for_load_state("networkidle", timeout=30000)
-            logger.info("Consulta de CPF realizada.")
-
-            await page.click("table.tabledata a[href*='/paciente/']")
-            await page.wait_for_selector("a.close", timeout=30000)
-            await page.click("a.close")
-            await page.wait_for_selector("text=Guia de Encaminhamento", timeout=30000)
-            logger.info("Clicando em 'Guia de Encaminhamento'...")
-            async with ctx.expect_page() as new_p_info:
-                await page.click("text=Guia de Encaminhamento")
-            new_page = await new_p_info.value
-            if not new_page:
-                logger.error("Nova página não foi aberta ou foi fechada imediatamente.")
-                raise Exception("Nova página não disponível.")
+        if enxuto:
+            # Sem resultado o portal devolve a tabela vazia: espera a tabela, não o link do paciente
+            await page.wait_for_selector("table.tabledata", timeout=_timeout_ms(30000))
+        else:
+            await page.wait_for_load_state("networkidle", timeout=_timeout_ms(30000))
+        logger.info("Consulta de CPF realizada.")
+        cronometro.marcar("consulta_cpf")
+        if await page.query_selector("table.tabledata a[href*='/paciente/']") is None:
+            return _resposta_sem_paciente(cpf)
+
+        await page.click("table.tabledata a[href*='/paciente/']")
+        await page.wait_for_selector("a.close", timeout=_timeout_ms(30000))
+        await page.click("a.close")
+        await page.wait_for_selector("text=Guia de Encaminhamento", timeout=_timeout_ms(30000))
+        cronometro.marcar("paciente")
+        logger.info("Clicando em 'Guia de Encaminhamento'...")
+        async with ctx.expect_page() as new_p_info:
+            await page.click("text=Guia de Encaminhamento")
+        new_page = await new_p_info.value
+        if not new_page:
+            logger.error("Nova página não foi aberta ou foi fechada imediatamente.")
+            raise Exception("Nova página não disponível.")
+        if enxuto:
+            # Espera o conteúdo da guia em vez de um atraso fixo
+            try:
+                await new_page.wait_for_function(
+                    "marcador => document.body && document.body.innerText.includes(marcador)",
+                    arg=MARCADOR_GUIA, timeout=_timeout_ms(30000)
+                )
+            except Exception as e:
+                logger.warning(f"Seção de exames não apareceu na guia, lendo o conteúdo disponível: {e}")
+        else:
             await new_page.wait_for_load_state("networkidle")
             await new_page.wait_for_timeout(3000) # Adiciona um pequeno atraso para garantir que a página carregue completamente
-            logger.info("Nova página da guia carregada e aguardando.")
-
-            conteudo = await new_page.evaluate("() => document.body.innerText")
-            
-            # Salvar o conteúdo bruto para depuração
-            os.makedirs("resultados", exist_ok=True)
-            with open(debug_fn, "w", encoding="utf-8") as f:
-                f.write(conteudo)
-            logger.info(f"Conteúdo bruto da página salvo em: {debug_fn}")
-
-            dados_filtrados = extract_nome_e_exames(conteudo)
-            # Salvar resultado
-            with open(fn, "w", encoding="utf-8") as f:
-                import json
-                json.dump(dados_filtrados, f, ensure_ascii=False, indent=4)
-            logger.info(f"Resultado da extração salvo em: {fn}")
-            
-            return dados_filtrados
-        except Exception as e:
-            logger.error(f"Erro na automação Playwright: {e}")
-            return {"erro": f"Erro na automação: {e}"}
-        finally:
-            if browser:
-                await browser.close()
-                logger.info("Navegador Playwright fechado.") 
\ No newline at end of file
+        logger.info("Nova página da guia carregada e aguardando.")
+        cronometro.marcar("guia")
+
+        conteudo = await new_page.evaluate("() => document.body.innerText")
+        # A aba da guia não fica aberta na sessão reaproveitada
+        await new_page.close()
+        return _finalizar_consulta(cpf, conteudo, cronometro)
+    except Exception as e:
+        logger.error(f"Erro na automação Playwright: {e}")
+        # Sessão em estado desconhecido: a próxima consulta refaz o login
+        await sessao.fechar()
+        # CPF inexistente já retornou acima (tabela vazia); qualquer outro erro é do portal
+        return {"erro": f"Erro na automação: {e}", "falha_portal": True}
@@ -0,0 +1,62 @@
+import re
+import math
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+# Palavras muito frequentes em português que não ajudam a distinguir perguntas
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das", "em", "no", "na",
+    "nos", "nas", "por", "para", "pra", "com", "sem", "e", "ou", "que", "qual", "quais", "se", "ao", "aos",
+    "como", "eu", "me", "meu", "minha", "voce", "ser", "e", "sao", "tem", "ha", "mais", "menos", "isso",
+    "esse", "essa", "este", "esta", "ja", "nao", "sim", "quando", "onde", "porque", "pode", "posso"
+}
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos e sem pontuação."""
+    nfkd = unicodedata.normalize('NFKD', texto or "")
+    sem_acento = ''.join(c for c in nfkd if not unicodedata.combining(c)).lower()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', sem_acento).split())
+
+def tokenizar(texto: str) -> List[str]:
+    return [t for t in normalizar(texto).split() if t not in STOPWORDS]
+
+class IndiceBM25:
+    """Índice invertido com pontuação BM25 (Okapi) sobre uma lista de textos."""
+
+    def __init__(self, textos: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.tamanhos = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc_id, texto in enumerate(textos):
+            termos = tokenizar(texto)
+            self.tamanhos.append(len(termos))
+            for termo, frequencia in Counter(termos).items():
+                self.postings[termo].append((doc_id, frequencia))
+        self.total_docs = len(textos)
+        self.tamanho_medio = (sum(self.tamanhos) / self.total_docs) if self.total_docs else 0.0
+        self.idf = {
+            termo: math.log(1 + (self.total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for termo, docs in self.postings.items()
+        }
+
+    def buscar(self, consulta: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Retorna até k pares (doc_id, score) em ordem decrescente de score."""
+        scores: Dict[int, float] = defaultdict(float)
+        for termo in set(tokenizar(consulta)):
+            idf = self.idf.get(termo)
+            if idf is None:
+                continue
+            for doc_id, frequencia in self.postings[termo]:
+                norma = self.k1 * (1 - self.b + self.b * self.tamanhos[doc_id] / (self.tamanho_medio or 1))
+                scores[doc_id] += idf * frequencia * (self.k1 + 1) / (frequencia + norma)
+        return sorted(scores.items(), key=lambda par: -par[1])[:k]
+
+def fundir_rrf(listas: List[List[int]], k: int = 60) -> List[int]:
+    """Reciprocal Rank Fusion: combina rankings somando 1 / (k + posição)."""
+    scores: Dict[int, float] = defaultdict(float)
+    for lista in listas:
+        for posicao, doc_id in enumerate(lista):
+            scores[doc_id] += 1.0 / (k + posicao + 1)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])
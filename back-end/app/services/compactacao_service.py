@@ -0,0 +1,176 @@
+import os
+import re
+import csv
+import logging
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Set
+
+from app.core.config import settings
+from app.core.tokens import contar_tokens
+
+logger = logging.getLogger(__name__)
+
+# Padrões usados na pontuação dos segmentos
+REGEX_NOME_DATA = re.compile(r'^[#\s]*[A-ZÀ-Ú0-9][^\n]{1,80}?\s+[-–]\s+\d{1,2}/\d{1,2}/\d{2,4}')
+REGEX_IDENTIFICACAO = re.compile(
+    r'C\.?\s?P\.?\s?F|\b[A-Z]{2}/\d{11}\b|(?<!\d)\d{3}[.\s]?\d{3}[.\s]?\d{3}[-\s]?\d{2}(?!\d)'
+    r'|\b(?:paciente|nome|funcion[aá]rio|colaborador)\b',
+    re.IGNORECASE
+)
+REGEX_RUIDO = re.compile(
+    r'valor(?:es)? de refer|intervalo de refer|m[ée]todo:|material:|'
+    r'assinad|respons[áa]vel t[ée]cnico|\bcrm\b|\bcnpj\b|telefone|www\.|https?://|p[áa]gina \d|'
+    r'laudo liberado|data da coleta|coletado em|impresso em',
+    re.IGNORECASE
+)
+
+# Pesos da pontuação
+PESO_IDENTIFICACAO = 5
+PESO_NOME_DATA = 4
+PESO_VOCABULARIO = 3
+PESO_HEADER = 2
+PESO_RUIDO = -3
+PESO_LINHA_LONGA = -1
+TAMANHO_LINHA_LONGA = 200
+PONTUACAO_MINIMA = 2
+# Linha separadora do cabeçalho de tabelas markdown (|---|:---:|)
+REGEX_SEPARADOR_TABELA = re.compile(r'^\|?(\s*:?-+:?\s*\|)+\s*(:?-+:?\s*)?$')
+MAX_PALAVRAS_TERMO = 6
+
+CAMINHO_VOCABULARIO = os.path.join(settings.BASE_DIR, "exames_similares_final.csv")
+
+def normalizar_termo(texto: str) -> str:
+    """Remove acentos e pontuação e coloca em caixa alta, para casar nomes de exames."""
+    nfkd = unicodedata.normalize('NFKD', texto)
+    sem_acento = ''.join(c for c in nfkd if not unicodedata.combining(c)).upper()
+    return ' '.join(re.sub(r'[^A-Z0-9]+', ' ', sem_acento).split())
+
+def normalizar_exame(exame: str) -> str:
+    """Remove acentos e coloca em caixa alta (texto indexado por scripts/generate_exam_similarity_index.py)."""
+    nfkd = unicodedata.normalize('NFKD', exame)
+    return ''.join([c for c in nfkd if not unicodedata.combining(c)]).upper().strip()
+
+@lru_cache(maxsize=1)
+def carregar_vocabulario_exames(caminho: str = CAMINHO_VOCABULARIO) -> Set[str]:
+    """Carrega os nomes de exames conhecidos (exame principal e similares) já normalizados."""
+    vocabulario = set()
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                for termo in (row.get("Exame"), row.get("Similares")):
+                    termo_normalizado = normalizar_termo(termo or "")
+                    if len(termo_normalizado) > 2:
+                        vocabulario.add(termo_normalizado)
+        logger.info(f"[COMPACTACAO] Vocabulário de exames carregado: {len(vocabulario)} termos.")
+    except FileNotFoundError:
+        logger.warning(f"[COMPACTACAO] Vocabulário de exames não encontrado em '{caminho}'.")
+    return vocabulario
+
+def contem_exame_conhecido(texto: str, vocabulario: Set[str]) -> bool:
+    """Verifica se algum n-grama do texto corresponde a um exame do vocabulário."""
+    palavras = normalizar_termo(texto).split()
+    for inicio in range(len(palavras)):
+        for fim in range(inicio + 1, min(inicio + MAX_PALAVRAS_TERMO, len(palavras)) + 1):
+            if ' '.join(palavras[inicio:fim]) in vocabulario:
+                return True
+    return False
+
+def segmentar_markdown(markdown: str) -> List[Dict[str, Any]]:
+    """Divide o markdown em segmentos do tipo header, tabela e linha, preservando a ordem."""
+    segmentos = []
+    linhas_tabela = []
+
+    def fechar_tabela():
+        if linhas_tabela:
+            segmentos.append({"tipo": "tabela", "linhas": list(linhas_tabela)})
+            linhas_tabela.clear()
+
+    for linha in markdown.splitlines():
+        linha_limpa = linha.strip()
+        if linha_limpa.startswith("|"):
+            linhas_tabela.append(linha_limpa)
+            continue
+        fechar_tabela()
+        if not linha_limpa:
+            continue
+        tipo = "header" if linha_limpa.startswith("#") else "linha"
+        segmentos.append({"tipo": tipo, "linhas": [linha_limpa]})
+    fechar_tabela()
+    return segmentos
+
+def pontuar_linha(linha: str, tipo: str, vocabulario: Set[str]) -> int:
+    """Pontua a probabilidade de uma linha conter nomes de exames ou a identificação do paciente."""
+    pontos = 0
+    if REGEX_IDENTIFICACAO.search(linha):
+        pontos += PESO_IDENTIFICACAO
+    if REGEX_NOME_DATA.search(linha):
+        pontos += PESO_NOME_DATA
+    if contem_exame_conhecido(linha, vocabulario):
+        pontos += PESO_VOCABULARIO
+    if tipo == "header":
+        pontos += PESO_HEADER
+    if REGEX_RUIDO.search(linha):
+        pontos += PESO_RUIDO
+    if len(linha) > TAMANHO_LINHA_LONGA:
+        pontos += PESO_LINHA_LONGA
+    return pontos
+
+def compactar_markdown(markdown: str, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Mantém apenas os segmentos relevantes do markdown (exames e identificação do paciente),
+    respeitando o orçamento de tokens, e retorna o texto compactado com o relatório de economia.
+    """
+    max_tokens = max_tokens or settings.MAX_TOKENS_EXTRACAO
+    vocabulario = carregar_vocabulario_exames()
+    segmentos = segmentar_markdown(markdown or "")
+    tokens_originais = contar_tokens(markdown or "")
+
+    candidatos = []
+    for posicao, segmento in enumerate(segmentos):
+        if segmento["tipo"] == "tabela":
+            # Em tabelas, mantém o cabeçalho (com o separador, para seguir válida) e apenas as linhas relevantes
+            cabecalho, corpo = segmento["linhas"][:1], segmento["linhas"][1:]
+            if corpo and REGEX_SEPARADOR_TABELA.match(corpo[0]):
+                cabecalho, corpo = cabecalho + corpo[:1], corpo[1:]
+            relevantes = [l for l in corpo if pontuar_linha(l, "tabela", vocabulario) >= PONTUACAO_MINIMA]
+            if not relevantes:
+                continue
+            pontos = max(pontuar_linha(l, "tabela", vocabulario) for l in relevantes)
+            texto = "\n".join(cabecalho + relevantes)
+        else:
+            texto = segmento["linhas"][0]
+            pontos = pontuar_linha(texto, segmento["tipo"], vocabulario)
+            if pontos < PONTUACAO_MINIMA:
+                continue
+        candidatos.append({"posicao": posicao, "pontos": pontos, "texto": texto, "tokens": contar_tokens(texto)})
+
+    # Preenche o orçamento pelos segmentos de maior pontuação, mantendo a ordem original na saída
+    selecionados, tokens_usados = [], 0
+    for candidato in sorted(candidatos, key=lambda c: (-c["pontos"], c["posicao"])):
+        if tokens_usados + candidato["tokens"] > max_tokens:
+            continue
+        selecionados.append(candidato)
+        tokens_usados += candidato["tokens"]
+    selecionados.sort(key=lambda c: c["posicao"])
+    markdown_compactado = "\n".join(c["texto"] for c in selecionados)
+
+    if not markdown_compactado:
+        # Nada reconhecido como relevante: envia o documento original para não perder informação
+        markdown_compactado = markdown or ""
+        tokens_usados = tokens_originais
+
+    relatorio = {
+        "tokens_originais": tokens_originais,
+        "tokens_enviados": tokens_usados,
+        "tokens_economizados": max(tokens_originais - tokens_usados, 0),
+        "segmentos_total": len(segmentos),
+        "segmentos_enviados": len(selecionados)
+    }
+    logger.info(
+        f"[COMPACTACAO] Tokens originais: {relatorio['tokens_originais']} | "
+        f"Enviados: {relatorio['tokens_enviados']} | "
+        f"Economizados: {relatorio['tokens_economizados']} | "
+        f"Segmentos: {relatorio['segmentos_enviados']}/{relatorio['segmentos_total']}"
+    )
+    return {"markdown": markdown_compactado, "relatorio": relatorio}
@@ -3,7 +3,12 @@ import logging
 import pickle
 import numpy as np
 import faiss
-from openai import OpenAI
+import time
+import json
+import hashlib
+import asyncio
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
 from tenacity import retry, wait_exponential, stop_after_attempt
 
 # ─── Configuração de Logging ─────────────────────────────────────────────────
@@ -20,6 +25,19 @@ CHAT_MODEL         = os.getenv("MODELO_GPT", "gpt-3.5-turbo")
 K_VIZINHOS         = int(os.getenv("K_VIZINHOS_FAQ", 5))
 # CORREÇÃO FINAL: O índice usa L2, então usamos um threshold para L2 e a lógica correta.
 THRESHOLD_L2       = float(os.getenv("THRESHOLD_L2", 1.5))
+# Cache semântico de respostas (similaridade de cosseno entre perguntas)
+CACHE_SIMILARIDADE = float(os.getenv("FAQ_CACHE_SIMILARIDADE", 0.95))
+CACHE_TTL_SEGUNDOS = float(os.getenv("FAQ_CACHE_TTL_MINUTOS", 60)) * 60
+CACHE_MAX_ITENS    = int(os.getenv("FAQ_CACHE_MAX_ITENS", 500))
+# Busca lexical (BM25) fundida à vetorial; acertos lexicais fortes dispensam o embedding
+BM25_MINIMO        = float(os.getenv("FAQ_BM25_MINIMO", 6.0))
+BM25_FORTE         = float(os.getenv("FAQ_BM25_FORTE", 10.0))
+BM25_MARGEM        = float(os.getenv("FAQ_BM25_MARGEM", 1.3))
+RRF_K              = int(os.getenv("FAQ_RRF_K", 60))
+# Os chunks recuperados são agrupados pelo FAQ de origem e empacotados num orçamento de tokens
+K_CANDIDATOS       = int(os.getenv("FAQ_K_CANDIDATOS", K_VIZINHOS * 4))
+MAX_FAQS_CONTEXTO  = int(os.getenv("FAQ_MAX_FAQS_CONTEXTO", 3))
+MAX_TOKENS_CONTEXTO = int(os.getenv("FAQ_MAX_TOKENS_CONTEXTO", 1500))
 
 # Construindo caminhos a partir do diretório do script para robustez
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -33,7 +51,11 @@ if OPENAI_API_KEY is None:
     raise SystemExit(1)
 
 # ─── Cliente OpenAI ───────────────────────────────────────────────────────────
-client = OpenAI(api_key=OPENAI_API_KEY)
+# As chamadas usam a camada assíncrona compartilhada (pool HTTP, semáforos e rate limit)
+from app.core import llm, lotes, metricas, prazo
+from app.core.tokens import contar_tokens, truncar_tokens
+from app.services import historico_service
+from app.services.busca_lexica import IndiceBM25, fundir_rrf, normalizar
 
 # ─── Carrega System Prompt ────────────────────────────────────────────────────
 try:
@@ -45,35 +67,187 @@ except FileNotFoundError:
     logger.warning(f"Arquivo '{SYSTEM_PROMPT_PATH}' não encontrado. Usando prompt padrão.")
 
 # ─── Carrega índice FAISS e metadados ─────────────────────────────────────────
-try:
+def _assinatura_indice() -> tuple:
+    """Identifica a versão do índice em disco (muda quando o índice é reconstruído)."""
+    return tuple(os.stat(caminho).st_mtime_ns for caminho in (INDEX_PATH, DATA_PATH))
+
+# Metadados gravados por scripts/generate_faq_index.py: chunk_text, original_question,
+# original_answer e faq_id. Bases antigas usavam as colunas do base.txt (Pergunta / Resposta Padrão).
+def _texto_indexado(item: dict) -> str:
+    """Texto do chunk usado na busca lexical."""
+    return item.get("chunk_text") or f"{item.get('Pergunta', '')} {item.get('Resposta Padrão', '')}"
+
+def _pergunta_do_item(item: dict) -> str:
+    return item.get("original_question") or item.get("Pergunta") or ""
+
+def _resposta_do_item(item: dict) -> str:
+    return (item.get("original_answer") or item.get("Resposta Padrão") or "").strip()
+
+def _faq_do_item(item: dict):
+    """Identificador do FAQ de origem do chunk."""
+    return item.get("faq_id", _pergunta_do_item(item))
+
+def carregar_indice():
+    """Carrega (ou recarrega) o índice FAISS, a base de conhecimento e o índice lexical."""
+    global index, base_conhecimento, assinatura_indice, indice_lexico, perguntas_normalizadas
     index = faiss.read_index(INDEX_PATH)
     with open(DATA_PATH, "rb") as f:
         base_conhecimento = pickle.load(f)
+    indice_lexico = IndiceBM25([_texto_indexado(item) for item in base_conhecimento])
+    perguntas_normalizadas = {}
+    for idx, item in enumerate(base_conhecimento):
+        perguntas_normalizadas.setdefault(normalizar(_pergunta_do_item(item)), idx)
+    assinatura_indice = _assinatura_indice()
     logger.info("Índice FAISS e base de conhecimento carregados com sucesso.")
     logger.info(f"Dimensão do índice FAISS: {index.d}")
+
+try:
+    carregar_indice()
 except Exception as e:
     logger.exception(f"Erro ao inicializar FAQ service: {e}")
     raise
 
+# ─── Cache semântico de respostas ─────────────────────────────────────────────
+class CacheSemantico:
+    """
+    Guarda respostas já geradas indexadas pelo embedding (normalizado) da pergunta.
+    Perguntas com similaridade de cosseno acima do limiar e mesmo histórico
+    reaproveitam a resposta sem nova chamada ao chat. Perguntas respondidas pelo
+    caminho lexical (sem embedding) usam uma chave exata.
+    """
+
+    def __init__(self, limiar: float, ttl_segundos: float, max_itens: int):
+        self.limiar = limiar
+        self.ttl_segundos = ttl_segundos
+        self.max_itens = max_itens
+        self.entradas = []
+        self.exatas: "OrderedDict[str, dict]" = OrderedDict()
+        self.index = None
+        self.consultas = 0
+        self.acertos = 0
+
+    @staticmethod
+    def _normalizar(emb: np.ndarray) -> np.ndarray:
+        vetor = np.array(emb, dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(vetor)
+        return vetor
+
+    @staticmethod
+    def chave_historico(historico: list) -> str:
+        mensagens = [m for m in (historico or []) if m.get("role") in ("user", "assistant")]
+        return hashlib.sha256(json.dumps(mensagens, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _reconstruir(self):
+        """Remove entradas expiradas e reconstrói o índice interno."""
+        agora = time.time()
+        self.entradas = [e for e in self.entradas if agora - e["criado_em"] <= self.ttl_segundos][-self.max_itens:]
+        self.index = None
+        if self.entradas:
+            self.index = faiss.IndexFlatIP(self.entradas[0]["vetor"].shape[1])
+            self.index.add(np.vstack([e["vetor"] for e in self.entradas]))
+
+    def limpar(self):
+        self.entradas = []
+        self.exatas.clear()
+        self.index = None
+
+    @classmethod
+    def chave_exata(cls, pergunta: str, historico: list, faq_id) -> str:
+        """Pergunta normalizada + histórico + FAQ do melhor resultado lexical."""
+        partes = [normalizar(pergunta), cls.chave_historico(historico), str(faq_id)]
+        return hashlib.sha256(json.dumps(partes, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def buscar_exata(self, chave: str) -> Optional[dict]:
+        self.consultas += 1
+        entrada = self.exatas.get(chave)
+        if entrada is None or time.time() - entrada["criado_em"] > self.ttl_segundos:
+            self.exatas.pop(chave, None)
+            metricas.ACESSOS_CACHE.inc(cache="faq_exato", resultado="falha")
+            return None
+        self.exatas.move_to_end(chave)
+        self.acertos += 1
+        metricas.ACESSOS_CACHE.inc(cache="faq_exato", resultado="acerto")
+        logger.info(f"[FAQ-CACHE] Acerto exato (caminho lexical): '{entrada['resultado']['pergunta_usuario']}'")
+        return entrada["resultado"]
+
+    def salvar_exata(self, chave: str, resultado: dict):
+        self.exatas[chave] = {"resultado": resultado, "criado_em": time.time()}
+        self.exatas.move_to_end(chave)
+        while len(self.exatas) > self.max_itens:
+            self.exatas.popitem(last=False)
+
+    def buscar(self, emb: np.ndarray, historico: list) -> Optional[dict]:
+        self.consultas += 1
+        if self.index is None or self.index.ntotal == 0:
+            return None
+        D, I = self.index.search(self._normalizar(emb), min(5, self.index.ntotal))
+        chave = self.chave_historico(historico)
+        agora = time.time()
+        for similaridade, idx in zip(D[0], I[0]):
+            if idx == -1 or similaridade < self.limiar:
+                break
+            entrada = self.entradas[idx]
+            if entrada["historico"] == chave and agora - entrada["criado_em"] <= self.ttl_segundos:
+                self.acertos += 1
+                metricas.ACESSOS_CACHE.inc(cache="faq_semantico", resultado="acerto")
+                logger.info(f"[FAQ-CACHE] Acerto semântico (similaridade {similaridade:.4f}): '{entrada['pergunta']}'")
+                return entrada["resultado"]
+        metricas.ACESSOS_CACHE.inc(cache="faq_semantico", resultado="falha")
+        return None
+
+    def salvar(self, emb: np.ndarray, pergunta: str, historico: list, resultado: dict):
+        self.entradas.append({
+            "vetor": self._normalizar(emb),
+            "pergunta": pergunta,
+            "historico": self.chave_historico(historico),
+            "resultado": resultado,
+            "criado_em": time.time()
+        })
+        if len(self.entradas) > self.max_itens or self.index is None:
+            self._reconstruir()
+        else:
+            self.index.add(self.entradas[-1]["vetor"])
+
+    def estatisticas(self) -> dict:
+        return {
+            "consultas": self.consultas,
+            "acertos": self.acertos,
+            "taxa_acerto": self.acertos / self.consultas if self.consultas else None,
+            "itens": len(self.entradas),
+            "itens_exatos": len(self.exatas)
+        }
+
+cache_semantico = CacheSemantico(CACHE_SIMILARIDADE, CACHE_TTL_SEGUNDOS, CACHE_MAX_ITENS)
+
+def verificar_indice_atualizado():
+    """Recarrega o índice e invalida o cache semântico se o índice foi reconstruído em disco."""
+    try:
+        if _assinatura_indice() != assinatura_indice:
+            logger.info("[FAQ-CACHE] Índice do FAQ reconstruído; recarregando e invalidando o cache semântico.")
+            carregar_indice()
+            cache_semantico.limpar()
+    except OSError as e:
+        logger.warning(f"[FAQ-CACHE] Não foi possível verificar o índice do FAQ: {e}")
+
 # ─── Função de geração de embedding com retry ───────────────────────────────────
-@retry(wait=wait_exponential(min=1, max=10), stop=stop_after_attempt(3))
-def gerar_embedding(texto: str) -> np.ndarray:
+# Sem novas tentativas (nem esperas) além do prazo da requisição, quando houver
+@retry(
+    wait=prazo.espera_no_prazo(wait_exponential(min=1, max=10)),
+    stop=stop_after_attempt(3) | prazo.parar_se_esgotado
+)
+async def gerar_embedding(texto: str) -> np.ndarray:
     """
     Chama o endpoint de embeddings e retorna o vetor.
     """
-    resp = client.embeddings.create(
-        input=[texto],
-        model=EMBED_MODEL
-    )
-    vec = np.array(resp.data[0].embedding, dtype="float32")
+    # Agrupado com os embeddings de outras perguntas concorrentes (app.core.lotes).
     # CORREÇÃO FINAL: A normalização foi removida pois o índice é L2.
-    return vec.reshape(1, -1)
+    return await lotes.gerar_embedding(texto, EMBED_MODEL, operacao="embedding_faq")
 
 # ─── Monta o prompt do chat com RAG ────────────────────────────────────────────
-def montar_mensagens(pergunta: str, blocos_contexto: list, historico: list) -> list:
+def montar_mensagens(pergunta: str, blocos_contexto: list, historico: list, resumo: str = None) -> list:
     """
     Retorna lista de mensagens para o chat completions, incluindo system, contexto,
-    histórico e última pergunta do usuário.
+    resumo da conversa anterior, histórico e última pergunta do usuário.
     """
     msgs = [{"role": "system", "content": SYSTEM_PROMPT}]
     if blocos_contexto:
@@ -82,6 +256,8 @@ def montar_mensagens(pergunta: str, blocos_contexto: list, historico: list) -> l
             "role": "system",
             "content": f"Contexto relevante:\n\n{contexto}"
         })
+    if resumo:
+        msgs.append({"role": "system", "content": f"Resumo da conversa anterior:\n{resumo}"})
     if historico:
         for msg in historico:
             if msg.get("role") in ("user", "assistant"):
@@ -89,68 +265,268 @@ def montar_mensagens(pergunta: str, blocos_contexto: list, historico: list) -> l
     msgs.append({"role": "user", "content": pergunta})
     return msgs
 
-# ─── Pipeline principal de busca e resposta ───────────────────────────────────
-def buscar_e_responder(pergunta: str, historico: list = None) -> dict:
+async def preparar_mensagens(pergunta: str, blocos_contexto: list, historico: list) -> list:
+    """Monta as mensagens com o histórico compactado no orçamento de tokens do prompt."""
+    reservados = historico_service.tokens_mensagens(montar_mensagens(pergunta, blocos_contexto, []))
+    resumo, recentes = await historico_service.compactar_historico(historico, tokens_reservados=reservados)
+    mensagens = montar_mensagens(pergunta, blocos_contexto, recentes, resumo)
+    logger.info(f"[FAQ] Tokens estimados do prompt: {historico_service.tokens_mensagens(mensagens)}")
+    return mensagens
+
+# ─── Recuperação de contexto (embedding + FAISS) ──────────────────────────────
+async def gerar_embedding_pergunta(pergunta: str) -> Optional[np.ndarray]:
+    """Embedding da pergunta, ou None para perguntas curtas demais para a busca."""
+    if len(pergunta.strip()) > 3:
+        return await gerar_embedding(pergunta)
+    return None
+
+estatisticas_recuperacao = {"consultas": 0, "caminho_rapido_lexical": 0}
+
+def buscar_lexical(pergunta: str) -> list:
     """
-    Pipeline de busca e resposta com lógica corrigida para L2.
+    Busca BM25 sobre os chunks do FAQ. Uma pergunta idêntica (normalizada) a uma
+    pergunta da base vem primeiro, com score infinito.
+    """
+    resultados = [(idx, score) for idx, score in indice_lexico.buscar(pergunta, K_CANDIDATOS) if score >= BM25_MINIMO]
+    idx_exato = perguntas_normalizadas.get(normalizar(pergunta))
+    if idx_exato is not None:
+        resultados = [(idx_exato, float("inf"))] + [r for r in resultados if r[0] != idx_exato]
+    return resultados
+
+def lexico_forte(resultados_lexicos: list) -> bool:
+    """O melhor resultado lexical é forte o bastante para dispensar a busca vetorial?"""
+    if not resultados_lexicos:
+        return False
+    idx_melhor, melhor = resultados_lexicos[0]
+    # A margem é medida contra o melhor chunk de outra pergunta, não contra chunks da mesma
+    pergunta_melhor = _pergunta_do_item(base_conhecimento[idx_melhor])
+    segundo = next(
+        (score for idx, score in resultados_lexicos[1:] if _pergunta_do_item(base_conhecimento[idx]) != pergunta_melhor),
+        0.0
+    )
+    return melhor >= BM25_FORTE and melhor >= BM25_MARGEM * segundo
+
+def agrupar_por_faq(ids_chunks: list) -> list:
+    """Colapsa os chunks (em ordem de relevância) nos FAQs de origem, sem repetição."""
+    vistos, itens = set(), []
+    for idx in ids_chunks:
+        item = base_conhecimento[idx]
+        faq = _faq_do_item(item)
+        if faq in vistos:
+            continue
+        vistos.add(faq)
+        itens.append(item)
+    return itens
+
+def empacotar_contexto(itens: list, max_tokens: int = None) -> list:
+    """
+    Monta os blocos "Pergunta/Resposta" em ordem de relevância até o orçamento de tokens.
+    O FAQ mais relevante sempre entra, truncado se sozinho exceder o orçamento.
+    """
+    max_tokens = max_tokens or MAX_TOKENS_CONTEXTO
+    selecionados, tokens_usados = [], 0
+    for item in itens[:MAX_FAQS_CONTEXTO]:
+        bloco = f"Pergunta: {_pergunta_do_item(item)}\nResposta: {_resposta_do_item(item)}"
+        tokens = contar_tokens(bloco)
+        if not selecionados:
+            # O primeiro FAQ entra sempre, cortado no orçamento se for maior que ele
+            if tokens > max_tokens:
+                bloco = truncar_tokens(bloco, max_tokens)
+                tokens = contar_tokens(bloco)
+        elif tokens_usados + tokens > max_tokens:
+            continue
+        selecionados.append((item, bloco))
+        tokens_usados += tokens
+    if selecionados:
+        logger.info(f"[FAQ] Contexto: {len(selecionados)} FAQ(s), {tokens_usados} tokens (orçamento {max_tokens}).")
+    return selecionados
+
+async def recuperar_contexto(pergunta: str, emb: Optional[np.ndarray] = None, resultados_lexicos: list = None) -> dict:
+    """
+    Busca os FAQs mais próximos da pergunta: vetorial (FAISS, filtro L2) e lexical (BM25),
+    fundidas por Reciprocal Rank Fusion. Sem embedding, usa apenas o resultado lexical.
+    Os chunks são agrupados por FAQ de origem e empacotados no orçamento de tokens.
     """
-    historico = historico or []
-    blocos, perguntas_usadas, respostas_usadas = [], [], []
     rag_scores = []
+    resultados_lexicos = resultados_lexicos if resultados_lexicos is not None else buscar_lexical(pergunta)
+    ids_vetoriais = []
 
-    if len(pergunta.strip()) > 3:
-        emb = gerar_embedding(pergunta)
+    if emb is not None:
         if emb.shape[1] != index.d:
             raise ValueError(f"Disparidade de dimensão! Embedding: {emb.shape[1]}, Índice: {index.d}.")
 
-        D, I = index.search(emb, K_VIZINHOS)
-        rag_scores = [f'{s:.4f}' for s in D[0]]
+        # Busca mais chunks do que FAQs necessários, já que vários chunks costumam vir do
+        # mesmo FAQ. Buscas concorrentes são agrupadas numa única chamada ao FAISS.
+        D, I = await lotes.buscar_faiss(index, emb, K_CANDIDATOS)
+        rag_scores = [f'{s:.4f}' for s in D[0][:K_VIZINHOS]]
 
         # CORREÇÃO FINAL: Lógica de filtro para L2 (score < threshold).
-        for score, idx in zip(D[0], I[0]):
-            if idx != -1 and score < THRESHOLD_L2:
-                try:
-                    item = base_conhecimento[idx]
-                    perguntas_usadas.append(item["Pergunta"])
-                    respostas_usadas.append(item["Resposta Padrão"])
-                    blocos.append(f"Pergunta: {item['Pergunta']}\nResposta: {item['Resposta Padrão']}")
-                except KeyError:
-                    logger.error(f"DEBUG: O item do índice {idx} não contém a chave 'Pergunta' ou 'Resposta Padrão'.")
-                    logger.error(f"DEBUG: Conteúdo do item: {item}")
-                    logger.error(f"DEBUG: Chaves disponíveis no item: {item.keys()}")
-                    continue
+        ids_vetoriais = [int(idx) for score, idx in zip(D[0], I[0]) if idx != -1 and score < THRESHOLD_L2]
+
+    ids_lexicos = [idx for idx, _ in resultados_lexicos]
+    ids_fundidos = fundir_rrf([ids_vetoriais, ids_lexicos], k=RRF_K)
+    selecionados = empacotar_contexto(agrupar_por_faq(ids_fundidos))
+    logger.info(f"Chunks vetoriais: {len(ids_vetoriais)} | Chunks lexicais: {len(ids_lexicos)} | FAQs no contexto: {len(selecionados)}")
 
+    perguntas_usadas = [_pergunta_do_item(item) for item, _ in selecionados]
+    respostas_usadas = [_resposta_do_item(item) for item, _ in selecionados]
+    blocos = [bloco for _, bloco in selecionados]
+
+    logger.info(f"Scores RAG: {rag_scores}")
     if blocos:
-        mensagens = montar_mensagens(pergunta, blocos, historico)
-    else:
-        mensagens = montar_mensagens(pergunta, [], historico) # Envia sem contexto RAG
+        logger.info(f"Perguntas base utilizadas: {perguntas_usadas}")
+
+    return {
+        "blocos": blocos,
+        "perguntas_base": perguntas_usadas,
+        "respostas_base": respostas_usadas,
+        "rag_scores": rag_scores
+    }
+
+async def _embedding_ou_caminho_lexical(pergunta: str) -> tuple:
+    """
+    Executa a busca lexical e só gera o embedding se ela não for conclusiva.
+    Retorna (embedding ou None, resultados lexicais).
+    """
+    estatisticas_recuperacao["consultas"] += 1
+    resultados_lexicos = buscar_lexical(pergunta)
+    if lexico_forte(resultados_lexicos):
+        estatisticas_recuperacao["caminho_rapido_lexical"] += 1
+        logger.info("[FAQ] Acerto lexical forte; embedding dispensado.")
+        return None, resultados_lexicos
+    return await gerar_embedding_pergunta(pergunta), resultados_lexicos
+
+def _buscar_no_cache(pergunta: str, historico: list, emb: Optional[np.ndarray], resultados_lexicos: list) -> Optional[dict]:
+    """Cache semântico pelo embedding ou, no caminho lexical, pela chave exata."""
+    if emb is not None:
+        return cache_semantico.buscar(emb, historico)
+    if resultados_lexicos:
+        faq_id = _faq_do_item(base_conhecimento[resultados_lexicos[0][0]])
+        return cache_semantico.buscar_exata(cache_semantico.chave_exata(pergunta, historico, faq_id))
+    return None
+
+def _salvar_no_cache(pergunta: str, historico: list, emb: Optional[np.ndarray], resultados_lexicos: list, resultado: dict):
+    if emb is not None:
+        cache_semantico.salvar(emb, pergunta, historico, resultado)
+    elif resultados_lexicos:
+        faq_id = _faq_do_item(base_conhecimento[resultados_lexicos[0][0]])
+        cache_semantico.salvar_exata(cache_semantico.chave_exata(pergunta, historico, faq_id), resultado)
 
-    response = client.chat.completions.create(
+def estatisticas_faq() -> dict:
+    """Métricas do cache semântico e da recuperação híbrida."""
+    return {"cache_semantico": cache_semantico.estatisticas(), "recuperacao": dict(estatisticas_recuperacao)}
+
+def _logar_uso(usage):
+    if usage:
+        logger.info(
+            f"Tokens prompt: {usage.prompt_tokens} | "
+            f"Tokens completion: {usage.completion_tokens} | "
+            f"Total: {usage.total_tokens}"
+        )
+
+# ─── Pipeline principal de busca e resposta ───────────────────────────────────
+async def buscar_e_responder(pergunta: str, historico: list = None) -> dict:
+    """
+    Pipeline de busca e resposta com lógica corrigida para L2.
+    """
+    historico = historico or []
+    verificar_indice_atualizado()
+    emb, resultados_lexicos = await _embedding_ou_caminho_lexical(pergunta)
+    em_cache = _buscar_no_cache(pergunta, historico, emb, resultados_lexicos)
+    if em_cache is not None:
+        return {**em_cache, "pergunta_usuario": pergunta}
+
+    contexto = await recuperar_contexto(pergunta, emb, resultados_lexicos)
+    blocos = contexto["blocos"]
+
+    # Sem blocos, envia sem contexto RAG
+    mensagens = await preparar_mensagens(pergunta, blocos, historico)
+
+    response = await llm.chat_completion(
+        operacao="faq_resposta",
         model=CHAT_MODEL,
         messages=mensagens,
-        temperature=0.7 
+        temperature=0.7
     )
     conteudo = response.choices[0].message.content
-    usage = response.usage
-
-    logger.info(
-        f"Tokens prompt: {usage.prompt_tokens} | "
-        f"Tokens completion: {usage.completion_tokens} | "
-        f"Total: {usage.total_tokens}"
-    )
-    logger.info(f"Scores RAG: {rag_scores}")
+    _logar_uso(response.usage)
 
     if blocos:
-        logger.info(f"Perguntas base utilizadas: {perguntas_usadas}")
         conteudo = f"* {conteudo}"
 
-    return {
+    resultado = {
         "pergunta_usuario": pergunta,
         "rag_utilizado": bool(blocos),
-        "perguntas_base": perguntas_usadas,
-        "respostas_base": respostas_usadas,
+        "perguntas_base": contexto["perguntas_base"],
+        "respostas_base": contexto["respostas_base"],
         "resposta_gerada": conteudo
     }
+    _salvar_no_cache(pergunta, historico, emb, resultados_lexicos, resultado)
+    return resultado
+
+async def buscar_e_responder_stream(pergunta: str, historico: list = None) -> AsyncIterator[dict]:
+    """
+    Versão em streaming do pipeline: emite primeiro os metadados da recuperação
+    ('metadados'), depois os trechos da resposta conforme o modelo os gera ('token')
+    e, ao final, a resposta completa ('fim').
+    """
+    historico = historico or []
+    verificar_indice_atualizado()
+    emb, resultados_lexicos = await _embedding_ou_caminho_lexical(pergunta)
+    em_cache = _buscar_no_cache(pergunta, historico, emb, resultados_lexicos)
+    if em_cache is not None:
+        yield {
+            "tipo": "metadados",
+            "pergunta_usuario": pergunta,
+            "rag_utilizado": em_cache["rag_utilizado"],
+            "perguntas_base": em_cache["perguntas_base"],
+            "respostas_base": em_cache["respostas_base"]
+        }
+        yield {"tipo": "token", "conteudo": em_cache["resposta_gerada"]}
+        yield {"tipo": "fim", "resposta_gerada": em_cache["resposta_gerada"]}
+        return
+
+    contexto = await recuperar_contexto(pergunta, emb, resultados_lexicos)
+    blocos = contexto["blocos"]
+
+    yield {
+        "tipo": "metadados",
+        "pergunta_usuario": pergunta,
+        "rag_utilizado": bool(blocos),
+        "perguntas_base": contexto["perguntas_base"],
+        "respostas_base": contexto["respostas_base"]
+    }
+
+    partes = []
+    if blocos:
+        partes.append("* ")
+        yield {"tipo": "token", "conteudo": "* "}
+
+    stream = await llm.chat_completion(
+        operacao="faq_resposta_stream",
+        model=CHAT_MODEL,
+        messages=await preparar_mensagens(pergunta, blocos, historico),
+        temperature=0.7,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            trecho = chunk.choices[0].delta.content
+            partes.append(trecho)
+            yield {"tipo": "token", "conteudo": trecho}
+        if chunk.usage:
+            _logar_uso(chunk.usage)
+
+    resposta_gerada = "".join(partes)
+    _salvar_no_cache(pergunta, historico, emb, resultados_lexicos, {
+        "pergunta_usuario": pergunta,
+        "rag_utilizado": bool(blocos),
+        "perguntas_base": contexto["perguntas_base"],
+        "respostas_base": contexto["respostas_base"],
+        "resposta_gerada": resposta_gerada
+    })
+    yield {"tipo": "fim", "resposta_gerada": resposta_gerada}
 
 # ─── Exemplo de uso ───────────────────────────────────────────────────────────
 if __name__ == "__main__":
@@ -159,7 +535,7 @@ if __name__ == "__main__":
     else:
         test_question = "O que é AET?"
         try:
-            resultado = buscar_e_responder(test_question)
+            resultado = asyncio.run(buscar_e_responder(test_question))
             print("Pergunta:", test_question)
             print("\nResposta final:", resultado["resposta_gerada"])
             if resultado["rag_utilizado"]:
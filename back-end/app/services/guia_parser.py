@@ -0,0 +1,59 @@
+import re
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Padrões da página "Imprimir guia de agendamento" do portal BRMED, compilados uma única vez
+REGEX_NOME = re.compile(r"Nome / Name:\s*(.*?)(?:Identidade / ID Number:|\n)")
+REGEX_SECAO_EXAMES = re.compile(r"4\. Exames / Exams:")
+# Nome do exame em português: texto antes do primeiro '/' (ou a linha inteira)
+REGEX_EXAME = re.compile(r"^([A-ZÀ-Úa-zà-úÇçÊêÍíÓóÕõÂâÊêÔôÃãÕõÇç\s]+?)(?:\s*/.*)?$")
+
+# Linhas da seção de exames que não são exames (cabeçalhos e instruções de preparo)
+PREFIXOS_IGNORADOS = ("4. exames", "obrigatório")
+TERMOS_IGNORADOS = (
+    "não requer preparo prévio", "jejum", "horas antes do exame", "evitar", "não ingerir",
+    "manter dieta", "informar os medicamentos", "caso faça uso de óculos",
+    "não se expor a sons fortes", "voltar imprimir", "copyright",
+)
+REGEX_TERMOS_IGNORADOS = re.compile("|".join(re.escape(termo) for termo in TERMOS_IGNORADOS))
+
+def extrair_nome(conteudo: str) -> Optional[str]:
+    match = REGEX_NOME.search(conteudo)
+    if not match:
+        return None
+    nome = match.group(1).strip()
+    if nome:
+        nome = nome.split("\t")[0].split("  ")[0].strip()
+    return nome
+
+def extrair_exames(conteudo: str) -> List[str]:
+    """Percorre uma única vez as linhas da seção 4 (Exames), até o fim do texto."""
+    match = REGEX_SECAO_EXAMES.search(conteudo)
+    if not match:
+        return []
+    debug = logger.isEnabledFor(logging.DEBUG)
+    exames, vistos = [], set()
+    for linha in conteudo[match.start():].strip().splitlines():
+        linha_limpa = linha.strip().replace('\t', ' ')
+        if not linha_limpa:
+            continue
+        minuscula = linha_limpa.lower()
+        if minuscula.startswith(PREFIXOS_IGNORADOS) or REGEX_TERMOS_IGNORADOS.search(minuscula):
+            continue
+        match_exame = REGEX_EXAME.match(linha_limpa)
+        if match_exame:
+            exame = match_exame.group(1).strip()
+            if exame and exame not in vistos:
+                vistos.add(exame)
+                exames.append(exame)
+                if debug:
+                    logger.debug(f"[GUIA] Exame extraído da linha: {linha_limpa}")
+    return exames
+
+def extrair_guia(conteudo: str) -> Dict[str, Any]:
+    """Extrai o nome do paciente e os exames do texto da guia de encaminhamento."""
+    resultado = {"nome": extrair_nome(conteudo), "exames": extrair_exames(conteudo)}
+    logger.info(f"[GUIA] Nome: {resultado['nome']} | Exames extraídos: {len(resultado['exames'])}")
+    return resultado
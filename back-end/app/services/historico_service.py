@@ -0,0 +1,122 @@
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.core import llm
+from app.core.tokens import contar_tokens
+
+logger = logging.getLogger(__name__)
+
+# ─── Variáveis de ambiente ────────────────────────────────────────────────────
+MODELO_RESUMO          = os.getenv("FAQ_MODELO_RESUMO", os.getenv("MODELO_GPT", "gpt-3.5-turbo"))
+TURNOS_VERBATIM        = int(os.getenv("FAQ_HISTORICO_TURNOS", 3))
+MAX_TOKENS_PROMPT      = int(os.getenv("FAQ_MAX_TOKENS_PROMPT", 4000))
+MAX_TOKENS_RESUMO      = int(os.getenv("FAQ_MAX_TOKENS_RESUMO", 300))
+MAX_RESUMOS_CACHE      = int(os.getenv("FAQ_MAX_RESUMOS_CACHE", 1000))
+# Custo fixo aproximado de cada mensagem no formato do chat (role, separadores)
+TOKENS_POR_MENSAGEM    = 4
+
+PROMPT_RESUMO = """
+Você resume conversas de atendimento sobre saúde ocupacional.
+Atualize o resumo existente incorporando as novas mensagens. Mantenha fatos, números,
+nomes de exames, documentos e pendências citados pelo usuário; descarte cumprimentos.
+Responda apenas com o resumo, em português, em no máximo um parágrafo curto.
+""".strip()
+
+# Resumos já gerados, indexados pelo hash do prefixo da conversa que resumem
+_cache_resumos: "OrderedDict[str, str]" = OrderedDict()
+
+def _filtrar(historico: list) -> list:
+    return [
+        {"role": m["role"], "content": m.get("content") or ""}
+        for m in (historico or []) if m.get("role") in ("user", "assistant")
+    ]
+
+def tokens_mensagens(mensagens: list) -> int:
+    return sum(contar_tokens(m["content"]) + TOKENS_POR_MENSAGEM for m in mensagens)
+
+def _hashes_prefixos(mensagens: list) -> List[str]:
+    """Hash encadeado de cada prefixo da conversa: hashes[i] identifica mensagens[:i + 1]."""
+    hashes, atual = [], hashlib.sha256()
+    for m in mensagens:
+        atual.update(json.dumps(m, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        hashes.append(atual.copy().hexdigest())
+    return hashes
+
+def _guardar_resumo(chave: str, resumo: str):
+    _cache_resumos[chave] = resumo
+    _cache_resumos.move_to_end(chave)
+    while len(_cache_resumos) > MAX_RESUMOS_CACHE:
+        _cache_resumos.popitem(last=False)
+
+async def resumir(mensagens: list) -> Optional[str]:
+    """
+    Resumo incremental das mensagens antigas: parte do maior prefixo já resumido
+    e envia ao modelo apenas o resumo anterior e as mensagens novas.
+    """
+    if not mensagens:
+        return None
+    hashes = _hashes_prefixos(mensagens)
+    if hashes[-1] in _cache_resumos:
+        _cache_resumos.move_to_end(hashes[-1])
+        return _cache_resumos[hashes[-1]]
+
+    inicio, resumo_anterior = 0, ""
+    for i in range(len(hashes) - 2, -1, -1):
+        if hashes[i] in _cache_resumos:
+            inicio, resumo_anterior = i + 1, _cache_resumos[hashes[i]]
+            break
+
+    novas = "\n".join(f"{m['role']}: {m['content']}" for m in mensagens[inicio:])
+    try:
+        response = await llm.chat_completion(
+            operacao="faq_resumo_historico",
+            model=MODELO_RESUMO,
+            messages=[
+                {"role": "system", "content": PROMPT_RESUMO},
+                {"role": "user", "content": f"Resumo existente:\n{resumo_anterior or '(vazio)'}\n\nNovas mensagens:\n{novas}"}
+            ],
+            temperature=0,
+            max_tokens=MAX_TOKENS_RESUMO
+        )
+    except Exception as e:
+        logger.warning(f"[HISTORICO] Falha ao resumir histórico, mensagens antigas descartadas: {e}")
+        return resumo_anterior or None
+    resumo = (response.choices[0].message.content or "").strip()
+    _guardar_resumo(hashes[-1], resumo)
+    logger.info(f"[HISTORICO] Resumo atualizado: {len(mensagens) - inicio} mensagem(ns) nova(s) incorporada(s).")
+    return resumo
+
+def _truncar(texto: str, max_tokens: int) -> str:
+    tokens = contar_tokens(texto)
+    if tokens <= max_tokens:
+        return texto
+    return texto[:max(int(len(texto) * max_tokens / tokens), 0)]
+
+async def compactar_historico(historico: list, tokens_reservados: int = 0) -> Tuple[Optional[str], list]:
+    """
+    Mantém os últimos turnos literalmente e substitui os anteriores por um resumo,
+    respeitando o orçamento de tokens do prompt. Retorna (resumo ou None, mensagens literais).
+    """
+    mensagens = _filtrar(historico)
+    orcamento = max(MAX_TOKENS_PROMPT - tokens_reservados, 0)
+    corte = max(len(mensagens) - 2 * TURNOS_VERBATIM, 0)
+    antigas, recentes = mensagens[:corte], mensagens[corte:]
+
+    # Se as mensagens recentes sozinhas estouram o orçamento, as mais antigas vão para o resumo
+    while recentes and tokens_mensagens(recentes) + (MAX_TOKENS_RESUMO if antigas else 0) > orcamento:
+        antigas.append(recentes.pop(0))
+
+    resumo = await resumir(antigas)
+    if resumo:
+        resumo = _truncar(resumo, max(orcamento - tokens_mensagens(recentes) - TOKENS_POR_MENSAGEM, 0)) or None
+
+    logger.info(
+        f"[HISTORICO] Mensagens literais: {len(recentes)} | Resumidas: {len(antigas)} | "
+        f"Tokens do histórico: {tokens_mensagens(recentes) + contar_tokens(resumo or '')} | "
+        f"Tokens reservados: {tokens_reservados} | Orçamento do prompt: {MAX_TOKENS_PROMPT}"
+    )
+    return resumo, recentes
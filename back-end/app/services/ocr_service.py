@@ -2,74 +2,189 @@ import os
 # Set environment variable for PyTorch memory management
 os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "expandable_segments:True"
 
+import time
+import asyncio
 import tempfile
+import threading
 from docling.document_converter import DocumentConverter
 import torch
 import re
 import json
-from openai import OpenAI
+import hashlib
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
 import logging
 
 from app.core.config import settings
+from app.core import llm, prazo, metricas, rastreamento
+from app.core.artefatos import armazem_artefatos
+from app.services import compactacao_service
 
 logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
 # Prompt detalhado para LLM
 MODELO_GPT = settings.MODELO_GPT
 
-# Prompt detalhado para LLM
+# Regras de extração de exames (compartilhadas pelo prompt estruturado)
 PROMPT_EXTRAIR_EXAMES = """
-Você é um assistente de extração de dados altamente preciso.
-Sua tarefa é extrair a lista de nomes de exames de um texto.
 Considere como exame qualquer linha que contenha uma lista clara de exames ou procedimentos realizados, linhas no formato 'NOME DO EXAME - DATA',
 ou qualquer header do tipo '## NOME DO EXAME'. Extraia o nome do exame do header, ignorando o prefixo '##' e espaços.
 Nesses casos, extraia apenas o nome antes do hífen como exame.
 Se o texto não contiver uma lista clara de exames ou procedimentos, retorne uma lista vazia.
 Não infira exames a partir de menções genéricas como 'exame de sangue'.
-Responda APENAS com um objeto JSON válido, sem nenhum texto adicional antes ou depois.
-O formato do JSON deve ser: {"exames": ["<exame1>", "<exame2>"]}.
-Se nenhum exame for encontrado, use uma lista vazia [] para a chave "exames".
 Não invente exames e ignore informações irrelevantes.
 Retorne os nomes dos exames em caixa alta.
 """
 
+# Regras de extração de CPF (compartilhadas pelo prompt estruturado)
 PROMPT_EXTRAIR_CPF = """
-Você é um assistente de extração de dados altamente preciso.
-Sua tarefa é extrair o CPF (apenas números, sem pontuação) de um texto.
+Os CPFs devem conter apenas números, sem pontuação.
 ATENÇÃO: Se houver um CPF imediatamente após uma sigla de UF (por exemplo, CE/67495788372, SP/12345678901, etc),
-você DEVE priorizar e retornar esse CPF, ignorando outros CPFs que possam aparecer no texto.
-Se houver mais de um padrão UF/CPF, retorne o primeiro que aparecer.
-Se não houver nenhum CPF após UF, aí sim retorne o primeiro CPF de 11 dígitos encontrado.
-Responda APENAS com um objeto JSON válido, sem nenhum texto adicional antes ou depois.
-O formato do JSON deve ser: {"cpf": "<cpf_extraido>"}.
-Se o CPF não for encontrado, use o valor null para a chave "cpf".
+você DEVE priorizar esse CPF como CPF principal, ignorando outros CPFs que possam aparecer no texto.
+Se houver mais de um padrão UF/CPF, use o primeiro que aparecer.
+Se não houver nenhum CPF após UF, aí sim use o primeiro CPF de 11 dígitos encontrado.
+Liste também TODOS os CPFs encontrados no texto, na ordem em que aparecem.
 """
 
-def extrair_cpf_ia(markdown: str) -> str:
-    """Extrai CPF do markdown usando LLM."""
-    user_prompt = f"""Texto:\n{markdown}"""
+PROMPT_EXTRAIR_DOCUMENTO = f"""
+Você é um assistente de extração de dados altamente preciso.
+Sua tarefa é extrair, de um único texto, a lista de nomes de exames, o CPF principal, todos os CPFs e o nome do paciente.
+
+Exames:
+{PROMPT_EXTRAIR_EXAMES}
+CPF:
+{PROMPT_EXTRAIR_CPF}
+Responda APENAS com um objeto JSON válido no formato:
+{{"exames": ["<exame1>"], "cpf": "<cpf_principal>", "cpfs": ["<cpf1>", "<cpf2>"], "nome_paciente": "<nome>"}}.
+Use [] para listas vazias e null quando o CPF principal ou o nome do paciente não forem encontrados.
+"""
+
+# Schema da resposta estruturada (Structured Outputs)
+SCHEMA_EXTRACAO_DOCUMENTO = {
+    "name": "extracao_documento",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "exames": {"type": "array", "items": {"type": "string"}},
+            "cpf": {"type": ["string", "null"]},
+            "cpfs": {"type": "array", "items": {"type": "string"}},
+            "nome_paciente": {"type": ["string", "null"]}
+        },
+        "required": ["exames", "cpf", "cpfs", "nome_paciente"],
+        "additionalProperties": False
+    }
+}
+
+# Versão do prompt: entra na chave dos caches, invalidando-os quando prompt ou schema mudam
+VERSAO_PROMPT_EXTRACAO = hashlib.sha256(
+    (PROMPT_EXTRAIR_DOCUMENTO + json.dumps(SCHEMA_EXTRACAO_DOCUMENTO, sort_keys=True)).encode("utf-8")
+).hexdigest()[:12]
+
+# Cache da extração estruturada por hash do documento (LRU simples em memória)
+MAX_CACHE_EXTRACAO = 256
+_cache_extracao: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+# Extrações em andamento por hash: chamadas concorrentes do mesmo documento aguardam a primeira
+_extracoes_em_andamento: Dict[str, asyncio.Future] = {}
+
+def _hash_documento(markdown: str) -> str:
+    return hashlib.sha256(f"{MODELO_GPT}\n{VERSAO_PROMPT_EXTRACAO}\n{markdown}".encode("utf-8")).hexdigest()
+
+@rastreamento.rastrear("ocr.extracao_ia")
+async def extrair_dados_documento_ia(markdown: str) -> Dict[str, Any]:
+    """
+    Extrai exames, CPF principal, todos os CPFs e nome do paciente em uma única
+    chamada ao LLM. O resultado é cacheado pelo hash do documento, e chamadas simultâneas
+    para o mesmo documento compartilham a mesma chamada.
+    """
+    chave = _hash_documento(markdown)
+    span = rastreamento.span_atual()
+    span.definir(caracteres=len(markdown), cache_acerto=chave in _cache_extracao)
+    if chave in _cache_extracao:
+        metricas.ACESSOS_CACHE.inc(cache="extracao_documento", resultado="acerto")
+        _cache_extracao.move_to_end(chave)
+        logger.info("[OCR] Extração estruturada reaproveitada do cache.")
+        return _cache_extracao[chave]
+
+    while (em_andamento := _extracoes_em_andamento.get(chave)) is not None:
+        span.definir(em_andamento=True)
+        metricas.ACESSOS_CACHE.inc(cache="extracao_documento", resultado="em_andamento")
+        logger.info("[OCR] Extração do mesmo documento em andamento; aguardando o resultado.")
+        try:
+            return await asyncio.shield(em_andamento)
+        except asyncio.CancelledError:
+            # Só segue se quem foi cancelada é a extração original (esta chamada assume)
+            if not em_andamento.cancelled():
+                raise
+
+    metricas.ACESSOS_CACHE.inc(cache="extracao_documento", resultado="falha")
+    futuro = asyncio.get_running_loop().create_future()
+    _extracoes_em_andamento[chave] = futuro
     try:
-        response = client.chat.completions.create(
+        dados = await _extrair_dados_documento(markdown, chave)
+    except asyncio.CancelledError:
+        futuro.cancel()
+        raise
+    except BaseException as e:
+        futuro.set_exception(e)
+        futuro.exception()  # evita o aviso de exceção não consumida quando ninguém aguarda
+        raise
+    else:
+        futuro.set_result(dados)
+        return dados
+    finally:
+        _extracoes_em_andamento.pop(chave, None)
+
+async def _extrair_dados_documento(markdown: str, chave: str) -> Dict[str, Any]:
+    """Compactação + chamada ao LLM; guarda no cache só as extrações bem-sucedidas."""
+    relatorio_compactacao = None
+    texto = markdown
+    if settings.COMPACTAR_MARKDOWN:
+        compactado = compactacao_service.compactar_markdown(markdown)
+        texto, relatorio_compactacao = compactado["markdown"], compactado["relatorio"]
+
+    user_prompt = f"""Texto:
+{texto}"""
+    try:
+        response = await llm.chat_completion(
+            operacao="extrair_documento",
+            hedge=True,
+            versao_prompt=VERSAO_PROMPT_EXTRACAO,
             model=MODELO_GPT,
             messages=[
-                {"role": "system", "content": PROMPT_EXTRAIR_CPF},
+                {"role": "system", "content": PROMPT_EXTRAIR_DOCUMENTO},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0,
-            response_format={"type": "json_object"}
+            response_format={"type": "json_schema", "json_schema": SCHEMA_EXTRACAO_DOCUMENTO}
         )
         data = json.loads(response.choices[0].message.content)
-        return data.get("cpf")
     except json.JSONDecodeError:
-        return None
+        return {"exames": [], "cpf": None, "cpfs": [], "nome_paciente": None, "erro": "Falha ao decodificar o JSON da resposta da IA."}
     except Exception as e:
-        print(f"Erro ao extrair CPF via IA: {e}")
-        return None
+        return {"exames": [], "cpf": None, "cpfs": [], "nome_paciente": None, "erro": f"Ocorreu um erro inesperado: {e}"}
+
+    if "exames" not in data:
+        return {"exames": [], "cpf": None, "cpfs": [], "nome_paciente": None, "erro": "Resposta da IA não contém a chave 'exames'."}
 
+    dados = {
+        "exames": data.get("exames") or [],
+        "cpf": data.get("cpf"),
+        "cpfs": data.get("cpfs") or [],
+        "nome_paciente": data.get("nome_paciente"),
+        "compactacao": relatorio_compactacao
+    }
+    _cache_extracao[chave] = dados
+    if len(_cache_extracao) > MAX_CACHE_EXTRACAO:
+        _cache_extracao.popitem(last=False)
+    return dados
+
+async def extrair_cpf_ia(markdown: str) -> str:
+    """Extrai CPF do markdown usando LLM (reaproveita a extração estruturada)."""
+    return (await extrair_dados_documento_ia(markdown)).get("cpf")
 
+
+@rastreamento.rastrear("ocr.docling")
 def processar_arquivo_docling(file) -> str:
     """Processa o arquivo com Docling e retorna o markdown extraído."""
     from docling.datamodel.base_models import InputFormat
@@ -89,43 +204,107 @@ def processar_arquivo_docling(file) -> str:
     )
     resultado = converter.convert(file)
     markdown = resultado.document.export_to_markdown()
+    rastreamento.span_atual().definir(paginas=len(getattr(resultado, "pages", None) or []), caracteres=len(markdown))
     return markdown
 
-def extrair_exames_ia(markdown: str) -> Dict[str, Any]:
-    """Extrai apenas exames do markdown usando LLM."""
-    user_prompt = f"""Texto:
-{markdown}"""
+# Conversões Docling uma por vez (como quando rodavam no event loop), agora fora dele
+_lock_docling = threading.Lock()
+
+def _converter_arquivo_temporario(caminho: str, limite: Optional[float]) -> str:
+    """Converte e remove o arquivo; desiste sem converter se o prazo acabou na fila."""
     try:
-        response = client.chat.completions.create(
-            model=MODELO_GPT,
-            messages=[
-                {"role": "system", "content": PROMPT_EXTRAIR_EXAMES},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        data = json.loads(response.choices[0].message.content)
-        if "exames" not in data:
-            return {"exames": [], "erro": "Resposta da IA não contém a chave 'exames'."}
-        return data
-    except json.JSONDecodeError:
-        return {"exames": [], "erro": "Falha ao decodificar o JSON da resposta da IA."}
-    except Exception as e:
-        return {"exames": [], "erro": f"Ocorreu um erro inesperado: {e}"}
+        with _lock_docling:
+            if limite is not None and time.monotonic() >= limite:
+                raise prazo.PrazoEsgotado("ocr")
+            with metricas.DURACAO_DOCLING.cronometrar():
+                return processar_arquivo_docling(caminho)
+    finally:
+        os.remove(caminho) # Garante que o arquivo temporário seja removido
 
-def extrair_cpf_regex(markdown: str) -> str:
-    # Tenta encontrar o padrão UF/CPF primeiro (ex: CE/12345678900)
-    uf_cpf_match = re.search(r'\b[A-Z]{2}/(\d{11})\b', markdown)
-    if uf_cpf_match:
-        return uf_cpf_match.group(1)
+async def extrair_exames_ia(markdown: str) -> Dict[str, Any]:
+    """Extrai apenas exames do markdown usando LLM (reaproveita a extração estruturada)."""
+    dados = await extrair_dados_documento_ia(markdown)
+    resultado = {"exames": dados.get("exames", [])}
+    if "erro" in dados:
+        resultado["erro"] = dados["erro"]
+    return resultado
+
+# Padrões de candidatos a CPF, do mais específico ao mais permissivo
+REGEX_CPF_UF = re.compile(r'\b[A-Z]{2}/(\d{11})\b')
+REGEX_CPF_PONTUADO = re.compile(r'(?<!\d)\d{3}\.\d{3}\.\d{3}-\d{2}(?!\d)')
+# Aceita dígitos separados por espaço/ponto/hífen (comum quando o OCR quebra o número)
+REGEX_CPF_GENERICO = re.compile(r'(?<!\d)(?:\d[ .\-/]?){10}\d(?!\d)')
+REGEX_ROTULO_CPF = re.compile(r'C\.?\s?P\.?\s?F', re.IGNORECASE)
+REGEX_ROTULO_PACIENTE = re.compile(r'\b(?:paciente|nome|funcion[aá]rio|colaborador)\b', re.IGNORECASE)
+REGEX_ROTULO_OUTROS_DOCS = re.compile(r'\b(?:CNPJ|CRM|RG|PIS|NIS|CTPS|tel(?:efone)?|fone|celular|protocolo|pedido)\b', re.IGNORECASE)
+
+# Pesos do ranqueamento de candidatos
+PESO_CPF_UF = 5.0
+PESO_CPF_PONTUADO = 1.0
+PESO_ROTULO_CPF = 4.0
+PESO_ROTULO_PACIENTE = 1.0
+PESO_ROTULO_OUTROS_DOCS = -3.0
+PESO_REPETICAO = 0.5
+JANELA_CONTEXTO = 40  # caracteres antes do candidato analisados como rótulo
+
+def validar_cpf(cpf: str) -> bool:
+    """Valida os dígitos verificadores do CPF, rejeitando sequências repetidas."""
+    if not cpf or len(cpf) != 11 or not cpf.isdigit() or cpf == cpf[0] * 11:
+        return False
+    for n in (9, 10):
+        soma = sum(int(cpf[i]) * (n + 1 - i) for i in range(n))
+        if (soma * 10) % 11 % 10 != int(cpf[n]):
+            return False
+    return True
+
+def extrair_cpfs_candidatos(markdown: str) -> List[str]:
+    """
+    Encontra todos os candidatos a CPF no texto, descarta os inválidos e
+    retorna os demais do mais provável ao menos provável.
+    """
+    if not markdown:
+        return []
+
+    pontuacoes: Dict[str, float] = {}
+    primeira_posicao: Dict[str, int] = {}
+
+    def registrar(cpf: str, inicio: int, bonus: float):
+        if not validar_cpf(cpf):
+            return
+        contexto = markdown[max(0, inicio - JANELA_CONTEXTO):inicio]
+        pontos = bonus
+        if REGEX_ROTULO_CPF.search(contexto):
+            pontos += PESO_ROTULO_CPF
+        if REGEX_ROTULO_PACIENTE.search(contexto):
+            pontos += PESO_ROTULO_PACIENTE
+        if REGEX_ROTULO_OUTROS_DOCS.search(contexto):
+            pontos += PESO_ROTULO_OUTROS_DOCS
+        if cpf in pontuacoes:
+            # Ocorrências repetidas reforçam o candidato; vale o melhor contexto
+            pontuacoes[cpf] = max(pontuacoes[cpf], pontos) + PESO_REPETICAO
+        else:
+            pontuacoes[cpf] = pontos
+            primeira_posicao[cpf] = inicio
+
+    posicoes_vistas = set()
+    for match in REGEX_CPF_UF.finditer(markdown):
+        registrar(match.group(1), match.start(1), PESO_CPF_UF)
+        posicoes_vistas.add(match.start(1))
+    for match in REGEX_CPF_PONTUADO.finditer(markdown):
+        registrar(re.sub(r'\D', '', match.group(0)), match.start(), PESO_CPF_PONTUADO)
+        posicoes_vistas.add(match.start())
+    for match in REGEX_CPF_GENERICO.finditer(markdown):
+        if match.start() not in posicoes_vistas:
+            registrar(re.sub(r'\D', '', match.group(0)), match.start(), 0.0)
 
-    # Fallback: tenta encontrar qualquer CPF de 11 dígitos
-    generic_cpf_match = re.search(r'\b\d{3}[.\s]?\d{3}[.\s]?\d{3}[-\s]?\d{2}\b', markdown)
-    if generic_cpf_match:
-        return re.sub(r'\D', '', generic_cpf_match.group(0))
-    return None
+    return sorted(pontuacoes, key=lambda cpf: (-pontuacoes[cpf], primeira_posicao[cpf]))
 
+def extrair_cpf_regex(markdown: str) -> str:
+    """Retorna o candidato a CPF mais provável do texto (ou None)."""
+    candidatos = extrair_cpfs_candidatos(markdown)
+    return candidatos[0] if candidatos else None
+
+@rastreamento.rastrear("ocr.pipeline")
 async def ocr_pipeline(file, salvar_markdown=True) -> Dict[str, Any]:
     """Pipeline completo: processa arquivo, extrai info, aplica fallbacks, salva markdown."""
     logger.info(f"[OCR] Iniciando pipeline OCR para arquivo: {file.filename}")
@@ -135,48 +314,57 @@ async def ocr_pipeline(file, salvar_markdown=True) -> Dict[str, Any]:
         content = await file.read()  # Lê o conteúdo do UploadFile de forma assíncrona
         temp.write(content)    # Escreve o conteúdo no arquivo temporário
         temp_path = temp.name
+    rastreamento.span_atual().definir(arquivo_bytes=len(content))
 
     logger.info(f"[OCR] Iniciando conversão Docling para: {file.filename}")
+    # Limitada ao prazo restante da requisição; a conversão abandonada termina em segundo plano
+    timeout = prazo.limitar(None)
+    limite = time.monotonic() + timeout if timeout is not None else None
     try:
-        markdown = processar_arquivo_docling(temp_path)
-        logger.info(f"[OCR] Conversão Docling concluída. Markdown gerado: {len(markdown)} caracteres")
-    finally:
-        os.remove(temp_path) # Garante que o arquivo temporário seja removido
+        markdown = await asyncio.wait_for(asyncio.to_thread(_converter_arquivo_temporario, temp_path, limite), timeout)
+    except asyncio.TimeoutError:
+        metricas.ERROS.inc(componente="ocr", tipo="prazo_esgotado")
+        raise prazo.PrazoEsgotado("ocr")
+    logger.info(f"[OCR] Conversão Docling concluída. Markdown gerado: {len(markdown)} caracteres")
 
-    # Salvar markdown
-    caminho_md = None
+    # Salvar markdown no armazém de artefatos (assíncrono, deduplicado e comprimido)
+    id_artefato_md = None
     if salvar_markdown:
-        os.makedirs("ocr_resultados", exist_ok=True)
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_nome = os.path.splitext(file.filename)[0]
-        caminho_md = f"ocr_resultados/ocr_{base_nome}_{timestamp}.md"
-        with open(caminho_md, "w", encoding="utf-8") as f:
-            f.write(markdown)
-        logger.info(f"[OCR] Markdown salvo em: {caminho_md}")
+        id_artefato_md = armazem_artefatos.salvar("ocr_markdown", markdown, chave=file.filename)
+        logger.info(f"[OCR] Markdown enviado ao armazém de artefatos: {id_artefato_md}")
 
     # Extrair CPF localmente
-    logger.info("[OCR] Extraindo CPF via regex...")
-    cpf_extraido = extrair_cpf_regex(markdown)
-    logger.info(f"[OCR] CPF extraído: {cpf_extraido if cpf_extraido else 'Nenhum CPF encontrado'}")
-
-    # Extrair exames via IA
-    logger.info("[OCR] Iniciando extração de exames via OpenAI GPT...")
-    exames_info = extrair_exames_ia(markdown)
-    exames_extraidos = exames_info.get("exames", [])
+    logger.info("[OCR] Extraindo CPFs candidatos via regex...")
+    cpfs_candidatos = extrair_cpfs_candidatos(markdown)
+    cpf_extraido = cpfs_candidatos[0] if cpfs_candidatos else None
+    logger.info(f"[OCR] CPF extraído: {cpf_extraido if cpf_extraido else 'Nenhum CPF encontrado'} ({len(cpfs_candidatos)} candidatos válidos)")
+
+    # Extração estruturada via IA (exames, CPFs e nome em uma única chamada)
+    logger.info("[OCR] Iniciando extração estruturada via OpenAI GPT...")
+    dados_ia = await extrair_dados_documento_ia(markdown)
+    exames_extraidos = dados_ia.get("exames", [])
     logger.info(f"[OCR] Exames extraídos: {len(exames_extraidos)} encontrados - {exames_extraidos}")
+    rastreamento.span_atual().definir(cpfs_candidatos=len(cpfs_candidatos), exames=len(exames_extraidos))
+
+    # Fallback de CPF: se o regex não encontrou candidatos, usa o CPF da IA (se válido)
+    if not cpf_extraido and validar_cpf(re.sub(r'\D', '', dados_ia.get("cpf") or "")):
+        cpf_extraido = re.sub(r'\D', '', dados_ia["cpf"])
+        logger.info(f"[OCR] CPF obtido da extração via IA: {cpf_extraido}")
 
     info = {
         "cpf": cpf_extraido,
+        "cpfs_candidatos": cpfs_candidatos,
         "exames": exames_extraidos,
+        "nome_paciente": dados_ia.get("nome_paciente"),
+        "compactacao": dados_ia.get("compactacao"),
         "markdown_content": markdown # Adiciona o markdown para o orquestrador usar
     }
 
-    if "erro" in exames_info:
-        info["erro"] = exames_info["erro"]
+    if "erro" in dados_ia:
+        info["erro"] = dados_ia["erro"]
 
-    if caminho_md:
-        info["markdown_salvo_em"] = caminho_md
+    if id_artefato_md:
+        info["markdown_artefato"] = id_artefato_md
 
     # Libera memória da GPU após cada processamento
     torch.cuda.empty_cache()
@@ -184,36 +372,8 @@ async def ocr_pipeline(file, salvar_markdown=True) -> Dict[str, Any]:
 
     return info
 
-PROMPT_EXTRAIR_TODOS_CPFS = """
-Você é um assistente de extração de dados altamente preciso.
-Sua tarefa é extrair TODOS os CPFs (apenas números, sem pontuação) de um texto.
-Retorne uma lista de CPFs encontrados.
-Responda APENAS com um objeto JSON válido, sem nenhum texto adicional antes ou depois.
-O formato do JSON deve ser: {\"cpfs\": [\"<cpf1>\", \"<cpf2>\"]}.
-Se nenhum CPF for encontrado, use uma lista vazia [] para a chave \"cpfs\".
-"""
-
 async def extrair_todos_cpfs_ia(markdown: str, exclude_cpf: Optional[str] = None) -> List[str]:
     """Extrai todos os CPFs do markdown usando LLM, opcionalmente excluindo um CPF."""
-    user_prompt = f"""Texto:\n{markdown}"""
-    if exclude_cpf:
-        user_prompt += f"\nExcluir CPF: {exclude_cpf}"
-
-    try:
-        response = client.chat.completions.create(
-            model=MODELO_GPT,
-            messages=[
-                {"role": "system", "content": PROMPT_EXTRAIR_TODOS_CPFS},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0,
-            response_format={"type": "json_object"}
-        )
-        data = json.loads(response.choices[0].message.content)
-        cpfs = [cpf for cpf in data.get("cpfs", []) if cpf != exclude_cpf]
-        return cpfs
-    except json.JSONDecodeError:
-        return []
-    except Exception as e:
-        print(f"Erro ao extrair todos os CPFs via IA: {e}")
-        return [] 
\ No newline at end of file
+    dados = await extrair_dados_documento_ia(markdown)
+    cpfs = [re.sub(r'\D', '', cpf) for cpf in dados.get("cpfs", [])]
+    return [cpf for cpf in dict.fromkeys(cpfs) if cpf and cpf != exclude_cpf]
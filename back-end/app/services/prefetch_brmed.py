@@ -0,0 +1,160 @@
+import re
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from playwright.async_api import async_playwright
+
+from app.core.config import settings
+from app.services import brmed_service
+
+logger = logging.getLogger(__name__)
+
+# Pré-carga das guias BRMED dos pacientes agendados: consulta os CPFs em paralelo, com um
+# número limitado de workers (cada um com o seu contexto autenticado do navegador) e intervalo
+# mínimo entre consultas, e grava o resultado no cache por CPF lido por consultar_exames_brmed.
+
+MAX_PREFETCHES_GUARDADOS = 20
+_prefetches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def normalizar_cpfs(cpfs: List[str]) -> List[str]:
+    """Apenas dígitos, sem CPFs vazios ou repetidos, na ordem recebida."""
+    vistos, resultado = set(), []
+    for cpf in cpfs:
+        digitos = re.sub(r"\D", "", str(cpf))
+        if digitos and digitos not in vistos:
+            vistos.add(digitos)
+            resultado.append(digitos)
+    return resultado
+
+def _novo_estado(cpfs: List[str]) -> Dict[str, Any]:
+    return {
+        "status": "pendente",
+        "total": len(cpfs),
+        "concluidos": 0,
+        "em_cache": 0,
+        "sucesso": 0,
+        "erros": {},
+        "iniciado_em": time.time(),
+        "finalizado_em": None
+    }
+
+class _Espacador:
+    """Garante um intervalo mínimo entre o início de duas consultas ao portal."""
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self._proximo = 0.0
+        self._lock = asyncio.Lock()
+
+    async def aguardar(self):
+        async with self._lock:
+            agora = time.monotonic()
+            if self._proximo > agora:
+                await asyncio.sleep(self._proximo - agora)
+            self._proximo = max(agora, self._proximo) + self.intervalo
+
+async def executar_prefetch(
+    cpfs: List[str],
+    estado: Optional[Dict[str, Any]] = None,
+    progresso: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    recarregar: bool = False
+) -> Dict[str, Any]:
+    """
+    Consulta as guias dos CPFs e preenche o cache. Erros são registrados por CPF sem
+    interromper os demais. `recarregar` ignora guias já presentes no cache.
+    """
+    cpfs = normalizar_cpfs(cpfs)
+    estado = estado if estado is not None else _novo_estado(cpfs)
+    estado["status"] = "executando"
+    espacador = _Espacador(settings.BRMED_PREFETCH_INTERVALO)
+    logger.info(
+        f"[PREFETCH] Iniciando pré-carga de {len(cpfs)} CPF(s) "
+        f"({settings.BRMED_PREFETCH_CONTEXTOS} contexto(s), intervalo {settings.BRMED_PREFETCH_INTERVALO}s)"
+    )
+
+    async def consultar(cpf: str, browser, sessao: Optional[brmed_service.SessaoNavegador]):
+        try:
+            await espacador.aguardar()
+            resultado = await brmed_service.consultar_exames_brmed(cpf, usar_cache=False, browser=browser, sessao=sessao)
+            if "erro" in resultado:
+                estado["erros"][cpf] = resultado["erro"]
+            elif not resultado.get("exames"):
+                estado["erros"][cpf] = "Nenhum exame encontrado na guia."
+            else:
+                estado["sucesso"] += 1
+        except Exception as e:
+            logger.exception(f"[PREFETCH] Falha inesperada para o CPF {cpf[:3]}***: {e}")
+            estado["erros"][cpf] = str(e)
+        finally:
+            estado["concluidos"] += 1
+            if progresso:
+                await progresso(estado)
+
+    async def trabalhador(fila: asyncio.Queue, browser):
+        # Modos completo/enxuto: um contexto autenticado por worker, com login só na primeira
+        # consulta (ou depois de uma falha); o modo híbrido já reaproveita os cookies da sessão
+        sessao = None if settings.BRMED_MODO == "hibrido" else brmed_service.SessaoNavegador(browser, settings.BRMED_MODO != "completo")
+        try:
+            while not fila.empty():
+                await consultar(fila.get_nowait(), browser, sessao)
+        finally:
+            if sessao is not None:
+                await sessao.fechar()
+
+    try:
+        pendentes = []
+        for cpf in cpfs:
+            if not recarregar and await brmed_service.cache_guias.obter(brmed_service.chave_cpf(cpf)) is not None:
+                estado["em_cache"] += 1
+                estado["concluidos"] += 1
+            else:
+                pendentes.append(cpf)
+        if progresso and estado["em_cache"]:
+            await progresso(estado)
+        if pendentes:
+            # Um único navegador, com até BRMED_PREFETCH_CONTEXTOS workers consumindo a fila de CPFs
+            fila = asyncio.Queue()
+            for cpf in pendentes:
+                fila.put_nowait(cpf)
+            async with async_playwright() as p:
+                browser = await brmed_service.abrir_navegador(p)
+                try:
+                    trabalhadores = min(max(settings.BRMED_PREFETCH_CONTEXTOS, 1), len(pendentes))
+                    await asyncio.gather(*(trabalhador(fila, browser) for _ in range(trabalhadores)))
+                finally:
+                    await brmed_service.fechar_navegador(browser)
+        estado["status"] = "concluido"
+    except Exception as e:
+        logger.exception(f"[PREFETCH] Pré-carga interrompida: {e}")
+        estado["status"] = "falhou"
+        estado["erro"] = str(e)
+    estado["finalizado_em"] = time.time()
+    logger.info(
+        f"[PREFETCH] Pré-carga {estado['status']}: {estado['sucesso']} consultado(s), "
+        f"{estado['em_cache']} já em cache, {len(estado['erros'])} erro(s)"
+    )
+    return estado
+
+def iniciar_prefetch(cpfs: List[str], recarregar: bool = False) -> str:
+    """Dispara a pré-carga em segundo plano e retorna o id para acompanhar o progresso."""
+    cpfs = normalizar_cpfs(cpfs)
+    id_prefetch = uuid.uuid4().hex[:12]
+    estado = _novo_estado(cpfs)
+    _prefetches[id_prefetch] = estado
+    while len(_prefetches) > MAX_PREFETCHES_GUARDADOS:
+        _prefetches.popitem(last=False)
+    estado["tarefa"] = asyncio.create_task(executar_prefetch(cpfs, estado, recarregar=recarregar))
+    return id_prefetch
+
+def obter_prefetch(id_prefetch: str) -> Optional[Dict[str, Any]]:
+    estado = _prefetches.get(id_prefetch)
+    if estado is None:
+        return None
+    return {"id": id_prefetch, **{chave: valor for chave, valor in estado.items() if chave != "tarefa"}}
+
+def listar_prefetches() -> List[Dict[str, Any]]:
+    return [obter_prefetch(id_prefetch) for id_prefetch in reversed(_prefetches)]
@@ -1,4 +1,5 @@
 import os
+import asyncio
 from typing import List, Dict, Any
 import logging
 from app.core.config import settings
@@ -7,8 +8,9 @@ import numpy as np
 import faiss
 import json
 import pickle
-from datetime import datetime
-from app.core.clients import client
+import hashlib
+from app.core import llm, lotes, prazo, rastreamento
+from app.services.auditoria_service import armazem_auditoria
 
 logger = logging.getLogger(__name__)
 
@@ -16,16 +18,17 @@ logger = logging.getLogger(__name__)
 EXAM_SIMILARITY_INDEX_PATH = os.path.join(settings.BASE_DIR, "data", "exam_similarity_index.faiss")
 EXAM_SIMILARITY_DATA_PATH = os.path.join(settings.BASE_DIR, "data", "exam_similarity_data.pkl")
 
-@retry(wait=wait_exponential(min=1, max=10), stop=stop_after_attempt(3))
+# Sem novas tentativas (nem esperas) além do prazo da requisição, quando houver
+@retry(
+    wait=prazo.espera_no_prazo(wait_exponential(min=1, max=10)),
+    stop=stop_after_attempt(3) | prazo.parar_se_esgotado
+)
 async def gerar_embedding(texto: str) -> np.ndarray:
     """Gera embedding para um texto usando a API da OpenAI."""
     resp = None # Initialize resp to None
     try:
-        resp = await client.embeddings.create(
-            input=[texto],
-            model=settings.MODELO_EMBEDDING
-        )
-        return np.array(resp.data[0].embedding, dtype="float32").reshape(1, -1)
+        # Agrupado com os embeddings de outras requisições concorrentes (app.core.lotes)
+        return await lotes.gerar_embedding(texto, settings.MODELO_EMBEDDING, operacao="embedding_exames")
     except AttributeError as ae:
         logger.error(f"AttributeError ao processar embedding para '{texto[:50]}...': {ae}. Resposta completa: {resp}")
         raise # Re-raise to allow retry
@@ -44,42 +47,9 @@ except Exception as e:
     exam_similarity_index = None
     exam_similarity_data = None
 
-async def comparar_exames_com_rag(exames_ocr: list[str], exames_brnet: list[str]) -> Dict[str, Any]:
-    """
-    Compara listas de exames usando o índice de similaridade e, se necessário, LLM para desempate.
-    """
-    contexto_rag = ""
-    if exam_similarity_index and exam_similarity_data:
-        # 1. Recuperação (Retrieval): Busca sinônimos para todos os exames obrigatórios.
-        contexto_list = []
-        todos_exames_para_embedding = list(set(exames_brnet))
-        
-        if todos_exames_para_embedding:
-            try:
-                embeddings = np.vstack([await gerar_embedding(exame) for exame in todos_exames_para_embedding])
-                D, I = exam_similarity_index.search(embeddings, 5) # Busca os 5 vizinhos mais próximos para cada exame
-
-                # Coleta sinônimos únicos dos resultados
-                sinonimos_encontrados = set()
-                for i, indices in enumerate(I):
-                    exame_principal = todos_exames_para_embedding[i]
-                    sinonimos_encontrados.add(exame_principal) # Adiciona o próprio nome
-                    for idx in indices:
-                        if idx != -1:
-                            sinonimos = exam_similarity_data[idx].get('sinonimos', [])
-                            for s in sinonimos:
-                                sinonimos_encontrados.add(s)
-                
-                if sinonimos_encontrados:
-                    contexto_list.append("Para te ajudar na análise, considere a seguinte lista de exames e seus possíveis sinônimos e variações que encontramos em nossa base:")
-                    contexto_list.append(", ".join(sorted(list(sinonimos_encontrados))))
-
-            except Exception as e:
-                logger.error(f"Erro durante a busca no índice FAISS: {e}")
-        
-        contexto_rag = "\n".join(contexto_list)
-
-    prompt = f"""
+def montar_prompt_comparacao(exames_ocr: List[str], exames_brnet: List[str], contexto_rag: str) -> str:
+    """Prompt da comparação entre exames obrigatórios e recebidos, com os sinônimos do RAG."""
+    return f"""
     Você é um assistente especializado em analisar exames médicos.
     Sua tarefa é comparar a lista de 'Exames Obrigatórios' com a lista de 'Exames Recebidos' e determinar quais obrigatórios foram encontrados.
 
@@ -118,11 +88,64 @@ async def comparar_exames_com_rag(exames_ocr: list[str], exames_brnet: list[str]
     ```
     """
 
+PROMPT_SISTEMA_COMPARACAO = "Você é um assistente que compara exames e retorna JSON."
+
+# Versão do prompt: entra na chave do cache do LLM, invalidando-o quando o modelo do prompt
+# (renderizado com marcadores no lugar das listas) ou a mensagem de sistema mudam
+VERSAO_PROMPT_COMPARACAO = hashlib.sha256(
+    (PROMPT_SISTEMA_COMPARACAO + montar_prompt_comparacao(["{exames_ocr}"], ["{exames_brnet}"], "{contexto_rag}")).encode("utf-8")
+).hexdigest()[:12]
+
+@rastreamento.rastrear("validacao.comparar_exames")
+async def comparar_exames_com_rag(exames_ocr: list[str], exames_brnet: list[str]) -> Dict[str, Any]:
+    """
+    Compara listas de exames usando o índice de similaridade e, se necessário, LLM para desempate.
+    """
+    contexto_rag = ""
+    if exam_similarity_index and exam_similarity_data:
+        # 1. Recuperação (Retrieval): Busca sinônimos para todos os exames obrigatórios.
+        contexto_list = []
+        todos_exames_para_embedding = list(set(exames_brnet))
+        
+        if todos_exames_para_embedding:
+            try:
+                # Os embeddings são disparados juntos para caírem no mesmo lote
+                with rastreamento.span("validacao.embeddings", textos=len(todos_exames_para_embedding)):
+                    embeddings = np.vstack(await asyncio.gather(*[gerar_embedding(exame) for exame in todos_exames_para_embedding]))
+                with rastreamento.span("validacao.faiss", consultas=len(embeddings)):
+                    D, I = await asyncio.to_thread(exam_similarity_index.search, embeddings, 5) # Busca os 5 vizinhos mais próximos para cada exame
+
+                # Coleta sinônimos únicos dos resultados
+                sinonimos_encontrados = set()
+                for i, indices in enumerate(I):
+                    exame_principal = todos_exames_para_embedding[i]
+                    sinonimos_encontrados.add(exame_principal) # Adiciona o próprio nome
+                    for idx in indices:
+                        if idx != -1:
+                            sinonimos = exam_similarity_data[idx].get('sinonimos', [])
+                            for s in sinonimos:
+                                sinonimos_encontrados.add(s)
+                
+                rastreamento.span_atual().definir(sinonimos=len(sinonimos_encontrados))
+                if sinonimos_encontrados:
+                    contexto_list.append("Para te ajudar na análise, considere a seguinte lista de exames e seus possíveis sinônimos e variações que encontramos em nossa base:")
+                    contexto_list.append(", ".join(sorted(list(sinonimos_encontrados))))
+
+            except Exception as e:
+                logger.error(f"Erro durante a busca no índice FAISS: {e}")
+        
+        contexto_rag = "\n".join(contexto_list)
+
+    prompt = montar_prompt_comparacao(exames_ocr, exames_brnet, contexto_rag)
+
     try:
-        response = await client.chat.completions.create(
+        response = await llm.chat_completion(
+            operacao="comparar_exames",
+            hedge=True,
+            versao_prompt=VERSAO_PROMPT_COMPARACAO,
             model=settings.MODELO_GPT,
             messages=[
-                {"role": "system", "content": "Você é um assistente que compara exames e retorna JSON."},
+                {"role": "system", "content": PROMPT_SISTEMA_COMPARACAO},
                 {"role": "user", "content": prompt}
             ],
             response_format={ "type": "json_object" },
@@ -142,26 +165,24 @@ async def comparar_exames_com_rag(exames_ocr: list[str], exames_brnet: list[str]
 
 
 
-def salvar_auditoria(cpf: str, obrigatorios: List[str], enviados: List[str], resultado: Dict[str, Any]):
-    """Salva o resultado da validação para auditoria."""
-    os.makedirs("auditoria_validacao", exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    fn = f"auditoria_validacao/validacao_{cpf}_{ts}.json"
-    with open(fn, "w", encoding="utf-8") as f:
-        json.dump({
-            "cpf": cpf,
-            "exames_obrigatorios": obrigatorios,
-            "exames_enviados": enviados,
-            "resultado": resultado
-        }, f, ensure_ascii=False, indent=4)
-    return fn
+def salvar_auditoria(cpf: str, obrigatorios: List[str], enviados: List[str], resultado: Dict[str, Any]) -> str:
+    """
+    Enfileira o resultado da validação no armazém de auditoria e retorna o id do registro.
+    A gravação acontece em lote, em segundo plano, sem bloquear a requisição.
+    """
+    return armazem_auditoria.registrar(cpf, {
+        "exames_obrigatorios": obrigatorios,
+        "exames_enviados": enviados,
+        "resultado": resultado
+    })
 
+@rastreamento.rastrear("validacao.validar_exames")
 async def validar_exames(cpf: str, exames_obrigatorios: List[str], exames_enviados: List[str], exames_brnet: List[str]) -> Dict[str, Any]:
     """Pipeline de validação: compara, salva auditoria e retorna resultado."""
     comparacao_final = await comparar_exames_com_rag(exames_enviados, exames_brnet)
 
     if isinstance(comparacao_final, dict) and "erro" in comparacao_final:
-        return {"status_liberado": False, "mensagem": comparacao_final["erro"], "exames_comparativo": [], "auditoria_salva_em": "", "erro": comparacao_final["erro"]}
+        return {"status_liberado": False, "mensagem": comparacao_final["erro"], "exames_comparativo": [], "auditoria_id": None, "auditoria_salva_em": "", "erro": comparacao_final["erro"]}
 
     # Processa o resultado da comparação para determinar o status final
     status_liberado = True
@@ -181,14 +202,20 @@ async def validar_exames(cpf: str, exames_obrigatorios: List[str], exames_enviad
             exames_comparativo.append({"exame": item["exame"], "status": "extra_no_ocr", "justificativa": item.get("justificativa", "")})
 
     status_liberado = len(exames_faltantes) == 0
+    rastreamento.span_atual().definir(
+        obrigatorios=len(exames_brnet), enviados=len(exames_enviados),
+        faltantes=len(exames_faltantes), liberado=status_liberado
+    )
 
-    caminho_auditoria = salvar_auditoria(cpf, exames_obrigatorios, exames_enviados, comparacao_final)
+    id_auditoria = salvar_auditoria(cpf, exames_obrigatorios, exames_enviados, comparacao_final)
     
     # Prepara a resposta final para o frontend
+    # A auditoria não é mais um arquivo: "auditoria_salva_em" passa a ser a rota de consulta do registro
     resposta_final = {
         "status_liberado": status_liberado,
         "exames_comparativo": exames_comparativo,
-        "auditoria_salva_em": caminho_auditoria,
+        "auditoria_id": id_auditoria,
+        "auditoria_salva_em": f"/v1/auditoria/{id_auditoria}",
         "exames_faltantes": exames_faltantes,
         "exames_presentes": exames_presentes
     }
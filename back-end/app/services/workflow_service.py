@@ -1,11 +1,11 @@
 import os
+import asyncio
 from typing import Dict, Any, Optional, List
 from fastapi import UploadFile
 from app.services import ocr_service, brmed_service, validacao_service
 from app.core.config import settings
 import logging
 import json
-from openai import OpenAI
 import faiss
 import pickle
 import numpy as np
@@ -14,23 +14,24 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-from app.core.clients import client
+from app.core import llm, lotes, prazo, metricas, rastreamento
 
 # Caminhos para o índice de similaridade de exames
 logger.info(f"DEBUG: settings.BASE_DIR is {settings.BASE_DIR}")
 EXAM_SIMILARITY_INDEX_PATH = os.path.join(settings.BASE_DIR, "data", "exam_similarity_index.faiss")
 EXAM_SIMILARITY_DATA_PATH = os.path.join(settings.BASE_DIR, "data", "exam_similarity_data.pkl")
 
-@retry(wait=wait_exponential(min=1, max=10), stop=stop_after_attempt(3))
+# Sem novas tentativas (nem esperas) além do prazo da requisição, quando houver
+@retry(
+    wait=prazo.espera_no_prazo(wait_exponential(min=1, max=10)),
+    stop=stop_after_attempt(3) | prazo.parar_se_esgotado
+)
 async def gerar_embedding(texto: str) -> np.ndarray:
     """Gera embedding para um texto usando a API da OpenAI."""
     resp = None
     try:
-        resp = await client.embeddings.create(
-            input=[texto],
-            model=settings.MODELO_EMBEDDING
-        )
-        return np.array(resp.data[0].embedding, dtype="float32").reshape(1, -1)
+        # Agrupado com os embeddings de outras requisições concorrentes (app.core.lotes)
+        return await lotes.gerar_embedding(texto, settings.MODELO_EMBEDDING, operacao="embedding_exames")
     except AttributeError as ae:
         logger.error(f"AttributeError ao processar embedding para '{texto[:50]}...': {ae}. Resposta completa: {resp}")
         raise
@@ -61,8 +62,9 @@ async def comparar_exames_openai(exames_ocr: list[str], exames_brnet: list[str])
         
         if todos_exames_para_embedding:
             try:
-                embeddings = np.vstack([await gerar_embedding(exame) for exame in todos_exames_para_embedding])
-                D, I = exam_similarity_index.search(embeddings, 5) # Busca os 5 vizinhos mais próximos para cada exame
+                # Os embeddings são disparados juntos para caírem no mesmo lote
+                embeddings = np.vstack(await asyncio.gather(*[gerar_embedding(exame) for exame in todos_exames_para_embedding]))
+                D, I = await asyncio.to_thread(exam_similarity_index.search, embeddings, 5) # Busca os 5 vizinhos mais próximos para cada exame
 
                 # Coleta sinônimos únicos dos resultados
                 sinonimos_encontrados = set()
@@ -109,7 +111,9 @@ async def comparar_exames_openai(exames_ocr: list[str], exames_brnet: list[str])
     """
 
     try:
-        response = await client.chat.completions.create(
+        response = await llm.chat_completion(
+            operacao="comparar_exames",
+            hedge=True,
             model=settings.MODELO_GPT,
             messages=[
                 {"role": "system", "content": "Você é um assistente que compara exames e retorna JSON."},
@@ -127,6 +131,7 @@ async def comparar_exames_openai(exames_ocr: list[str], exames_brnet: list[str])
 
 
 
+@rastreamento.rastrear("workflow.processar_documento")
 async def processar_documento_completo(
     arquivo: UploadFile,
     exames_obrigatorios: list[str],
@@ -149,9 +154,30 @@ async def processar_documento_completo(
         if progress_callback:
             await progress_callback(progress, step, message)
 
+    # Prazo da requisição (definido na API); cada etapa limita seus timeouts pelo que resta
+    orcamento = prazo.atual() or prazo.iniciar(settings.PRAZO_PROCESSAMENTO_DOCUMENTO)
+
+    async def resultado_parcial(etapa: str, **dados) -> Dict[str, Any]:
+        orcamento.marcar(etapa)
+        metricas.ERROS.inc(componente="workflow", tipo="prazo_esgotado")
+        logger.warning(f"[WORKFLOW] Prazo de {orcamento.total:.0f}s esgotado na etapa '{etapa}': {orcamento.resumo()['etapas']}")
+        await send_progress(-1, "erro", f"Tempo limite do processamento atingido na etapa '{etapa}'")
+        rastreamento.span_atual().definir(status="parcial", etapa_prazo_esgotado=etapa)
+        return {
+            "status": "parcial",
+            "mensagem": f"Prazo de {orcamento.total:.0f}s esgotado na etapa '{etapa}'; resultado parcial.",
+            "prazo": orcamento.resumo(),
+            "trace_id": rastreamento.trace_id_atual(),
+            **dados
+        }
+
     # 1. Processar documento com OCR e extrair informações iniciais
     await send_progress(10, "ocr", "Processando documento com OCR...")
-    ocr_resultado = await ocr_service.ocr_pipeline(arquivo)
+    try:
+        ocr_resultado = await ocr_service.ocr_pipeline(arquivo)
+    except prazo.PrazoEsgotado:
+        return await resultado_parcial("ocr", exames_enviados=[])
+    orcamento.marcar("ocr")
     await send_progress(30, "ocr", f"OCR concluído. {len(ocr_resultado.get('exames', []))} exames encontrados")
     cpf_inicial = ocr_resultado.get("cpf")
     exames_enviados = ocr_resultado.get("exames", [])
@@ -163,17 +189,41 @@ async def processar_documento_completo(
 
     cpf_final = None
     brmed_resultado = None
+    portal_indisponivel = False
+
+    # Circuito do portal aberto: as consultas falham na hora (ou usam guias expiradas do cache)
+    estado_circuito = brmed_service.disjuntor_brmed.estado
+    if estado_circuito != "fechado":
+        await send_progress(35, "brmed", f"Portal BRMED instável (circuito {estado_circuito}), usando guias em cache quando possível")
+
+    prazo_insuficiente = False
+
+    def sem_tempo_para_outro_cpf() -> bool:
+        # Cada CPF alternativo só é tentado se ainda sobra a reserva para a validação
+        nonlocal prazo_insuficiente
+        prazo_insuficiente = prazo_insuficiente or orcamento.restante() <= settings.PRAZO_RESERVA_VALIDACAO
+        return prazo_insuficiente
+
+    async def consultar_brmed(cpf: str) -> Dict[str, Any]:
+        nonlocal portal_indisponivel
+        resultado = await brmed_service.consultar_exames_brmed(cpf)
+        if resultado.get("origem") == "cache_expirado":
+            await send_progress(55, "brmed", "Portal BRMED indisponível, usando guia salva anteriormente")
+        elif "erro" in resultado and resultado.get("circuito"):
+            portal_indisponivel = True
+            await send_progress(45, "brmed", "Portal BRMED indisponível (circuito aberto), consulta interrompida")
+        return resultado
 
     # 2. Tentar com o CPF inicial (se houver)
     if cpf_inicial:
         await send_progress(40, "brmed", f"Consultando exames obrigatórios (CPF: {cpf_inicial[:3]}***)")
         logger.info(f"[WORKFLOW] Tentando consultar BRMED com CPF inicial: {cpf_inicial}")
-        brmed_resultado = await brmed_service.consultar_exames_brmed(cpf_inicial)
+        brmed_resultado = await consultar_brmed(cpf_inicial)
         if "erro" not in brmed_resultado:
             cpf_final = cpf_inicial
             exames_brnet = brmed_resultado.get("exames", [])
             await send_progress(60, "brmed", f"Exames obrigatórios obtidos: {len(exames_brnet)} exames")
-        else:
+        elif not portal_indisponivel:
             logger.warning(f'[WORKFLOW] Consulta BRMED falhou para CPF {cpf_inicial}: {brmed_resultado["erro"]}')
             await send_progress(45, "brmed", "CPF inicial falhou, buscando CPFs alternativos...")
     else:
@@ -181,26 +231,69 @@ async def processar_documento_completo(
 
     exames_brnet = brmed_resultado.get("exames", []) if brmed_resultado else []
 
-    # Se a consulta inicial falhou, tentar CPFs alternativos via IA
-    if not cpf_final and markdown_content:
-        logger.info("[WORKFLOW] CPF inicial falhou ou não encontrado. Buscando CPFs alternativos via IA...")
+    # Se a consulta inicial falhou, tentar os demais candidatos locais (já validados e ranqueados)
+    if not cpf_final and not portal_indisponivel:
+        cpfs_locais = [c for c in ocr_resultado.get("cpfs_candidatos", []) if c not in cpfs_tentados]
+        if cpfs_locais:
+            logger.info(f"[WORKFLOW] Tentando {len(cpfs_locais)} CPFs candidatos locais antes do fallback via IA...")
+        for idx, alt_cpf in enumerate(cpfs_locais):
+            if sem_tempo_para_outro_cpf():
+                break
+            await send_progress(45 + (idx * 5), "brmed", f"Tentando CPF candidato {idx + 1}...")
+            logger.info(f"[WORKFLOW] Tentando consultar BRMED com CPF candidato: {alt_cpf}")
+            brmed_resultado = await consultar_brmed(alt_cpf)
+            cpfs_tentados.add(alt_cpf)
+            if "erro" not in brmed_resultado:
+                cpf_final = alt_cpf
+                exames_brnet = brmed_resultado.get("exames", [])
+                await send_progress(60, "brmed", f"CPF válido encontrado! {len(exames_brnet)} exames obrigatórios")
+                break
+            if portal_indisponivel:
+                break
+            logger.warning(f"[WORKFLOW] Consulta BRMED falhou para CPF candidato {alt_cpf}: {brmed_resultado['erro']}")
+
+    # Último recurso: CPFs alternativos via IA (apenas os que passam na validação de dígitos)
+    if not cpf_final and not portal_indisponivel and markdown_content and not sem_tempo_para_outro_cpf():
+        logger.info("[WORKFLOW] Nenhum CPF local funcionou. Buscando CPFs alternativos via IA...")
         cpfs_alternativos = await ocr_service.extrair_todos_cpfs_ia(markdown_content, exclude_cpf=cpf_inicial)
+        cpfs_alternativos = [c for c in cpfs_alternativos if ocr_service.validar_cpf(c)]
 
         for idx, alt_cpf in enumerate(cpfs_alternativos):
+            if sem_tempo_para_outro_cpf():
+                break
             if alt_cpf not in cpfs_tentados: # Evita tentar o mesmo CPF novamente
                 await send_progress(45 + (idx * 5), "brmed", f"Tentando CPF alternativo {idx + 1}...")
                 logger.info(f"[WORKFLOW] Tentando consultar BRMED com CPF alternativo: {alt_cpf}")
-                brmed_resultado = await brmed_service.consultar_exames_brmed(alt_cpf)
+                brmed_resultado = await consultar_brmed(alt_cpf)
                 if "erro" not in brmed_resultado:
                     cpf_final = alt_cpf
                     exames_brnet = brmed_resultado.get("exames", [])
                     await send_progress(60, "brmed", f"CPF válido encontrado! {len(exames_brnet)} exames obrigatórios")
                     break # Encontrou um CPF válido, sai do loop
+                elif portal_indisponivel:
+                    break
                 else:
                     logger.warning(f"[WORKFLOW] Consulta BRMED falhou para CPF alternativo {alt_cpf}: {brmed_resultado['erro']}")
                 cpfs_tentados.add(alt_cpf)
 
+    orcamento.marcar("brmed")
+    rastreamento.span_atual().definir(cpfs_tentados=len(cpfs_tentados), cpf_encontrado=cpf_final is not None)
+    if not cpf_final and (orcamento.esgotado() or prazo_insuficiente):
+        return await resultado_parcial(
+            "brmed", exames_enviados=exames_enviados, cpfs_tentados=sorted(cpfs_tentados), ocr_info=ocr_resultado
+        )
+
     # Se nenhum CPF funcionou, retornar erro ou resultado parcial
+    if not cpf_final and portal_indisponivel:
+        logger.error("[WORKFLOW] Portal BRMED indisponível (circuito aberto); processamento interrompido.")
+        await send_progress(-1, "erro", "Portal BRMED indisponível no momento, tente novamente em instantes")
+        return {
+            "status": "falha",
+            "mensagem": brmed_resultado["erro"],
+            "exames_enviados": exames_enviados,
+            "ocr_info": ocr_resultado
+        }
+
     if not cpf_final:
         logger.error("[WORKFLOW] Não foi possível encontrar um CPF válido para consulta BRMED.")
         await send_progress(-1, "erro", "Não foi possível extrair um CPF válido")
@@ -212,6 +305,10 @@ async def processar_documento_completo(
         }
 
     # 3. Validar exames
+    if orcamento.esgotado():
+        return await resultado_parcial(
+            "validacao", cpf_processado=cpf_final, exames_enviados=exames_enviados, exames_brnet=exames_brnet
+        )
     await send_progress(70, "validacao", "Validando exames com IA...")
     logger.info(f"[WORKFLOW] Realizando validação para CPF: {cpf_final}")
     resultado_validacao = await validacao_service.validar_exames(
@@ -220,6 +317,7 @@ async def processar_documento_completo(
         exames_enviados=exames_enviados,
         exames_brnet=exames_brnet
     )
+    orcamento.marcar("validacao")
     await send_progress(90, "validacao", "Validação concluída, preparando resultado...")
     logger.info(f"[WORKFLOW] Validação concluída.")
 
@@ -231,7 +329,9 @@ async def processar_documento_completo(
         "analise_comparacao": "Análise de comparação de exames:",
         "tabela_comparacao": resultado_validacao["exames_comparativo"],
         "decisao_final": resultado_validacao["mensagem"],
-        "erro": None # Inicialmente sem erro
+        "erro": None, # Inicialmente sem erro
+        "prazo": orcamento.resumo(),
+        "trace_id": rastreamento.trace_id_atual()
     }
 
     if resultado_validacao.get("erro"):
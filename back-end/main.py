@@ -3,6 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api import api_router
 from app.core.logging import setup_logging
 from app.core.config import settings
+from app.services.auditoria_service import armazem_auditoria
+from app.core.artefatos import armazem_artefatos
+from app.core import rastreamento, monitor_loop
 
 setup_logging(settings.LOG_FILE)
 
@@ -19,6 +22,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
-app.include_router(api_router) 
\ No newline at end of file
+# Um trace por requisição (id devolvido no cabeçalho X-Trace-Id)
+app.add_middleware(rastreamento.MiddlewareRastreamento)
+
+app.include_router(api_router)
+
+# Atraso do event loop e pilhas das chamadas que o bloqueiam (/metrics e /v1/metricas/loop)
+app.add_event_handler("startup", monitor_loop.iniciar)
+app.add_event_handler("shutdown", monitor_loop.parar)
+
+# Grava os registros de auditoria e os artefatos ainda pendentes antes de encerrar
+app.add_event_handler("shutdown", armazem_auditoria.descarregar)
+app.add_event_handler("shutdown", armazem_artefatos.descarregar)
+app.add_event_handler("shutdown", rastreamento.descarregar) 
\ No newline at end of file
@@ -0,0 +1,95 @@
+import os
+import sys
+import random
+import logging
+import argparse
+import numpy as np
+
+# Adiciona o diretório raiz do projeto ao sys.path para reutilizar o serviço de FAQ (app.services)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.clients import criar_cliente_sync
+from app.services import faq_service
+from app.services.busca_lexica import STOPWORDS, fundir_rrf, normalizar
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def gerar_consultas(perguntas: list, semente: int = 42) -> list:
+    """
+    Gera consultas de avaliação a partir das perguntas da base: a pergunta original,
+    a pergunta sem acentos/pontuação, só as palavras de conteúdo e uma versão truncada.
+    """
+    aleatorio = random.Random(semente)
+    consultas = []
+    for pergunta in perguntas:
+        palavras_conteudo = [p for p in normalizar(pergunta).split() if p not in STOPWORDS]
+        variantes = {
+            "original": pergunta,
+            "normalizada": normalizar(pergunta),
+            "palavras_chave": " ".join(palavras_conteudo),
+            "truncada": " ".join(palavras_conteudo[:max(2, len(palavras_conteudo) // 2)]),
+        }
+        if len(palavras_conteudo) > 3:
+            embaralhadas = palavras_conteudo[:]
+            aleatorio.shuffle(embaralhadas)
+            variantes["embaralhada"] = " ".join(embaralhadas)
+        for tipo, texto in variantes.items():
+            if texto.strip():
+                consultas.append({"tipo": tipo, "consulta": texto, "esperada": pergunta})
+    return consultas
+
+def ids_vetoriais(client, consulta: str, k: int) -> list:
+    """Vizinhos do FAISS filtrados pelo threshold L2 (com k = K_VIZINHOS, a lógica anterior)."""
+    resp = client.embeddings.create(input=[consulta], model=faq_service.EMBED_MODEL)
+    emb = np.array([resp.data[0].embedding], dtype="float32")
+    D, I = faq_service.index.search(emb, k)
+    return [int(idx) for score, idx in zip(D[0], I[0]) if idx != -1 and score < faq_service.THRESHOLD_L2]
+
+def acertou(ids: list, esperada: str) -> bool:
+    return any(faq_service._pergunta_do_item(faq_service.base_conhecimento[idx]) == esperada for idx in ids)
+
+def avaliar(limite: int = None, sem_vetorial: bool = False):
+    perguntas = sorted({faq_service._pergunta_do_item(item) for item in faq_service.base_conhecimento})
+    consultas = gerar_consultas(perguntas)
+    if limite:
+        consultas = consultas[:limite]
+    client = None if sem_vetorial else criar_cliente_sync()
+
+    acertos_vetorial = acertos_hibrido = acertos_lexical = 0
+    rapidas = rapidas_corretas = 0
+    for item in consultas:
+        lexicos = faq_service.buscar_lexical(item["consulta"])
+        ids_lexicos = [idx for idx, _ in lexicos]
+        acertos_lexical += acertou(ids_lexicos[:faq_service.K_VIZINHOS], item["esperada"])
+
+        if faq_service.lexico_forte(lexicos):
+            # Caminho rápido: a aplicação não gera embedding para esta consulta
+            rapidas += 1
+            rapidas_corretas += acertou(ids_lexicos[:1], item["esperada"])
+            ids_hibridos = ids_lexicos
+        else:
+            candidatos = [] if sem_vetorial else ids_vetoriais(client, item["consulta"], faq_service.K_CANDIDATOS)
+            ids_hibridos = fundir_rrf([candidatos, ids_lexicos], k=faq_service.RRF_K)
+
+        # O híbrido é avaliado como a aplicação monta o prompt: FAQs de origem, sem repetição
+        faqs = faq_service.agrupar_por_faq(ids_hibridos)[:faq_service.MAX_FAQS_CONTEXTO]
+        acertos_hibrido += any(faq_service._pergunta_do_item(f) == item["esperada"] for f in faqs)
+        if not sem_vetorial:
+            acertos_vetorial += acertou(ids_vetoriais(client, item["consulta"], faq_service.K_VIZINHOS), item["esperada"])
+
+    total = len(consultas)
+    print(f"Consultas avaliadas: {total} ({len(perguntas)} perguntas da base)")
+    print(f"Recall@{faq_service.K_VIZINHOS} lexical (BM25):      {acertos_lexical / total:.1%}")
+    if not sem_vetorial:
+        print(f"Recall@{faq_service.K_VIZINHOS} vetorial (anterior): {acertos_vetorial / total:.1%}")
+    print(f"Recall@{faq_service.MAX_FAQS_CONTEXTO} FAQs híbrido:        {acertos_hibrido / total:.1%}")
+    print(f"Consultas sem embedding (caminho rápido): {rapidas / total:.1%}")
+    if rapidas:
+        print(f"Precisão@1 do caminho rápido: {rapidas_corretas / rapidas:.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara a recuperação vetorial, lexical e híbrida do FAQ.")
+    parser.add_argument("--limite", type=int, default=None, help="Avalia apenas as N primeiras consultas.")
+    parser.add_argument("--sem-vetorial", action="store_true", help="Não chama a API de embeddings (só BM25).")
+    args = parser.parse_args()
+    avaliar(limite=args.limite, sem_vetorial=args.sem_vetorial)
@@ -0,0 +1,307 @@
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import random
+import pickle
+import asyncio
+import inspect
+import argparse
+import logging
+import platform
+import subprocess
+from datetime import datetime
+
+# Sem rede: a OpenAI e o portal BRMED são substituídos pelos simulados de tests/stubs, e os caches
+# de respostas ficam desligados para medir o trabalho de cada etapa (não o acerto de cache)
+os.environ.setdefault("OPENAI_API_KEY", "chave-falsa")
+os.environ.setdefault("LLM_CACHE_HABILITADO", "false")
+os.environ.setdefault("RASTREAMENTO_HABILITADO", "false")
+
+# Adiciona o diretório raiz do projeto ao sys.path para reutilizar os serviços (app.*) e os simulados (tests.stubs)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import faiss
+
+from tests.stubs import openai_falso, portal_brmed
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, '..'))
+DIRETORIO_RESULTADOS = os.path.join(PROJECT_ROOT, "resultados", "benchmarks")
+PADRAO_PDFS = os.path.join(PROJECT_ROOT, "tests", "test_data", "*.pdf")
+CPF_PORTAL = "52998224725"
+
+# nome -> (função que prepara o caso, descrição)
+BENCHMARKS = {}
+
+def benchmark(nome: str, descricao: str):
+    """
+    Registra um benchmark. A função (síncrona ou assíncrona) recebe os argumentos da linha de
+    comando e devolve (executar, info): `executar` é a chamada medida (síncrona ou assíncrona) e `info`
+    descreve a entrada usada.
+    """
+    def registrar(funcao):
+        BENCHMARKS[nome] = (funcao, descricao)
+        return funcao
+    return registrar
+
+# ─── Entradas sintéticas determinísticas ──────────────────────────────────────
+def documento_sintetico(semente: int = 7, linhas: int = 160) -> str:
+    """Markdown parecido com o do OCR: cabeçalho com CPF, laudos, telefones e CNPJ misturados."""
+    aleatorio = random.Random(semente)
+    exames = list(openai_falso.EXAMES_CONHECIDOS)
+    partes = [
+        "## LABORATÓRIO EXEMPLO - CNPJ 12.345.678/0001-90 - Tel (11) 3456-7890",
+        "Paciente: FULANO DE TAL - 12/03/2024",
+        "CPF: 529.982.247-25  RG 12.345.678-9",
+    ]
+    for i in range(linhas):
+        exame = aleatorio.choice(exames)
+        if i % 20 == 0:
+            partes.append(f"| {exame} | Resultado | Valores de referência |")
+        partes.append(f"| {exame} | {aleatorio.uniform(0.5, 300):.2f} mg/dL | {aleatorio.randint(1, 9)},0 a {aleatorio.randint(10, 99)},0 |")
+        if i % 37 == 0:
+            partes.append(f"Protocolo {aleatorio.randint(10**10, 10**11 - 1)} - Responsável técnico CRM 123456")
+    partes.append("Assinado eletronicamente. Página 1 de 1. CPF do paciente: SP/52998224725")
+    return "\n".join(partes)
+
+def nomes_exames(limite: int = 2000) -> list:
+    caminho = os.path.join(PROJECT_ROOT, "exames_similares_final.csv")
+    if not os.path.exists(caminho):
+        return list(openai_falso.EXAMES_CONHECIDOS)
+    with open(caminho, "r", encoding="utf-8") as f:
+        linhas = list(csv.DictReader(f))
+    nomes = [linha["Exame"] for linha in linhas] + [linha["Similares"] for linha in linhas if linha.get("Similares")]
+    return nomes[:limite]
+
+def carregar_ou_sintetizar_indice(nome_indice: str, nome_dados: str, dimensao: int):
+    """Índice FAISS real de data/ quando existir; senão um IndexFlatL2 com o mesmo número de itens."""
+    caminho_indice = os.path.join(PROJECT_ROOT, "data", nome_indice)
+    caminho_dados = os.path.join(PROJECT_ROOT, "data", nome_dados)
+    dados = []
+    if os.path.exists(caminho_dados):
+        with open(caminho_dados, "rb") as f:
+            dados = pickle.load(f)
+    if os.path.exists(caminho_indice):
+        return faiss.read_index(caminho_indice), dados, "real"
+    quantidade = len(dados) or 500
+    vetores = np.random.default_rng(0).standard_normal((quantidade, dimensao)).astype("float32")
+    vetores /= np.linalg.norm(vetores, axis=1, keepdims=True)
+    indice = faiss.IndexFlatL2(dimensao)
+    indice.add(vetores)
+    return indice, dados, "sintetico"
+
+def consultas_aleatorias(quantidade: int, dimensao: int) -> np.ndarray:
+    consultas = np.random.default_rng(1).standard_normal((quantidade, dimensao)).astype("float32")
+    return consultas / np.linalg.norm(consultas, axis=1, keepdims=True)
+
+def cliente_portal():
+    import httpx
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=portal_brmed.app), base_url="http://portal-falso",
+        cookies={portal_brmed.COOKIE_SESSAO: portal_brmed.SESSAO_VALIDA}, follow_redirects=True
+    )
+
+# ─── Benchmarks ───────────────────────────────────────────────────────────────
+@benchmark("cpf_regex", "ocr_service.extrair_cpf_regex sobre um markdown de laudo sintético")
+def bench_cpf_regex(args):
+    from app.services.ocr_service import extrair_cpf_regex
+    documento = documento_sintetico()
+    return (lambda: extrair_cpf_regex(documento)), {"caracteres": len(documento)}
+
+@benchmark("guia_parser", "extração de nome e exames da guia BRMED (extract_nome_e_exames)")
+async def bench_guia_parser(args):
+    # brmed_service.extract_nome_e_exames delega ao guia_parser; importado direto para não exigir o Playwright
+    from app.services import guia_parser, brmed_http
+    corpus = []
+    for caminho in sorted(glob.glob(os.path.join(PROJECT_ROOT, "resultados", "debug_conteudo_*.txt"))):
+        with open(caminho, "r", encoding="utf-8") as f:
+            corpus.append(f.read())
+    if not corpus:
+        # Sem dumps salvos do portal, usa a guia renderizada pelo portal simulado
+        async with cliente_portal() as client:
+            corpus.append(await brmed_http.buscar_texto_guia(client, "/operacoes/", CPF_PORTAL))
+    return (lambda: [guia_parser.extrair_guia(texto) for texto in corpus]), {"documentos": len(corpus)}
+
+@benchmark("normalizar_exame", "compactacao_service.normalizar_exame sobre os nomes de exames do CSV de similares")
+def bench_normalizar_exame(args):
+    from app.services.compactacao_service import normalizar_exame
+    nomes = nomes_exames()
+    return (lambda: [normalizar_exame(nome) for nome in nomes]), {"nomes": len(nomes)}
+
+@benchmark("faiss_exames", "busca FAISS (k=5) no índice de similaridade de exames, lote de 8 consultas")
+def bench_faiss_exames(args):
+    indice, _, origem = carregar_ou_sintetizar_indice("exam_similarity_index.faiss", "exam_similarity_data.pkl", args.dimensao)
+    consultas = consultas_aleatorias(8, indice.d)
+    return (lambda: indice.search(consultas, 5)), {"itens": indice.ntotal, "dimensao": indice.d, "indice": origem}
+
+@benchmark("faiss_faq", "busca FAISS (k=5) no índice do FAQ, uma consulta")
+def bench_faiss_faq(args):
+    indice, _, origem = carregar_ou_sintetizar_indice("faq_index.faiss", "faq_data.pkl", args.dimensao)
+    consulta = consultas_aleatorias(1, indice.d)
+    return (lambda: indice.search(consulta, 5)), {"itens": indice.ntotal, "dimensao": indice.d, "indice": origem}
+
+@benchmark("prompt_comparacao", "validacao_service.montar_prompt_comparacao com 12 obrigatórios e 60 sinônimos")
+def bench_prompt_comparacao(args):
+    from app.services.validacao_service import montar_prompt_comparacao
+    nomes = nomes_exames(200)
+    obrigatorios, recebidos = nomes[:12], nomes[6:16]
+    contexto = "Sinônimos: " + ", ".join(nomes[:60])
+    return (lambda: montar_prompt_comparacao(recebidos, obrigatorios, contexto)), {"obrigatorios": 12, "recebidos": 10}
+
+@benchmark("comparar_exames_rag", "validacao_service.comparar_exames_com_rag completo (embeddings + FAISS + LLM simulados)")
+def bench_comparar_exames_rag(args):
+    from app.services import validacao_service
+    indice, dados, origem = carregar_ou_sintetizar_indice("exam_similarity_index.faiss", "exam_similarity_data.pkl", args.dimensao)
+    if validacao_service.exam_similarity_index is None:
+        validacao_service.exam_similarity_index, validacao_service.exam_similarity_data = indice, dados
+    nomes = nomes_exames(200)
+    obrigatorios, recebidos = nomes[:12], nomes[6:16]
+    return (lambda: validacao_service.comparar_exames_com_rag(recebidos, obrigatorios)), {"indice": origem}
+
+@benchmark("extracao_documento_ia", "ocr_service.extrair_dados_documento_ia (compactação + LLM simulado), sem cache")
+def bench_extracao_documento_ia(args):
+    from app.services import ocr_service
+    documento = documento_sintetico()
+
+    async def executar():
+        ocr_service._cache_extracao.clear()
+        return await ocr_service.extrair_dados_documento_ia(documento)
+    return executar, {"caracteres": len(documento)}
+
+@benchmark("brmed_http_guia", "caminho HTTP da guia BRMED (busca -> paciente -> guia) no portal simulado + parser")
+def bench_brmed_http_guia(args):
+    from app.services import guia_parser, brmed_http
+
+    async def executar():
+        async with cliente_portal() as client:
+            texto = await brmed_http.buscar_texto_guia(client, "/operacoes/", CPF_PORTAL)
+        return guia_parser.extrair_guia(texto)
+    return executar, {"latencia_portal_ms": args.latencia_portal_ms}
+
+@benchmark("docling", "conversão Docling dos PDFs de tests/test_data")
+def bench_docling(args):
+    from app.services.ocr_service import processar_arquivo_docling
+    pdfs = sorted(glob.glob(PADRAO_PDFS))
+    if not pdfs:
+        raise FileNotFoundError(f"Nenhum PDF em {PADRAO_PDFS}")
+    return (lambda: [processar_arquivo_docling(pdf) for pdf in pdfs]), {"pdfs": len(pdfs), "repeticoes_max": args.repeticoes_docling}
+
+# ─── Execução e comparação ────────────────────────────────────────────────────
+def _percentil(amostras: list, p: float) -> float:
+    ordenadas = sorted(amostras)
+    return ordenadas[min(int(round(p / 100 * (len(ordenadas) - 1))), len(ordenadas) - 1)]
+
+async def medir(executar, repeticoes: int, aquecimento: int) -> dict:
+    tempos = []
+    for i in range(aquecimento + repeticoes):
+        inicio = time.perf_counter()
+        resultado = executar()
+        if inspect.isawaitable(resultado):
+            await resultado
+        if i >= aquecimento:
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "repeticoes": len(tempos),
+        "media_ms": round(sum(tempos) / len(tempos), 4),
+        "p50_ms": round(_percentil(tempos, 50), 4),
+        "p95_ms": round(_percentil(tempos, 95), 4),
+        "min_ms": round(min(tempos), 4),
+        "max_ms": round(max(tempos), 4)
+    }
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+def comparar(atual: dict, base: dict, tolerancia: float) -> list:
+    """Imprime a variação do p50 de cada benchmark e retorna os que pioraram além da tolerância."""
+    regressoes = []
+    print(f"\nComparação com {base.get('commit') or '?'} ({base.get('gerado_em')}), tolerância {tolerancia:.0%}:")
+    for nome, resultado in atual["resultados"].items():
+        anterior = base.get("resultados", {}).get(nome, {})
+        if "p50_ms" not in resultado or "p50_ms" not in anterior:
+            continue
+        variacao = resultado["p50_ms"] / anterior["p50_ms"] - 1 if anterior["p50_ms"] else 0.0
+        marca = "  REGRESSÃO" if variacao > tolerancia else ""
+        print(f"  {nome:<24} {anterior['p50_ms']:>10.3f}ms -> {resultado['p50_ms']:>10.3f}ms  ({variacao:+.1%}){marca}")
+        if marca:
+            regressoes.append(nome)
+    return regressoes
+
+async def main(args):
+    openai_falso.configurar(
+        latencia_chat=args.latencia_llm_ms / 1000, desvio_chat=args.desvio_llm_ms / 1000,
+        latencia_embedding=args.latencia_embedding_ms / 1000, dimensao=args.dimensao
+    )
+    portal_brmed.configurar(latencia=args.latencia_portal_ms / 1000)
+    from app.core import llm
+    llm.client = openai_falso.criar_cliente()
+
+    selecionados = [nome for nome in BENCHMARKS if not args.somente or nome in args.somente]
+    resultados = {}
+    for nome in selecionados:
+        preparar, descricao = BENCHMARKS[nome]
+        repeticoes = min(args.repeticoes, args.repeticoes_docling) if nome == "docling" else args.repeticoes
+        try:
+            preparado = preparar(args)
+            executar, info = await preparado if inspect.isawaitable(preparado) else preparado
+            resultados[nome] = {**await medir(executar, repeticoes, 0 if nome == "docling" else args.aquecimento), "info": info}
+            print(f"{nome:<24} p50 {resultados[nome]['p50_ms']:>10.3f}ms  p95 {resultados[nome]['p95_ms']:>10.3f}ms  ({descricao})")
+        except Exception as e:
+            # Ex: Docling/torch ausentes no ambiente; os demais benchmarks seguem
+            resultados[nome] = {"erro": f"{type(e).__name__}: {e}"}
+            print(f"{nome:<24} ERRO: {resultados[nome]['erro']}")
+
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {
+            "repeticoes": args.repeticoes, "aquecimento": args.aquecimento, "latencia_llm_ms": args.latencia_llm_ms,
+            "desvio_llm_ms": args.desvio_llm_ms, "latencia_embedding_ms": args.latencia_embedding_ms,
+            "latencia_portal_ms": args.latencia_portal_ms, "dimensao": args.dimensao
+        },
+        "resultados": resultados
+    }
+    saida = args.saida or os.path.join(
+        DIRETORIO_RESULTADOS, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}_{relatorio['commit'] or 'sem_commit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados salvos em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regressoes = comparar(relatorio, json.load(f), args.tolerancia)
+        if regressoes:
+            print(f"Regressões acima de {args.tolerancia:.0%}: {', '.join(regressoes)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks das etapas do processamento, offline (OpenAI e portal simulados).")
+    parser.add_argument("--somente", nargs="*", choices=list(BENCHMARKS), help="Executa apenas os benchmarks indicados.")
+    parser.add_argument("--repeticoes", type=int, default=200, help="Medições por benchmark.")
+    parser.add_argument("--aquecimento", type=int, default=5, help="Execuções descartadas antes de medir.")
+    parser.add_argument("--repeticoes-docling", type=int, default=1, help="Limite de medições da conversão Docling (lenta).")
+    parser.add_argument("--latencia-llm-ms", type=float, default=0.0, help="Latência simulada das chamadas de chat.")
+    parser.add_argument("--desvio-llm-ms", type=float, default=0.0, help="Desvio padrão da latência simulada de chat.")
+    parser.add_argument("--latencia-embedding-ms", type=float, default=0.0, help="Latência simulada dos embeddings.")
+    parser.add_argument("--latencia-portal-ms", type=float, default=0.0, help="Latência simulada por página do portal BRMED.")
+    parser.add_argument("--dimensao", type=int, default=3072, help="Dimensão dos vetores (índices sintéticos e embeddings simulados).")
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: resultados/benchmarks/benchmark_<data>_<commit>.json).")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior; retorna 1 se algum p50 piorar além da tolerância.")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Piora relativa do p50 tolerada na comparação (0.10 = 10%%).")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,87 @@
+import os
+import re
+import sys
+import glob
+import time
+import logging
+import argparse
+
+# Adiciona o diretório raiz do projeto ao sys.path para reutilizar o parser da guia (app.services)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.guia_parser import extrair_guia
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("parser_legado")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, '..'))
+PADRAO_CORPUS = os.path.join(PROJECT_ROOT, "resultados", "debug_conteudo_*.txt")
+
+def extrair_legado(conteudo: str):
+    """Implementação anterior de brmed_service.extract_nome_e_exames, mantida como referência."""
+    logger.info(f"Conteúdo recebido para extração: {conteudo[:500]}...")
+    nome_match = re.search(r"Nome / Name:\s*(.*?)(?:Identidade / ID Number:|\n)", conteudo)
+    logger.info(f"Nome match object: {nome_match}")
+    nome = nome_match.group(1).strip() if nome_match else None
+    logger.info(f"Nome extraído: {nome}")
+    if nome:
+        nome = nome.split("\t")[0].split("  ")[0].strip()
+    exames_match = re.search(r"4\. Exames / Exams:[\s\S]*", conteudo)
+    exames_texto = exames_match.group(0).strip() if exames_match else ""
+    logger.info(f"Exames texto extraído: {exames_texto[:500]}...")
+    exames = []
+    for linha in exames_texto.splitlines():
+        linha_limpa = linha.strip().replace('\t', ' ')
+        logger.info(f"Linha limpa para extração de exames: {linha_limpa}")
+        if not linha_limpa or linha_limpa.lower().startswith("4. exames") or linha_limpa.lower().startswith("obrigatório") or "não requer preparo prévio" in linha_limpa.lower() or "jejum" in linha_limpa.lower() or "horas antes do exame" in linha_limpa.lower() or "evitar" in linha_limpa.lower() or "não ingerir" in linha_limpa.lower() or "manter dieta" in linha_limpa.lower() or "informar os medicamentos" in linha_limpa.lower() or "caso faça uso de óculos" in linha_limpa.lower() or "não se expor a sons fortes" in linha_limpa.lower() or "voltar imprimir" in linha_limpa.lower() or "copyright" in linha_limpa.lower():
+            continue
+        match = re.match(r"^([A-ZÀ-Úa-zà-úÇçÊêÍíÓóÕõÂâÊêÔôÃãÕõÇç\s]+?)(?:\s*/.*)?$", linha_limpa)
+        if match:
+            exame = match.group(1).strip()
+            if exame and exame not in exames:
+                exames.append(exame)
+    logger.info(f"Exames extraídos: {exames}")
+    return {"nome": nome, "exames": exames}
+
+def medir(funcao, textos: list, repeticoes: int) -> float:
+    """Tempo médio por documento, em microssegundos."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for texto in textos:
+            funcao(texto)
+    return (time.perf_counter() - inicio) / (repeticoes * len(textos)) * 1e6
+
+def executar(padrao: str, repeticoes: int):
+    arquivos = sorted(glob.glob(padrao))
+    if not arquivos:
+        print(f"Nenhum arquivo encontrado em '{padrao}'.")
+        return 1
+    textos = []
+    for caminho in arquivos:
+        with open(caminho, "r", encoding="utf-8") as f:
+            textos.append(f.read())
+
+    divergentes = [a for a, t in zip(arquivos, textos) if extrair_legado(t) != extrair_guia(t)]
+    # O logging do caminho quente faz parte do custo do parser antigo: mede com INFO habilitado
+    # num handler nulo, como em produção (sem I/O de console), e com INFO desabilitado.
+    resultados = {}
+    for rotulo, nivel in (("log INFO", logging.INFO), ("log WARNING", logging.WARNING)):
+        logging.getLogger().handlers = [logging.NullHandler()]
+        logging.getLogger().setLevel(nivel)
+        resultados[rotulo] = (medir(extrair_legado, textos, repeticoes), medir(extrair_guia, textos, repeticoes))
+
+    print(f"Documentos: {len(textos)} | Repetições: {repeticoes}")
+    print(f"Saídas idênticas: {len(textos) - len(divergentes)}/{len(textos)}")
+    for caminho in divergentes:
+        print(f"  DIVERGENTE: {os.path.basename(caminho)}")
+    for rotulo, (legado, novo) in resultados.items():
+        print(f"[{rotulo}] legado: {legado:8.1f} µs/doc | novo: {novo:8.1f} µs/doc | {legado / novo:5.1f}x")
+    return 1 if divergentes else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o parser da guia BRMED com a implementação anterior.")
+    parser.add_argument("--corpus", default=PADRAO_CORPUS, help="Padrão glob dos textos de guia salvos.")
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+    sys.exit(executar(args.corpus, args.repeticoes))
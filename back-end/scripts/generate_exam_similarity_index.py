@@ -4,15 +4,15 @@ import pickle
 import numpy as np
 import pandas as pd
 import faiss
-from openai import OpenAI
 from tenacity import retry, wait_exponential, stop_after_attempt
 import logging
-import unicodedata
+import sys
 
-def normalizar_exame(exame: str) -> str:
-    """Remove acentos, caixa e caracteres especiais para comparar exames."""
-    nfkd = unicodedata.normalize('NFKD', exame)
-    return ''.join([c for c in nfkd if not unicodedata.combining(c)]).upper().strip()
+# Adiciona o diretório raiz do projeto ao sys.path para reutilizar o cliente compartilhado (app.core)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.clients import criar_cliente_sync
+from app.services.compactacao_service import normalizar_exame
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -25,7 +25,7 @@ if not OPENAI_API_KEY:
     logging.error("A variável de ambiente OPENAI_API_KEY não está definida.")
     raise ValueError("OPENAI_API_KEY não encontrada.")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = criar_cliente_sync()
 
 # Caminhos
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
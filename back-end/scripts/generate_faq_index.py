@@ -3,9 +3,14 @@ import pickle
 import numpy as np
 import pandas as pd
 import faiss
-from openai import OpenAI
 from tenacity import retry, wait_exponential, stop_after_attempt
 import logging
+import sys
+
+# Adiciona o diretório raiz do projeto ao sys.path para reutilizar o cliente compartilhado (app.core)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.clients import criar_cliente_sync
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -18,7 +23,7 @@ if not OPENAI_API_KEY:
     logging.error("A variável de ambiente OPENAI_API_KEY não está definida.")
     raise ValueError("OPENAI_API_KEY não encontrada.")
 
-client = OpenAI(api_key=OPENAI_API_KEY);
+client = criar_cliente_sync()
 
 # Caminhos
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -58,7 +63,7 @@ def criar_base_vetorial():
     embeddings = []
     base_conhecimento_chunks = []
 
-    for _, row in df.iterrows():
+    for faq_id, row in df.iterrows():
         pergunta = row['Pergunta']
         resposta = row['Resposta Padrão']
         
@@ -76,7 +81,8 @@ def criar_base_vetorial():
                 base_conhecimento_chunks.append({
                     "chunk_text": chunk,
                     "original_question": pergunta,
-                    "original_answer": resposta
+                    "original_answer": resposta,
+                    "faq_id": int(faq_id)
                 })
             except Exception:
                 logging.warning(f"Não foi possível gerar embedding para o chunk: '{chunk[:50]}...'. Pulando.")
@@ -0,0 +1,65 @@
+import os
+import re
+import sys
+import json
+import argparse
+import logging
+from datetime import datetime
+
+# Adiciona o diretório raiz do projeto ao sys.path para reutilizar o armazém de auditoria (app.services)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.auditoria_service import armazem_auditoria
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, '..'))
+DIRETORIO_ANTIGO = os.path.join(PROJECT_ROOT, "auditoria_validacao")
+REGEX_ARQUIVO = re.compile(r'^validacao_(?P<cpf>\d+)_(?P<ts>\d{8}_\d{6})\.json$')
+
+def carregar_arquivos_antigos(diretorio: str) -> list:
+    """Lê os arquivos validacao_<cpf>_<ts>.json, em ordem cronológica."""
+    registros = []
+    for nome in sorted(os.listdir(diretorio)):
+        match = REGEX_ARQUIVO.match(nome)
+        if not match:
+            continue
+        with open(os.path.join(diretorio, nome), "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        criado_em = datetime.strptime(match.group("ts"), "%Y%m%d_%H%M%S").isoformat()
+        registros.append({
+            "id": os.path.splitext(nome)[0],
+            "cpf": dados.get("cpf") or match.group("cpf"),
+            "criado_em": criado_em,
+            "exames_obrigatorios": dados.get("exames_obrigatorios", []),
+            "exames_enviados": dados.get("exames_enviados", []),
+            "resultado": dados.get("resultado"),
+            "migrado_de": nome
+        })
+    return registros
+
+def migrar(diretorio: str, remover: bool = False):
+    registros = carregar_arquivos_antigos(diretorio)
+    # Permite executar de novo sem duplicar o que já foi migrado
+    with armazem_auditoria._conectar() as conexao:
+        migrados = {linha[0] for linha in conexao.execute("SELECT id FROM registros WHERE id LIKE 'validacao_%'")}
+    registros = [r for r in registros if r["id"] not in migrados]
+    if not registros:
+        logging.info(f"Nenhum arquivo de auditoria pendente de migração em '{diretorio}'.")
+        return
+    # Mesmo caminho de gravação da tarefa em segundo plano
+    for inicio in range(0, len(registros), armazem_auditoria.max_lote):
+        armazem_auditoria._gravar_lote(registros[inicio:inicio + armazem_auditoria.max_lote])
+    logging.info(f"{len(registros)} registro(s) migrado(s) para '{armazem_auditoria.diretorio}'.")
+    if remover:
+        for registro in carregar_arquivos_antigos(diretorio):
+            os.remove(os.path.join(diretorio, registro["migrado_de"]))
+        logging.info("Arquivos antigos removidos.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra os JSONs de auditoria_validacao/ para o armazém de auditoria.")
+    parser.add_argument("--diretorio", default=DIRETORIO_ANTIGO)
+    parser.add_argument("--remover", action="store_true", help="Remove os arquivos antigos após a migração.")
+    args = parser.parse_args()
+    migrar(args.diretorio, remover=args.remover)
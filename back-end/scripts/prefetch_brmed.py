@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+import logging
+
+# Adiciona o diretório raiz do projeto ao sys.path para reutilizar o serviço de pré-carga (app.services)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import prefetch_brmed
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def ler_cpfs(caminho: str) -> list:
+    """Um CPF por linha (ou a primeira coluna de um CSV); linhas vazias e '#' são ignoradas."""
+    with open(caminho, "r", encoding="utf-8") as f:
+        linhas = [linha.split(",")[0].split(";")[0].strip() for linha in f]
+    return [linha for linha in linhas if linha and not linha.startswith("#")]
+
+async def exibir_progresso(estado: dict):
+    print(
+        f"\r{estado['concluidos']}/{estado['total']} concluído(s) | "
+        f"{estado['sucesso']} consultado(s) | {estado['em_cache']} em cache | {len(estado['erros'])} erro(s)",
+        end="", flush=True
+    )
+
+async def main(args):
+    cpfs = list(args.cpfs)
+    if args.arquivo:
+        cpfs += ler_cpfs(args.arquivo)
+    if not cpfs:
+        logging.error("Nenhum CPF informado.")
+        return 1
+    estado = await prefetch_brmed.executar_prefetch(cpfs, progresso=exibir_progresso, recarregar=args.recarregar)
+    print()
+    if estado["erros"]:
+        print(json.dumps(estado["erros"], ensure_ascii=False, indent=2))
+    return 0 if estado["status"] == "concluido" and not estado["erros"] else 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-carrega as guias BRMED de uma lista de CPFs no cache por CPF.")
+    parser.add_argument("cpfs", nargs="*", help="CPFs a consultar.")
+    parser.add_argument("--arquivo", help="Arquivo com um CPF por linha (ou CSV com o CPF na primeira coluna).")
+    parser.add_argument("--recarregar", action="store_true", help="Consulta de novo mesmo os CPFs já em cache.")
+    sys.exit(asyncio.run(main(parser.parse_args())))
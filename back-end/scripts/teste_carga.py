@@ -0,0 +1,358 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import socket
+import asyncio
+import argparse
+import logging
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+# Adiciona o diretório raiz do projeto ao sys.path para reutilizar os simulados (tests.stubs)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import uvicorn
+
+from tests.stubs import openai_falso, portal_brmed
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, '..'))
+DIRETORIO_RESULTADOS = os.path.join(PROJECT_ROOT, "resultados", "carga")
+PADRAO_DOCUMENTOS = os.path.join(PROJECT_ROOT, "tests", "test_data", "*.pdf")
+EXAMES_OBRIGATORIOS = ["HEMOGRAMA COMPLETO", "CREATININA", "GLICOSE", "AUDIOMETRIA"]
+PERGUNTAS_FAQ = [
+    "Preciso estar em jejum para o exame de sangue?",
+    "Como faço para remarcar um exame periódico?",
+    "Quanto tempo demora para sair o resultado da audiometria?",
+    "Quais documentos devo levar no dia do exame admissional?",
+    "Posso fazer o exame toxicológico em qualquer clínica?",
+]
+# Histogramas de /metrics resumidos por etapa (média por chamada no período de cada estágio)
+HISTOGRAMAS_ETAPAS = (
+    "ocr_docling_duracao_segundos", "brmed_consulta_duracao_segundos", "brmed_etapa_duracao_segundos",
+    "llm_chamada_duracao_segundos", "faiss_busca_duracao_segundos", "auditoria_gravacao_duracao_segundos",
+    "event_loop_atraso_segundos"
+)
+REGEX_AMOSTRA = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$')
+
+# ─── Processos simulados e aplicação ──────────────────────────────────────────
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def iniciar_simulado(app, porta: int) -> uvicorn.Server:
+    """Sobe um app ASGI simulado numa thread (com event loop próprio)."""
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=porta, log_level="warning"))
+    threading.Thread(target=servidor.run, daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.05)
+    return servidor
+
+def ambiente_aplicacao(args, porta_openai: int, porta_portal: int, diretorio: str) -> dict:
+    """Aplicação apontada para os simulados, com caches desligados e dados gravados num diretório temporário."""
+    ambiente = {
+        **os.environ,
+        "OPENAI_API_KEY": "chave-falsa",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{porta_openai}/v1",
+        "BRMED_URL_BASE": f"http://127.0.0.1:{porta_portal}/login/",
+        "BRMED_USERNAME": "carga",
+        "BRMED_PASSWORD": "carga",
+        "BRMED_MODO": args.modo_brmed,
+        "LLM_REQUISICOES_POR_MINUTO": "100000",
+        "LLM_RAJADA_MAXIMA": "1000",
+        "LOG_FILE": os.path.join(diretorio, "logs", "app.log"),
+        "AUDITORIA_DIRETORIO": os.path.join(diretorio, "auditoria"),
+        "ARTEFATOS_DIRETORIO": os.path.join(diretorio, "artefatos"),
+        "LLM_CACHE_DIRETORIO": os.path.join(diretorio, "cache_llm"),
+        "BRMED_CACHE_DIRETORIO": os.path.join(diretorio, "cache_brmed"),
+        "RASTREAMENTO_ARQUIVO": os.path.join(diretorio, "logs", "spans.jsonl"),
+    }
+    if not args.com_cache:
+        ambiente.update({"LLM_CACHE_HABILITADO": "false", "BRMED_CACHE_HABILITADO": "false", "FAQ_CACHE_TTL_MINUTOS": "0"})
+    for item in args.env or []:
+        chave, _, valor = item.partition("=")
+        ambiente[chave] = valor
+    return ambiente
+
+def iniciar_aplicacao(porta: int, ambiente: dict, espera_maxima: float) -> subprocess.Popen:
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(porta)],
+        cwd=PROJECT_ROOT, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    limite = time.monotonic() + espera_maxima
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"A aplicação encerrou na inicialização:\n{processo.stderr.read().decode(errors='replace')[-3000:]}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{porta}/metrics", timeout=2).status_code == 200:
+                return processo
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    processo.terminate()
+    raise TimeoutError(f"A aplicação não respondeu em {espera_maxima:.0f}s.")
+
+# ─── Recursos do processo e métricas da aplicação ─────────────────────────────
+class AmostradorProcesso:
+    """Amostra CPU (% de um núcleo) e RSS do processo da aplicação lendo /proc (Linux)."""
+
+    def __init__(self, pid: int, intervalo: float = 0.5):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.cpu, self.rss = [], []
+        self._parar = threading.Event()
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._pagina = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _ler(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                campos = f.read().rsplit(")", 1)[1].split()
+            # utime e stime (campos 14 e 15 do stat), RSS em páginas (campo 24)
+            return (int(campos[11]) + int(campos[12])) / self._ticks, int(campos[21]) * self._pagina
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def _amostrar(self):
+        anterior, instante = self._ler(), time.monotonic()
+        while not self._parar.wait(self.intervalo):
+            atual, agora = self._ler(), time.monotonic()
+            if atual is None or anterior is None:
+                return
+            self.cpu.append((atual[0] - anterior[0]) / (agora - instante) * 100)
+            self.rss.append(atual[1] / 1024 / 1024)
+            anterior, instante = atual, agora
+
+    def __enter__(self):
+        threading.Thread(target=self._amostrar, daemon=True).start()
+        return self
+
+    def __exit__(self, *_):
+        self._parar.set()
+
+    def resumo(self) -> dict:
+        if not self.cpu:
+            return {"cpu_media_pct": None, "cpu_max_pct": None, "rss_max_mb": None}
+        return {
+            "cpu_media_pct": round(sum(self.cpu) / len(self.cpu), 1),
+            "cpu_max_pct": round(max(self.cpu), 1),
+            "rss_max_mb": round(max(self.rss), 1)
+        }
+
+def ler_metricas(texto: str) -> dict:
+    """Amostras _sum/_count dos histogramas das etapas: {(nome, rótulos): valor}."""
+    valores = {}
+    for linha in texto.splitlines():
+        match = REGEX_AMOSTRA.match(linha)
+        if not match:
+            continue
+        nome, rotulos, valor = match.groups()
+        base = nome.rsplit("_", 1)[0]
+        if base in HISTOGRAMAS_ETAPAS and nome.endswith(("_sum", "_count")):
+            valores[(nome, rotulos or "")] = float(valor)
+    return valores
+
+def etapas_no_periodo(antes: dict, depois: dict) -> dict:
+    """Chamadas e duração média de cada etapa (por rótulos) entre duas leituras de /metrics."""
+    etapas = {}
+    for (nome, rotulos), valor in depois.items():
+        if not nome.endswith("_count"):
+            continue
+        chamadas = valor - antes.get((nome, rotulos), 0)
+        if chamadas <= 0:
+            continue
+        base = nome[:-len("_count")]
+        soma = depois.get((f"{base}_sum", rotulos), 0) - antes.get((f"{base}_sum", rotulos), 0)
+        etapas[f"{base}{rotulos}"] = {"chamadas": int(chamadas), "media_ms": round(soma / chamadas * 1000, 1)}
+    return etapas
+
+# ─── Cenários ─────────────────────────────────────────────────────────────────
+def _percentil(amostras: list, p: float):
+    if not amostras:
+        return None
+    ordenadas = sorted(amostras)
+    return round(ordenadas[min(int(round(p / 100 * (len(ordenadas) - 1))), len(ordenadas) - 1)], 3)
+
+async def requisicao_documento(client: httpx.AsyncClient, documento: str, stream: bool, prazo: float) -> dict:
+    """Envia um documento; o resultado conta como falha se o workflow não concluir (status falha/parcial ou erro)."""
+    with open(documento, "rb") as f:
+        conteudo = f.read()
+    arquivos = {"arquivo": (os.path.basename(documento), conteudo, "application/pdf")}
+    dados = {"exames_obrigatorios": json.dumps(EXAMES_OBRIGATORIOS)}
+    inicio = time.monotonic()
+    if not stream:
+        resposta = await client.post("/v1/processar-documento", files=arquivos, data=dados, timeout=prazo)
+        corpo = resposta.json() if resposta.status_code == 200 else {}
+        concluido = resposta.status_code == 200 and corpo.get("status") not in ("falha", "parcial") and not corpo.get("erro")
+        return {"http": resposta.status_code, "concluido": concluido, "status": corpo.get("status")}
+    primeiro_evento, final = None, {}
+    async with client.stream("POST", "/v1/processar-documento-stream", files=arquivos, data=dados, timeout=prazo) as resposta:
+        async for linha in resposta.aiter_lines():
+            if not linha.startswith("data: "):
+                continue
+            primeiro_evento = primeiro_evento or time.monotonic() - inicio
+            evento = json.loads(linha[6:])
+            if evento.get("step") in ("concluido", "erro") and (evento.get("resultado") or evento.get("progress") == -1):
+                final = evento
+    resultado = final.get("resultado") or {}
+    concluido = resposta.status_code == 200 and bool(resultado) and resultado.get("status") not in ("falha", "parcial") and not resultado.get("erro")
+    return {"http": resposta.status_code, "concluido": concluido, "status": resultado.get("status"), "primeiro_evento": primeiro_evento}
+
+async def requisicao_faq(client: httpx.AsyncClient, pergunta: str, prazo: float) -> dict:
+    resposta = await client.post("/v1/faq", json={"pergunta": pergunta, "historico": []}, timeout=prazo)
+    concluido = resposta.status_code == 200 and bool(resposta.json().get("resposta_gerada"))
+    return {"http": resposta.status_code, "concluido": concluido}
+
+def montar_cenarios(args) -> dict:
+    documentos = sorted(glob.glob(args.documentos))
+    if not documentos and any(c.startswith("documento") for c in args.cenarios):
+        raise FileNotFoundError(f"Nenhum documento em {args.documentos}")
+    return {
+        "documento": lambda client, i: requisicao_documento(client, documentos[i % len(documentos)], False, args.prazo),
+        "documento_stream": lambda client, i: requisicao_documento(client, documentos[i % len(documentos)], True, args.prazo),
+        "faq": lambda client, i: requisicao_faq(client, PERGUNTAS_FAQ[i % len(PERGUNTAS_FAQ)], args.prazo),
+    }
+
+async def executar_estagio(url: str, enviar, concorrencia: int, duracao: float, max_requisicoes: int) -> dict:
+    """Carga em malha fechada: `concorrencia` clientes enviando uma requisição após a outra."""
+    resultados, contador = [], iter(range(10**9))
+    limite = time.monotonic() + duracao
+
+    async def cliente(client: httpx.AsyncClient):
+        while time.monotonic() < limite:
+            i = next(contador)
+            if max_requisicoes and i >= max_requisicoes:
+                return
+            inicio = time.monotonic()
+            try:
+                resultado = await enviar(client, i)
+            except Exception as e:
+                resultado = {"http": None, "concluido": False, "excecao": type(e).__name__}
+            resultado["latencia"] = time.monotonic() - inicio
+            resultados.append(resultado)
+
+    inicio = time.monotonic()
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    async with httpx.AsyncClient(base_url=url, limits=limites) as client:
+        await asyncio.gather(*[cliente(client) for _ in range(concorrencia)])
+    decorrido = time.monotonic() - inicio
+
+    latencias = [r["latencia"] for r in resultados]
+    concluidos = [r for r in resultados if r["concluido"]]
+    erros_http = [r for r in resultados if r["http"] != 200]
+    primeiros = [r["primeiro_evento"] for r in resultados if r.get("primeiro_evento") is not None]
+    return {
+        "concorrencia": concorrencia,
+        "requisicoes": len(resultados),
+        "duracao_s": round(decorrido, 2),
+        "vazao_rps": round(len(resultados) / decorrido, 3) if decorrido else 0,
+        "concluidos_por_minuto": round(len(concluidos) / decorrido * 60, 1) if decorrido else 0,
+        "taxa_erro_http": round(len(erros_http) / len(resultados), 4) if resultados else None,
+        "taxa_nao_concluidos": round(1 - len(concluidos) / len(resultados), 4) if resultados else None,
+        "excecoes": sorted({r["excecao"] for r in resultados if "excecao" in r}),
+        "latencia_s": {f"p{p}": _percentil(latencias, p) for p in (50, 90, 95, 99)} | {"max": _percentil(latencias, 100)},
+        "primeiro_evento_p50_s": _percentil(primeiros, 50),
+    }
+
+def ponto_de_saturacao(estagios: list):
+    """Primeira concorrência em que a vazão cresce menos de 10% enquanto o p95 piora."""
+    for anterior, atual in zip(estagios, estagios[1:]):
+        ganho = atual["vazao_rps"] / anterior["vazao_rps"] - 1 if anterior["vazao_rps"] else 0
+        if ganho < 0.10 and (atual["latencia_s"]["p95"] or 0) > (anterior["latencia_s"]["p95"] or 0):
+            return anterior["concorrencia"]
+    return None
+
+def imprimir_estagio(cenario: str, estagio: dict):
+    latencia = estagio["latencia_s"]
+    print(
+        f"{cenario:<17} c={estagio['concorrencia']:<3} {estagio['requisicoes']:>5} req  {estagio['vazao_rps']:>7.2f} req/s  "
+        f"{estagio['concluidos_por_minuto']:>7.1f} ok/min  p50 {latencia['p50'] or 0:>7.2f}s  p95 {latencia['p95'] or 0:>7.2f}s  "
+        f"p99 {latencia['p99'] or 0:>7.2f}s  erros {estagio['taxa_erro_http'] or 0:>6.1%}  "
+        f"CPU {estagio['recursos']['cpu_media_pct'] or 0:>5.0f}%  RSS {estagio['recursos']['rss_max_mb'] or 0:>6.0f}MB"
+    )
+    for etapa, valores in sorted(estagio["etapas"].items()):
+        print(f"{'':22}{etapa:<80} {valores['chamadas']:>6}x {valores['media_ms']:>9.1f}ms")
+
+async def main(args):
+    openai_falso.configurar(
+        latencia_chat=args.latencia_llm_ms / 1000, desvio_chat=args.desvio_llm_ms / 1000,
+        latencia_embedding=args.latencia_embedding_ms / 1000, desvio_embedding=args.latencia_embedding_ms / 4000,
+        tokens_resposta=args.tokens_resposta, desvio_tokens=args.tokens_resposta / 3
+    )
+    portal_brmed.configurar(latencia=args.latencia_portal_ms / 1000, qualquer_cpf=True)
+    porta_openai, porta_portal, porta_app = porta_livre(), porta_livre(), porta_livre()
+    simulados = [iniciar_simulado(openai_falso.app, porta_openai), iniciar_simulado(portal_brmed.app, porta_portal)]
+    diretorio = tempfile.mkdtemp(prefix="carga_")
+    logging.info(f"Simulados: OpenAI na porta {porta_openai}, portal na {porta_portal}. Dados da aplicação em {diretorio}")
+
+    processo = iniciar_aplicacao(porta_app, ambiente_aplicacao(args, porta_openai, porta_portal, diretorio), args.espera_inicial)
+    url = f"http://127.0.0.1:{porta_app}"
+    cenarios = montar_cenarios(args)
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "parametros": {k: v for k, v in vars(args).items() if k != "saida"},
+        "cenarios": {}
+    }
+    try:
+        for cenario in args.cenarios:
+            estagios = []
+            for concorrencia in args.concorrencia:
+                antes = ler_metricas(httpx.get(f"{url}/metrics").text)
+                with AmostradorProcesso(processo.pid) as amostrador:
+                    estagio = await executar_estagio(url, cenarios[cenario], concorrencia, args.duracao, args.requisicoes)
+                estagio["recursos"] = amostrador.resumo()
+                estagio["etapas"] = etapas_no_periodo(antes, ler_metricas(httpx.get(f"{url}/metrics").text))
+                estagio["chamadas_simuladas"] = dict(openai_falso.contadores)
+                estagios.append(estagio)
+                imprimir_estagio(cenario, estagio)
+            saturacao = ponto_de_saturacao(estagios)
+            relatorio["cenarios"][cenario] = {"estagios": estagios, "saturacao_concorrencia": saturacao}
+            if saturacao:
+                print(f"{cenario}: vazão satura a partir de concorrência {saturacao}.")
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+        for servidor in simulados:
+            servidor.should_exit = True
+
+    saida = args.saida or os.path.join(DIRETORIO_RESULTADOS, f"carga_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\nRelatório salvo em {saida}")
+    nao_concluidos = [e["taxa_nao_concluidos"] or 0 for c in relatorio["cenarios"].values() for e in c["estagios"]]
+    return 1 if nao_concluidos and max(nao_concluidos) > args.max_falhas else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga da API com OpenAI e portal BRMED simulados localmente.")
+    parser.add_argument("--cenarios", nargs="+", default=["documento", "documento_stream", "faq"], choices=["documento", "documento_stream", "faq"])
+    parser.add_argument("--concorrencia", nargs="+", type=int, default=[1, 2, 4, 8], help="Clientes simultâneos de cada estágio.")
+    parser.add_argument("--duracao", type=float, default=60, help="Duração de cada estágio, em segundos.")
+    parser.add_argument("--requisicoes", type=int, default=0, help="Limite de requisições por estágio (0 = só a duração).")
+    parser.add_argument("--documentos", default=PADRAO_DOCUMENTOS, help="Glob dos documentos enviados (em rodízio).")
+    parser.add_argument("--prazo", type=float, default=300, help="Timeout de cada requisição do cliente, em segundos.")
+    parser.add_argument("--modo-brmed", default="hibrido", choices=["completo", "enxuto", "hibrido"], help="BRMED_MODO da aplicação.")
+    parser.add_argument("--latencia-llm-ms", type=float, default=800, help="Latência média das chamadas de chat simuladas.")
+    parser.add_argument("--desvio-llm-ms", type=float, default=250, help="Desvio padrão da latência de chat simulada.")
+    parser.add_argument("--latencia-embedding-ms", type=float, default=120, help="Latência média dos embeddings simulados.")
+    parser.add_argument("--tokens-resposta", type=int, default=150, help="Tokens médios das respostas livres (FAQ).")
+    parser.add_argument("--latencia-portal-ms", type=float, default=300, help="Latência de cada página do portal simulado.")
+    parser.add_argument("--com-cache", action="store_true", help="Mantém os caches de LLM, guias BRMED e FAQ ligados.")
+    parser.add_argument("--env", nargs="*", help="Variáveis extras para a aplicação (CHAVE=VALOR).")
+    parser.add_argument("--espera-inicial", type=float, default=180, help="Tempo máximo para a aplicação subir, em segundos.")
+    parser.add_argument("--max-falhas", type=float, default=0.05, help="Fração de não concluídos acima da qual o script retorna 1.")
+    parser.add_argument("--saida", help="Arquivo JSON do relatório (padrão: resultados/carga/carga_<data>.json).")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,79 @@
+import os
+import sys
+import argparse
+from datetime import datetime
+
+# Adiciona o diretório raiz do projeto ao sys.path para reutilizar a leitura dos spans (app.core)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core import rastreamento
+
+def ordenar_em_arvore(spans: list) -> list:
+    """(profundidade, span) em pré-ordem: cada span seguido dos filhos, por ordem de início."""
+    ids = {s["span_id"] for s in spans}
+    filhos = {}
+    for s in spans:
+        pai = s["pai_id"] if s["pai_id"] in ids else None
+        filhos.setdefault(pai, []).append(s)
+    ordem = []
+
+    def visitar(pai, profundidade):
+        for s in filhos.get(pai, []):
+            ordem.append((profundidade, s))
+            visitar(s["span_id"], profundidade + 1)
+    visitar(None, 0)
+    return ordem
+
+def imprimir_cascata(spans: list, largura: int, atributos: bool):
+    inicio = min(s["inicio_ns"] for s in spans)
+    total = max(max(s["fim_ns"] for s in spans) - inicio, 1)
+    print(f"trace {spans[0]['trace_id']} | {len(spans)} spans | {total / 1e9:.3f}s | "
+          f"{datetime.fromtimestamp(inicio / 1e9):%Y-%m-%d %H:%M:%S}")
+    for profundidade, s in ordenar_em_arvore(spans):
+        deslocamento = (s["inicio_ns"] - inicio) / 1e9
+        duracao = (s["fim_ns"] - s["inicio_ns"]) / 1e9
+        coluna = int((s["inicio_ns"] - inicio) / total * largura)
+        tamanho = max(int(round((s["fim_ns"] - s["inicio_ns"]) / total * largura)), 1)
+        barra = (" " * coluna + "█" * tamanho)[:largura].ljust(largura)
+        erro = " !" if s["status"].get("code") == rastreamento.STATUS_ERRO else ""
+        nome = ("  " * profundidade + s["nome"])[:48]
+        print(f"{deslocamento:8.3f}s {duracao:8.3f}s  {nome:<48} |{barra}|{erro}")
+        if atributos and s["atributos"]:
+            detalhes = ", ".join(f"{chave}={valor}" for chave, valor in s["atributos"].items())
+            print(f"{'':20}{'  ' * (profundidade + 1)}{detalhes}")
+        if erro:
+            print(f"{'':20}{'  ' * (profundidade + 1)}erro: {s['status'].get('message', '')}")
+
+def listar_traces(spans: list, quantidade: int):
+    """Spans raiz mais recentes (um por trace), com duração e atributos HTTP."""
+    raizes = [s for s in spans if not s["pai_id"] or s["atributos"].get("http.method")]
+    vistos = set()
+    for s in reversed(raizes):
+        if s["trace_id"] in vistos:
+            continue
+        vistos.add(s["trace_id"])
+        status = s["atributos"].get("http.status_code", "")
+        print(f"{datetime.fromtimestamp(s['inicio_ns'] / 1e9):%Y-%m-%d %H:%M:%S}  {s['trace_id']}  "
+              f"{(s['fim_ns'] - s['inicio_ns']) / 1e9:8.3f}s  {status!s:>3}  {s['nome']}")
+        if len(vistos) >= quantidade:
+            break
+
+def main(args):
+    if args.trace_id:
+        spans = rastreamento.ler_spans(args.arquivo, args.trace_id)
+        if not spans:
+            print(f"Nenhum span encontrado para o trace {args.trace_id}.")
+            return 1
+        imprimir_cascata(spans, args.largura, args.atributos)
+    else:
+        listar_traces(rastreamento.ler_spans(args.arquivo), args.ultimos)
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exibe em cascata (waterfall) os spans de um trace gravado em JSONL.")
+    parser.add_argument("trace_id", nargs="?", help="Id do trace (cabeçalho X-Trace-Id); sem ele, lista os traces recentes.")
+    parser.add_argument("--arquivo", help="Arquivo de spans (padrão: RASTREAMENTO_ARQUIVO).")
+    parser.add_argument("--ultimos", type=int, default=20, help="Quantidade de traces listados quando nenhum id é informado.")
+    parser.add_argument("--largura", type=int, default=60, help="Largura da barra de tempo, em caracteres.")
+    parser.add_argument("--atributos", action="store_true", help="Mostra os atributos de cada span.")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,170 @@
+"""
+API da OpenAI simulada para benchmarks e testes de carga, sem rede: chat completions (inclusive
+em streaming) e embeddings, com respostas determinísticas e latência/tokens configuráveis.
+Entende os três usos da aplicação: extração estruturada do documento, comparação de exames
+(todos os obrigatórios presentes na lista recebida são marcados como encontrados) e FAQ.
+"""
+import re
+import json
+import time
+import base64
+import random
+import asyncio
+import hashlib
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Vocabulário reconhecido como exame na extração simulada
+EXAMES_CONHECIDOS = (
+    "HEMOGRAMA COMPLETO", "HEMOGRAMA", "CREATININA", "GLICOSE", "ELETROCARDIOGRAMA", "AUDIOMETRIA",
+    "ACUIDADE VISUAL", "ESPIROMETRIA", "RAIO X DE TORAX", "EXAME CLINICO", "GAMA GT", "TGO", "TGP",
+    "COLESTEROL TOTAL", "TRIGLICERIDEOS", "EAS", "ELETROENCEFALOGRAMA"
+)
+REGEX_CPF = re.compile(r'(?<!\d)\d{3}\.?\d{3}\.?\d{3}-?\d{2}(?!\d)')
+REGEX_OBRIGATORIOS = re.compile(r'Exames Obrigatórios: (\[.*?\])\n')
+REGEX_RECEBIDOS = re.compile(r'Exames Recebidos: (\[.*?\])\n')
+PALAVRAS_RESPOSTA = ("o", "exame", "deve", "ser", "agendado", "com", "antecedencia", "e", "o", "resultado", "sai", "em", "dois", "dias")
+
+config = {
+    "latencia_chat": 0.0,        # segundos até a resposta (ou o primeiro trecho, em streaming)
+    "desvio_chat": 0.0,
+    "latencia_embedding": 0.0,
+    "desvio_embedding": 0.0,
+    "tokens_resposta": 120,      # tokens da resposta livre (FAQ), média e desvio
+    "desvio_tokens": 40,
+    "dimensao": 3072,
+    "semente": 42,
+    "falha_stream_apos": None,   # em streaming, envia um evento de erro depois de N trechos
+}
+contadores = {"chat": 0, "chat_stream": 0, "embeddings": 0, "textos_embedding": 0}
+_aleatorio = random.Random(config["semente"])
+
+app = FastAPI()
+
+def configurar(**valores):
+    """Altera a configuração (latências em segundos) e reinicia o gerador de números."""
+    global _aleatorio
+    config.update(valores)
+    _aleatorio = random.Random(config["semente"])
+    for chave in contadores:
+        contadores[chave] = 0
+
+def _sortear(media: float, desvio: float) -> float:
+    return max(_aleatorio.gauss(media, desvio), 0.0) if desvio else media
+
+def _tokens(texto: str) -> int:
+    return max(len(texto) // 4, 1)
+
+def _vetor(texto: str, dimensao: int) -> np.ndarray:
+    semente = int.from_bytes(hashlib.sha256(texto.encode("utf-8")).digest()[:8], "little")
+    vetor = np.random.default_rng(semente).standard_normal(dimensao).astype("float32")
+    return vetor / np.linalg.norm(vetor)
+
+def _normalizar(texto: str) -> str:
+    return " ".join(re.sub(r"[^A-Z0-9 ]", " ", texto.upper()).split())
+
+def _extracao_documento(texto: str) -> dict:
+    cpfs = list(dict.fromkeys(re.sub(r"\D", "", c) for c in REGEX_CPF.findall(texto)))
+    normalizado = _normalizar(texto)
+    exames = []
+    for exame in EXAMES_CONHECIDOS:
+        if exame in normalizado and not any(exame in outro for outro in exames):
+            exames.append(exame)
+    nome = re.search(r"(?:Paciente|Nome)\s*:?\s*([A-ZÀ-Ú][A-ZÀ-Ú ]{3,60})", texto)
+    return {
+        "exames": exames, "cpf": cpfs[0] if cpfs else None, "cpfs": cpfs,
+        "nome_paciente": nome.group(1).strip() if nome else None
+    }
+
+def _comparacao_exames(texto: str) -> dict:
+    obrigatorios = json.loads(REGEX_OBRIGATORIOS.search(texto).group(1)) if REGEX_OBRIGATORIOS.search(texto) else []
+    recebidos = json.loads(REGEX_RECEBIDOS.search(texto).group(1)) if REGEX_RECEBIDOS.search(texto) else []
+    normalizados = [_normalizar(r) for r in recebidos]
+    itens = []
+    for exame in obrigatorios:
+        chave = _normalizar(exame).split(" / ")[0]
+        encontrado = any(chave in r or r in chave for r in normalizados if r)
+        itens.append({
+            "exame": exame, "status": "encontrado" if encontrado else "faltante",
+            "justificativa": "Comparação simulada por nome normalizado."
+        })
+    return {"exames": itens}
+
+def _resposta_livre() -> str:
+    quantidade = max(int(_sortear(config["tokens_resposta"], config["desvio_tokens"])), 1)
+    return " ".join(PALAVRAS_RESPOSTA[i % len(PALAVRAS_RESPOSTA)] for i in range(quantidade))
+
+def _conteudo(corpo: dict) -> str:
+    texto = "\n".join(str(m.get("content") or "") for m in corpo.get("messages", []))
+    formato = corpo.get("response_format") or {}
+    if formato.get("type") == "json_schema":
+        return json.dumps(_extracao_documento(texto), ensure_ascii=False)
+    if formato.get("type") == "json_object":
+        return json.dumps(_comparacao_exames(texto), ensure_ascii=False)
+    return _resposta_livre()
+
+def _uso(corpo: dict, conteudo: str) -> dict:
+    prompt = sum(_tokens(str(m.get("content") or "")) for m in corpo.get("messages", []))
+    completion = _tokens(conteudo)
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    corpo = await request.json()
+    conteudo = _conteudo(corpo)
+    await asyncio.sleep(_sortear(config["latencia_chat"], config["desvio_chat"]))
+    base = {"id": f"chatcmpl-falso-{sum(contadores.values())}", "created": int(time.time()), "model": corpo.get("model")}
+    if corpo.get("stream"):
+        contadores["chat_stream"] += 1
+        return StreamingResponse(_trechos(base, corpo, conteudo), media_type="text/event-stream")
+    contadores["chat"] += 1
+    return JSONResponse({
+        **base, "object": "chat.completion",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}],
+        "usage": _uso(corpo, conteudo)
+    })
+
+async def _trechos(base: dict, corpo: dict, conteudo: str):
+    for indice, palavra in enumerate(re.findall(r"\S+\s*", conteudo)):
+        if indice == config["falha_stream_apos"]:
+            yield f"data: {json.dumps({'error': {'message': 'Falha simulada no meio do stream.', 'type': 'server_error'}})}\n\n"
+            return
+        trecho = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": palavra}, "finish_reason": None}]}
+        yield f"data: {json.dumps(trecho, ensure_ascii=False)}\n\n"
+        await asyncio.sleep(0)
+    final = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    yield f"data: {json.dumps(final)}\n\n"
+    if (corpo.get("stream_options") or {}).get("include_usage"):
+        yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': _uso(corpo, conteudo)})}\n\n"
+    yield "data: [DONE]\n\n"
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    corpo = await request.json()
+    entradas = corpo.get("input")
+    entradas = [entradas] if isinstance(entradas, str) else list(entradas or [])
+    await asyncio.sleep(_sortear(config["latencia_embedding"], config["desvio_embedding"]))
+    contadores["embeddings"] += 1
+    contadores["textos_embedding"] += len(entradas)
+    dimensao = corpo.get("dimensions") or config["dimensao"]
+    dados = []
+    for indice, texto in enumerate(entradas):
+        vetor = _vetor(str(texto), dimensao)
+        embedding = base64.b64encode(vetor.tobytes()).decode("ascii") if corpo.get("encoding_format") == "base64" else vetor.tolist()
+        dados.append({"object": "embedding", "index": indice, "embedding": embedding})
+    tokens = sum(_tokens(str(texto)) for texto in entradas)
+    return JSONResponse({
+        "object": "list", "data": dados, "model": corpo.get("model"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    })
+
+def criar_cliente():
+    """AsyncOpenAI ligado a este app em memória (sem sockets), para substituir app.core.llm.client."""
+    import httpx
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key="chave-falsa", base_url="http://openai-falso/v1", max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://openai-falso")
+    )
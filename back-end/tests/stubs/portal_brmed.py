@@ -0,0 +1,107 @@
+"""
+Portal BRMED simulado para testes e carga: login, busca por CPF, página do paciente e guia,
+com a mesma estrutura de formulários, tabelas e links usada pela automação.
+"""
+import asyncio
+
+from fastapi import FastAPI, Form, Request
+from fastapi.responses import HTMLResponse, RedirectResponse
+
+COOKIE_SESSAO = "sessionid"
+SESSAO_VALIDA = "sessao-teste"
+
+# CPF -> (id do paciente, nome, exames)
+PACIENTES = {
+    "52998224725": ("101", "FULANO DE TAL", [
+        "CREATININA / CREATININE",
+        "HEMOGRAMA COMPLETO COM PLAQUETAS / COMPLETE BLOOD COUNT WITH PLATELETS",
+        "ELETROCARDIOGRAMA / ELECTROCARDIOGRAM",
+    ]),
+}
+
+# Atraso simulado por página (segundos) e, para testes de carga, paciente gerado para qualquer CPF
+config = {"latencia": 0.0, "qualquer_cpf": False}
+EXAMES_PADRAO = [
+    "HEMOGRAMA COMPLETO / COMPLETE BLOOD COUNT",
+    "CREATININA / CREATININE",
+    "GLICOSE / GLUCOSE",
+    "AUDIOMETRIA / AUDIOMETRY",
+]
+
+app = FastAPI()
+
+def configurar(**valores):
+    config.update(valores)
+
+@app.middleware("http")
+async def simular_latencia(request: Request, call_next):
+    if config["latencia"]:
+        await asyncio.sleep(config["latencia"])
+    return await call_next(request)
+
+def _autenticado(request: Request) -> bool:
+    return request.cookies.get(COOKIE_SESSAO) == SESSAO_VALIDA
+
+def _tela_login() -> RedirectResponse:
+    return RedirectResponse("/login/", status_code=302)
+
+@app.get("/login/", response_class=HTMLResponse)
+async def login():
+    return """<html><body><form method="post" action="/login/">
+    <input name="username" type="text"><input name="password" type="password">
+    <button type="submit">Entrar</button></form></body></html>"""
+
+@app.post("/login/")
+async def entrar(username: str = Form(""), password: str = Form("")):
+    resposta = RedirectResponse("/operacoes/", status_code=302)
+    resposta.set_cookie(COOKIE_SESSAO, SESSAO_VALIDA)
+    return resposta
+
+@app.get("/operacoes/", response_class=HTMLResponse)
+async def busca(request: Request):
+    if not _autenticado(request):
+        return _tela_login()
+    return """<html><head><script>var x = 1;</script></head><body>
+    <nav><a href="/operacoes/">Operações</a></nav>
+    <form method="post" action="/operacoes/buscar/">
+      <input type="hidden" name="csrf" value="abc123">
+      <input type="radio" name="tipo" id="radio_nome" value="nome" checked>
+      <input type="radio" name="tipo" id="radio_cpf" value="cpf">
+      <input type="text" name="termo">
+      <input type="submit" name="acao" value="Limpar" class="button">
+      <input type="submit" name="acao" value="Buscar" class="button-bold">
+    </form></body></html>"""
+
+@app.post("/operacoes/buscar/", response_class=HTMLResponse)
+async def buscar(request: Request, tipo: str = Form(""), termo: str = Form(""), csrf: str = Form(""), acao: str = Form("")):
+    if not _autenticado(request):
+        return _tela_login()
+    if config["qualquer_cpf"] and termo.isdigit() and len(termo) == 11 and termo not in PACIENTES:
+        PACIENTES[termo] = (f"9{termo[-6:]}", f"PACIENTE {termo[-4:]}", EXAMES_PADRAO)
+    paciente = PACIENTES.get(termo) if tipo == "cpf" and csrf == "abc123" and acao == "Buscar" else None
+    linhas = f'<tr><td><a href="/paciente/{paciente[0]}/">{paciente[1]}</a></td><td>{termo}</td></tr>' if paciente else ""
+    return f"""<html><body><a href="/paciente/999/">Último atendimento</a>
+    <table class="tabledata"><tr><th>Nome</th><th>CPF</th></tr>{linhas}</table></body></html>"""
+
+@app.get("/paciente/{id_paciente}/", response_class=HTMLResponse)
+async def paciente(request: Request, id_paciente: str):
+    if not _autenticado(request):
+        return _tela_login()
+    return f"""<html><body><div class="modal"><a class="close" href="#">x</a></div>
+    <a href="/paciente/{id_paciente}/guia/" target="_blank">Guia de Encaminhamento</a></body></html>"""
+
+@app.get("/paciente/{id_paciente}/guia/", response_class=HTMLResponse)
+async def guia(request: Request, id_paciente: str):
+    if not _autenticado(request):
+        return _tela_login()
+    cpf, (_, nome, exames) = next((c, p) for c, p in PACIENTES.items() if p[0] == id_paciente)
+    linhas_exames = "".join(f"<tr><td>{exame}</td></tr>" for exame in exames)
+    return f"""<html><head><style>td {{ padding: 2px; }}</style></head><body>
+    <h2>Imprimir guia de agendamento</h2>
+    <h3>1. Identificação / Identification:</h3>
+    <table><tr><td>Nome / Name: {nome}</td><td>Identidade / ID Number:</td></tr>
+    <tr><td>CPF / Passport: {cpf}</td><td>Matrícula / Register: 123</td></tr></table>
+    <h3>4. Exames / Exams:</h3>
+    <p>4.1 Realizados na própria clínica / Performed at the clinic itself:</p>
+    <table>{linhas_exames}</table>
+    <p>Obrigatório * / Mandatory *</p></body></html>"""
@@ -0,0 +1,48 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from app.core.artefatos import ArmazemArtefatos
+
+def _armazem(tmp_path, **kwargs):
+    parametros = {"retencao_dias": 30, "max_bytes": 10 * 1024 * 1024, "retencao_a_cada": 0}
+    parametros.update(kwargs)
+    return ArmazemArtefatos(str(tmp_path), **parametros)
+
+def _objetos(tmp_path):
+    return [arquivo for _, _, arquivos in os.walk(tmp_path / "objetos") for arquivo in arquivos]
+
+def test_conteudo_repetido_e_gravado_uma_vez_e_recuperado(tmp_path):
+    armazem = _armazem(tmp_path)
+
+    async def cenario():
+        ids = [armazem.salvar("ocr_markdown", "# Hemograma\n" * 50, chave=f"doc{i}.pdf") for i in range(3)]
+        await armazem.descarregar()
+        return ids, await armazem.obter(ids[1]), await armazem.listar(tipo="ocr_markdown")
+
+    ids, conteudo, listados = asyncio.run(cenario())
+    assert conteudo == "# Hemograma\n" * 50
+    assert len(_objetos(tmp_path)) == 1
+    assert armazem.deduplicados == 2
+    assert {a["id"] for a in listados} == set(ids)
+    assert listados[0]["tamanho"] < listados[0]["tamanho_original"]
+
+def test_amostragem_zero_descarta(tmp_path):
+    armazem = _armazem(tmp_path)
+
+    async def cenario():
+        return armazem.salvar("brmed_debug", "conteudo", chave="123", amostragem=0.0)
+
+    assert asyncio.run(cenario()) is None
+    assert armazem.descartados_amostragem == 1
+
+def test_retencao_remove_vencidos_e_excesso_de_tamanho(tmp_path):
+    armazem = _armazem(tmp_path, max_bytes=1)
+    antigo = (datetime.now() - timedelta(days=60)).isoformat(timespec="seconds")
+    agora = datetime.now().isoformat(timespec="seconds")
+    armazem._gravar("velho", "brmed_guia", "1", b"antigo", antigo)
+    armazem._gravar("novo", "brmed_guia", "2", os.urandom(2048), agora)
+    resultado = armazem.aplicar_retencao()
+    assert resultado["referencias_vencidas"] == 1
+    assert resultado["objetos_removidos"] == 2
+    assert _objetos(tmp_path) == []
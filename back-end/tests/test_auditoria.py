@@ -0,0 +1,64 @@
+import asyncio
+
+from app.services.auditoria_service import ArmazemAuditoria
+
+def _armazem(tmp_path, **kwargs):
+    parametros = {"max_bytes_segmento": 1024 * 1024, "intervalo_flush": 0.01, "max_lote": 50}
+    parametros.update(kwargs)
+    return ArmazemAuditoria(str(tmp_path), **parametros)
+
+def test_registros_sao_gravados_em_lote_e_consultados_por_cpf(tmp_path):
+    armazem = _armazem(tmp_path)
+
+    async def cenario():
+        ids = [armazem.registrar("111" if i % 2 else "222", {"resultado": i}) for i in range(10)]
+        await armazem.descarregar()
+        return ids, await armazem.consultar(cpf="111"), await armazem.obter(ids[0])
+
+    ids, registros_111, primeiro = asyncio.run(cenario())
+    assert armazem.lotes_gravados == 1
+    assert sorted(r["resultado"] for r in registros_111) == [1, 3, 5, 7, 9]
+    assert primeiro["id"] == ids[0] and primeiro["cpf"] == "222"
+
+def test_segmento_rotaciona_ao_atingir_tamanho_maximo(tmp_path):
+    armazem = _armazem(tmp_path, max_bytes_segmento=1, max_lote=1)
+
+    async def cenario():
+        for i in range(3):
+            armazem.registrar("333", {"resultado": "x" * 100, "i": i})
+        await armazem.descarregar()
+        return await armazem.consultar(cpf="333", limite=10)
+
+    registros = asyncio.run(cenario())
+    segmentos = [n for n in tmp_path.iterdir() if n.name.endswith(".jsonl.gz")]
+    assert len(segmentos) == 3
+    assert sorted(r["i"] for r in registros) == [0, 1, 2]
+
+def test_consulta_por_periodo(tmp_path):
+    armazem = _armazem(tmp_path)
+    armazem._gravar_lote([
+        {"id": "a", "cpf": "444", "criado_em": "2025-07-01T10:00:00"},
+        {"id": "b", "cpf": "444", "criado_em": "2025-07-15T10:00:00"},
+        {"id": "c", "cpf": "444", "criado_em": "2025-08-01T10:00:00"},
+    ])
+    registros = asyncio.run(armazem.consultar(cpf="444", inicio="2025-07-10", fim="2025-07-31T23:59:59"))
+    assert [r["id"] for r in registros] == ["b"]
+
+def test_validacao_devolve_o_id_do_registro_de_auditoria(tmp_path, monkeypatch):
+    from app.services import validacao_service
+    armazem = _armazem(tmp_path)
+    monkeypatch.setattr(validacao_service, "armazem_auditoria", armazem)
+
+    async def comparar(enviados, obrigatorios):
+        return [{"exame": "HEMOGRAMA", "status": "encontrado", "justificativa": ""}]
+    monkeypatch.setattr(validacao_service, "comparar_exames_com_rag", comparar)
+
+    async def cenario():
+        resposta = await validacao_service.validar_exames("111", ["HEMOGRAMA"], ["HEMOGRAMA"], ["HEMOGRAMA"])
+        await armazem.descarregar()
+        return resposta, await armazem.obter(resposta["auditoria_id"])
+
+    resposta, registro = asyncio.run(cenario())
+    assert resposta["status_liberado"] is True
+    assert resposta["auditoria_salva_em"] == f"/v1/auditoria/{resposta['auditoria_id']}"
+    assert registro["cpf"] == "111" and registro["resultado"][0]["exame"] == "HEMOGRAMA"
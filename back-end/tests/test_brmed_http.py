@@ -0,0 +1,62 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import brmed_http
+from app.services.guia_parser import extrair_guia
+from tests.stubs import portal_brmed
+
+def _cliente(cookies=None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=portal_brmed.app), base_url="http://portal",
+        cookies=cookies, follow_redirects=True
+    )
+
+async def _buscar(cpf: str, cookies=None) -> str:
+    async with _cliente(cookies) as client:
+        return await brmed_http.buscar_texto_guia(client, "http://portal/operacoes/", cpf)
+
+def test_busca_guia_via_http_com_cookies_da_sessao():
+    texto = asyncio.run(_buscar("52998224725", {portal_brmed.COOKIE_SESSAO: portal_brmed.SESSAO_VALIDA}))
+    assert "Nome / Name: FULANO DE TAL\tIdentidade / ID Number:" in texto
+    assert extrair_guia(texto) == {
+        "nome": "FULANO DE TAL",
+        "exames": ["CREATININA", "HEMOGRAMA COMPLETO COM PLAQUETAS", "ELETROCARDIOGRAMA"]
+    }
+
+def test_sem_cookie_sinaliza_sessao_expirada():
+    with pytest.raises(brmed_http.SessaoExpirada):
+        asyncio.run(_buscar("52998224725"))
+
+def test_cpf_sem_paciente_nao_e_falha_do_caminho_direto():
+    with pytest.raises(brmed_http.PacienteNaoEncontrado):
+        asyncio.run(_buscar("11111111111", {portal_brmed.COOKIE_SESSAO: portal_brmed.SESSAO_VALIDA}))
+
+def test_modo_hibrido_sem_paciente_nao_recorre_ao_navegador(monkeypatch):
+    from app.services import brmed_service
+
+    async def sessao(renovar=False):
+        return {"cookies": {portal_brmed.COOKIE_SESSAO: portal_brmed.SESSAO_VALIDA}, "url_busca": "http://portal/operacoes/"}
+
+    navegador = []
+    async def consultar_navegador(cpf, enxuto, browser=None):
+        navegador.append(cpf)
+        return {"erro": "não deveria abrir o navegador"}
+
+    cliente_http = httpx.AsyncClient
+    monkeypatch.setattr(brmed_service.httpx, "AsyncClient", lambda **kwargs: cliente_http(
+        transport=httpx.ASGITransport(app=portal_brmed.app), base_url="http://portal", **kwargs
+    ))
+    monkeypatch.setattr(brmed_service, "_obter_sessao", sessao)
+    monkeypatch.setattr(brmed_service, "_consultar_exames_navegador", consultar_navegador)
+    monkeypatch.setattr(brmed_service.settings, "BRMED_MODO", "hibrido")
+    monkeypatch.setattr(brmed_service.settings, "BRMED_DISJUNTOR_HABILITADO", False)
+
+    resultado = asyncio.run(brmed_service.consultar_exames_brmed("11111111111", usar_cache=False))
+    assert resultado["falha_portal"] is False and "não encontrado" in resultado["erro"]
+    assert navegador == []
+
+def test_html_para_texto_ignora_scripts_e_separa_celulas():
+    html = "<html><head><script>x()</script></head><body><table><tr><td>A</td><td>B</td></tr></table><p>C</p></body></html>"
+    assert brmed_http.html_para_texto(html) == "A\tB\n\nC"
@@ -0,0 +1,42 @@
+import time
+import socket
+import asyncio
+import threading
+
+import pytest
+import uvicorn
+
+from app.services import brmed_service
+from tests.stubs import portal_brmed
+
+@pytest.fixture(scope="module")
+def url_portal():
+    """Portal simulado servido numa thread, para o navegador de verdade."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        porta = s.getsockname()[1]
+    servidor = uvicorn.Server(uvicorn.Config(portal_brmed.app, host="127.0.0.1", port=porta, log_level="warning"))
+    thread = threading.Thread(target=servidor.run, daemon=True)
+    thread.start()
+    while not servidor.started:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{porta}/login/"
+    servidor.should_exit = True
+    thread.join(timeout=5)
+
+@pytest.mark.parametrize("enxuto", [False, True], ids=["completo", "enxuto"])
+def test_navegador_le_a_guia_e_reconhece_cpf_sem_paciente(url_portal, monkeypatch, enxuto):
+    monkeypatch.setattr(brmed_service.settings, "BRMED_URL_BASE", url_portal)
+    monkeypatch.setattr(brmed_service.armazem_artefatos, "salvar", lambda *args, **kwargs: None)
+    monkeypatch.setenv("BRMED_USERNAME", "usuario")
+    monkeypatch.setenv("BRMED_PASSWORD", "senha")
+    # Páginas lentas: a tabela de resultados só pode ser lida depois da navegação da busca
+    monkeypatch.setitem(portal_brmed.config, "latencia", 0.2)
+
+    com_paciente = asyncio.run(brmed_service._consultar_exames_navegador("52998224725", enxuto))
+    sem_paciente = asyncio.run(brmed_service._consultar_exames_navegador("11111111111", enxuto))
+
+    assert "erro" not in com_paciente, com_paciente.get("erro")
+    assert com_paciente["nome"] == "FULANO DE TAL"
+    assert "CREATININA" in com_paciente["exames"] and "ELETROCARDIOGRAMA" in com_paciente["exames"]
+    assert sem_paciente["falha_portal"] is False and "não encontrado" in sem_paciente["erro"]
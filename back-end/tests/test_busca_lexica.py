@@ -0,0 +1,17 @@
+from app.services.busca_lexica import IndiceBM25, fundir_rrf, normalizar
+
+def test_normalizar_remove_acentos_e_pontuacao():
+    assert normalizar("  Qual é o PRAZO do ASO? ") == "qual e o prazo do aso"
+
+def test_bm25_ranqueia_documento_com_termos_da_consulta():
+    indice = IndiceBM25([
+        "Como agendar o exame admissional",
+        "Qual o prazo de liberação do relatório anual do PCMSO",
+        "O que é AET? Análise ergonômica do trabalho",
+    ])
+    resultados = indice.buscar("prazo relatório PCMSO", k=3)
+    assert resultados[0][0] == 1
+    assert all(doc_id != 0 for doc_id, _ in resultados)
+
+def test_fundir_rrf_prioriza_itens_presentes_nas_duas_listas():
+    assert fundir_rrf([[1, 2, 3], [3, 4]])[0] == 3
@@ -0,0 +1,36 @@
+from app.services import compactacao_service
+
+MARKDOWN_LAUDO = (
+    "# LABORATÓRIO XYZ LTDA - CNPJ 12.345.678/0001-90\n"
+    "Rua das Flores, 123 - Telefone (85) 3333-4444 www.lab.com.br\n"
+    "Paciente: ANA PAULA   CPF: 674.957.883-72\n"
+    "## HEMOGRAMA\n"
+    "Hemoglobina 13,5 g/dL   Valores de referência: 12,0 a 16,0\n"
+    "COLESTEROL HDL - 12/05/2024\n"
+    "| Exame | Resultado |\n"
+    "|---|---|\n"
+    "| Creatinina | 0,9 mg/dL |\n"
+    "Assinado eletronicamente por Dr. Fulano CRM 1234\n"
+)
+
+# Teste unitário: mantém exames e identificação, descarta cabeçalhos e rodapés
+def test_compactar_markdown_mantem_segmentos_relevantes():
+    resultado = compactacao_service.compactar_markdown(MARKDOWN_LAUDO, max_tokens=1000)
+    texto = resultado["markdown"]
+    assert "CPF: 674.957.883-72" in texto
+    assert "## HEMOGRAMA" in texto
+    assert "COLESTEROL HDL - 12/05/2024" in texto
+    assert "| Creatinina | 0,9 mg/dL |" in texto
+    # A tabela mantém o separador logo após o cabeçalho e continua sendo markdown válido
+    assert "| Exame | Resultado |\n|---|---|\n| Creatinina | 0,9 mg/dL |" in texto
+    assert "CNPJ" not in texto
+    assert "Assinado" not in texto
+    relatorio = resultado["relatorio"]
+    assert relatorio["tokens_enviados"] < relatorio["tokens_originais"]
+    assert relatorio["tokens_economizados"] == relatorio["tokens_originais"] - relatorio["tokens_enviados"]
+
+# Teste unitário: o orçamento de tokens prioriza os segmentos de maior pontuação
+def test_compactar_markdown_respeita_orcamento():
+    resultado = compactacao_service.compactar_markdown(MARKDOWN_LAUDO, max_tokens=15)
+    assert resultado["relatorio"]["tokens_enviados"] <= 15
+    assert "CPF: 674.957.883-72" in resultado["markdown"]
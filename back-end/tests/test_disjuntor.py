@@ -0,0 +1,153 @@
+import time
+import asyncio
+
+from app.core.disjuntor import ABERTO, FECHADO, SEMI_ABERTO, DisjuntorCircuito
+
+def _disjuntor(**config) -> DisjuntorCircuito:
+    padrao = dict(janela=10, minimo_chamadas=4, taxa_falhas=0.5, limite_lento=5.0, taxa_lentas=0.75, tempo_aberto=0.05)
+    return DisjuntorCircuito("teste", **{**padrao, **config})
+
+def test_abre_pela_taxa_de_falhas_e_recusa_chamadas():
+    disjuntor = _disjuntor()
+    for sucesso in (True, False, True):
+        disjuntor.registrar(sucesso, 1.0)
+    assert disjuntor.estado == FECHADO  # abaixo do mínimo de chamadas
+    disjuntor.registrar(False, 1.0)
+    assert disjuntor.estado == ABERTO
+    assert not disjuntor.permitir()
+    assert disjuntor.estatisticas()["recusadas"] == 1
+
+def test_abre_pela_taxa_de_chamadas_lentas():
+    disjuntor = _disjuntor()
+    for latencia in (6.0, 7.0, 1.0, 8.0):
+        disjuntor.registrar(True, latencia)
+    assert disjuntor.estado == ABERTO
+    assert "acima de 5s" in disjuntor.motivo
+
+def test_semi_aberto_libera_uma_sonda_que_fecha_ou_reabre():
+    disjuntor = _disjuntor(minimo_chamadas=1, taxa_falhas=1.0)
+    disjuntor.registrar(False)
+    time.sleep(0.06)
+    assert disjuntor.estado == SEMI_ABERTO
+    assert disjuntor.permitir()
+    assert not disjuntor.permitir()  # só uma sonda por vez
+    disjuntor.registrar(False)
+    assert disjuntor.estado == ABERTO and disjuntor.aberturas == 2
+
+    time.sleep(0.06)
+    assert disjuntor.permitir()
+    disjuntor.registrar(True, 1.0)
+    assert disjuntor.estado == FECHADO
+    assert disjuntor.estatisticas()["chamadas_na_janela"] == 0
+
+def test_chamadas_sem_latencia_nao_contam_como_lentas():
+    disjuntor = _disjuntor(taxa_falhas=1.0)
+    for _ in range(4):
+        disjuntor.registrar(True, None)
+    assert disjuntor.estado == FECHADO
+    assert disjuntor.estatisticas()["taxa_lentas"] == 0
+
+class _PaginaFalsa:
+    """
+    Página do Playwright que responde a tudo, exceto ao seletor em `travar_em`: depois de
+    `espera` segundos, dá timeout.
+    """
+
+    def __init__(self, travar_em=None, com_paciente=True, espera=0.0):
+        self.travar_em, self.com_paciente, self.espera = travar_em, com_paciente, espera
+        self.url = "http://portal/operacoes/"
+
+    async def wait_for_selector(self, seletor, **kwargs):
+        if seletor == self.travar_em:
+            await asyncio.sleep(self.espera)
+            raise TimeoutError(f"Timeout esperando {seletor}")
+
+    async def query_selector(self, seletor):
+        return object() if self.com_paciente else None
+
+    def locator(self, seletor):
+        return self
+
+    def expect_navigation(self, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def _nada(self, *args, **kwargs):
+        pass
+
+    goto = fill = click = reload = type = evaluate = wait_for_load_state = wait_for_timeout = scroll_into_view_if_needed = close = _nada
+
+class _NavegadorFalso:
+    def __init__(self, pagina):
+        self.pagina = pagina
+
+    async def new_context(self, **kwargs):
+        return self
+
+    def set_default_timeout(self, timeout):
+        pass
+
+    async def route(self, *args):
+        pass
+
+    async def new_page(self):
+        return self.pagina
+
+    async def close(self):
+        pass
+
+def test_portal_que_trava_depois_da_busca_abre_o_circuito_e_cpf_sem_paciente_nao(monkeypatch):
+    from app.services import brmed_service
+    monkeypatch.setattr(brmed_service.settings, "BRMED_MODO", "enxuto")
+    monkeypatch.setattr(brmed_service.settings, "BRMED_CACHE_HABILITADO", False)
+    monkeypatch.setattr(brmed_service.settings, "BRMED_DISJUNTOR_HABILITADO", True)
+
+    async def consultar(pagina, vezes):
+        return [await brmed_service.consultar_exames_brmed("52998224725", browser=_NavegadorFalso(pagina)) for _ in range(vezes)]
+
+    monkeypatch.setattr(brmed_service, "disjuntor_brmed", _disjuntor())
+    resultados = asyncio.run(consultar(_PaginaFalsa(com_paciente=False), 4))
+    assert all(r["falha_portal"] is False for r in resultados)
+    assert brmed_service.disjuntor_brmed.estado == FECHADO
+
+    # Login e busca funcionam, mas o modal do paciente nunca aparece
+    resultados = asyncio.run(consultar(_PaginaFalsa(travar_em="a.close"), 4))
+    assert all(r["falha_portal"] is True for r in resultados)
+    assert brmed_service.disjuntor_brmed.estado == ABERTO
+    assert all(latencia is not None for ok, latencia in brmed_service.disjuntor_brmed.resultados if not ok)
+
+def test_consulta_cancelada_ou_sem_prazo_nao_conta_como_falha_do_portal(monkeypatch):
+    from app.core import prazo
+    from app.services import brmed_service
+    monkeypatch.setattr(brmed_service.settings, "BRMED_MODO", "enxuto")
+    monkeypatch.setattr(brmed_service.settings, "BRMED_CACHE_HABILITADO", False)
+    monkeypatch.setattr(brmed_service.settings, "BRMED_DISJUNTOR_HABILITADO", True)
+    monkeypatch.setattr(brmed_service, "disjuntor_brmed", _disjuntor())
+
+    async def cancelar_no_meio():
+        # Cliente desconecta enquanto o portal ainda carrega o modal do paciente
+        navegador = _NavegadorFalso(_PaginaFalsa(travar_em="a.close", espera=60))
+        tarefa = asyncio.ensure_future(brmed_service.consultar_exames_brmed("52998224725", browser=navegador))
+        await asyncio.sleep(0.05)
+        tarefa.cancel()
+        try:
+            await tarefa
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    async def estourar_prazo():
+        # O timeout do navegador acompanha o prazo: o erro vem com o prazo já esgotado
+        prazo.iniciar(0.05)
+        navegador = _NavegadorFalso(_PaginaFalsa(travar_em="a.close", espera=0.1))
+        return await brmed_service.consultar_exames_brmed("52998224725", browser=navegador)
+
+    assert asyncio.run(cancelar_no_meio()) is True
+    assert asyncio.run(estourar_prazo())["falha_portal"] is True
+    assert len(brmed_service.disjuntor_brmed.resultados) == 0
+    assert brmed_service.disjuntor_brmed.estado == FECHADO
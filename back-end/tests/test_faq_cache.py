@@ -0,0 +1,89 @@
+import numpy as np
+
+from app.services import faq_service
+from app.services.faq_service import CacheSemantico
+
+LIMIAR = 0.95
+HISTORICO = [{"role": "user", "content": "Sou da empresa X."}, {"role": "assistant", "content": "Certo."}]
+
+def _vetores(similaridade: float) -> tuple:
+    """Par de vetores unitários com a similaridade de cosseno pedida."""
+    base, ortogonal = np.zeros((1, 8), dtype="float32"), np.zeros((1, 8), dtype="float32")
+    base[0, 0], ortogonal[0, 1] = 1.0, 1.0
+    return base, similaridade * base + np.sqrt(1 - similaridade ** 2) * ortogonal
+
+def _resultado(pergunta: str) -> dict:
+    return {"pergunta_usuario": pergunta, "resposta_gerada": f"Resposta para {pergunta}"}
+
+def test_pergunta_parecida_acerta_e_logo_abaixo_do_limiar_erra():
+    cache = CacheSemantico(LIMIAR, ttl_segundos=60, max_itens=10)
+    salvo, parecido = _vetores(LIMIAR + 0.01)
+    _, quase = _vetores(LIMIAR - 0.001)
+    cache.salvar(salvo, "Como agendar o exame?", [], _resultado("Como agendar o exame?"))
+    assert cache.buscar(parecido, [])["resposta_gerada"] == "Resposta para Como agendar o exame?"
+    assert cache.buscar(quase, []) is None
+    assert cache.estatisticas()["consultas"] == 2 and cache.estatisticas()["acertos"] == 1
+
+def test_entradas_expiram_pelo_ttl_e_pelo_limite_de_itens(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(faq_service.time, "time", lambda: agora[0])
+    cache = CacheSemantico(LIMIAR, ttl_segundos=60, max_itens=2)
+    vetores = np.eye(3, 8, dtype="float32")
+    for n in range(3):
+        cache.salvar(vetores[n:n + 1], f"Pergunta {n}", [], _resultado(f"Pergunta {n}"))
+    # Só os dois mais recentes permanecem
+    assert cache.buscar(vetores[0:1], []) is None
+    assert cache.buscar(vetores[2:3], [])["pergunta_usuario"] == "Pergunta 2"
+    agora[0] += 61
+    assert cache.buscar(vetores[2:3], []) is None
+
+    cache.salvar_exata("a", _resultado("a"))
+    cache.salvar_exata("b", _resultado("b"))
+    cache.buscar_exata("a")  # "a" passa a ser o mais recente
+    cache.salvar_exata("c", _resultado("c"))
+    assert cache.buscar_exata("b") is None and cache.buscar_exata("a") is not None
+    agora[0] += 61
+    assert cache.buscar_exata("a") is None and "a" not in cache.exatas
+
+def test_resposta_dependente_do_historico_nao_serve_a_outra_conversa():
+    cache = CacheSemantico(LIMIAR, ttl_segundos=60, max_itens=10)
+    vetor, _ = _vetores(1.0)
+    cache.salvar(vetor, "E o prazo do resultado?", HISTORICO, _resultado("E o prazo do resultado?"))
+    assert cache.buscar(vetor, []) is None
+    assert cache.buscar(vetor, [{"role": "user", "content": "Sou da empresa Y."}]) is None
+    # Mensagens de sistema não fazem parte da chave do histórico
+    assert cache.buscar(vetor, HISTORICO + [{"role": "system", "content": "resumo"}]) is not None
+    assert CacheSemantico.chave_exata("Prazo?", HISTORICO, 1) != CacheSemantico.chave_exata("Prazo?", [], 1)
+
+def test_acerto_lexical_forte_dispensa_embedding_e_usa_a_chave_exata(monkeypatch):
+    import asyncio
+    from app.core import llm
+    from app.services.busca_lexica import IndiceBM25, normalizar
+    from tests.stubs import openai_falso
+
+    base = [
+        {"faq_id": 7, "original_question": "Como remarcar o exame admissional?", "original_answer": "Pelo portal do cliente.",
+         "chunk_text": "Como remarcar o exame admissional? Pelo portal do cliente."},
+        {"faq_id": 8, "original_question": "Onde fica a clínica?", "original_answer": "Na avenida central.",
+         "chunk_text": "Onde fica a clínica? Na avenida central."},
+    ]
+    monkeypatch.setattr(faq_service, "base_conhecimento", base)
+    monkeypatch.setattr(faq_service, "indice_lexico", IndiceBM25([item["chunk_text"] for item in base]))
+    monkeypatch.setattr(faq_service, "perguntas_normalizadas", {normalizar(item["original_question"]): n for n, item in enumerate(base)})
+    monkeypatch.setattr(faq_service, "verificar_indice_atualizado", lambda: None)
+    monkeypatch.setattr(faq_service, "cache_semantico", CacheSemantico(LIMIAR, ttl_segundos=60, max_itens=10))
+    openai_falso.configurar(tokens_resposta=5, desvio_tokens=0)
+
+    async def executar():
+        monkeypatch.setattr(llm, "client", openai_falso.criar_cliente())
+        primeira = await faq_service.buscar_e_responder("Como remarcar o exame admissional?")
+        segunda = await faq_service.buscar_e_responder("como remarcar o  exame admissional")
+        return primeira, segunda
+
+    primeira, segunda = asyncio.run(executar())
+    assert openai_falso.contadores["embeddings"] == 0 and openai_falso.contadores["chat"] == 1
+    assert primeira["perguntas_base"][0] == "Como remarcar o exame admissional?"
+    assert segunda["resposta_gerada"] == primeira["resposta_gerada"]
+    cache = faq_service.cache_semantico
+    assert list(cache.exatas) == [CacheSemantico.chave_exata("Como remarcar o exame admissional?", [], 7)]
+    assert cache.entradas == [] and cache.estatisticas()["acertos"] == 1
@@ -0,0 +1,50 @@
+from app.core import tokens
+from app.core.tokens import contar_tokens
+from app.services import faq_service
+
+def _item(faq_id, pergunta, resposta, chunk=""):
+    return {"faq_id": faq_id, "original_question": pergunta, "original_answer": resposta, "chunk_text": chunk}
+
+class _EncodingPorBytes:
+    """Tokenizer de teste: um token por byte UTF-8 (acentos ocupam dois tokens)."""
+
+    def encode(self, texto, disallowed_special=()):
+        return list(texto.encode("utf-8"))
+
+    def decode(self, ids):
+        return bytes(ids).decode("utf-8", errors="replace")
+
+def test_agrupar_por_faq_colapsa_chunks_no_faq_de_origem(monkeypatch):
+    base = [
+        _item(1, "Como agendar?", "Pelo portal.", "agendar parte 1"),
+        _item(1, "Como agendar?", "Pelo portal.", "agendar parte 2"),
+        _item(2, "Onde fica a clínica?", "Na avenida.", "endereço"),
+    ]
+    monkeypatch.setattr(faq_service, "base_conhecimento", base)
+    itens = faq_service.agrupar_por_faq([1, 2, 0])
+    # Ordem de relevância preservada pelo primeiro chunk de cada FAQ, sem repetição
+    assert [item["faq_id"] for item in itens] == [1, 2]
+    assert itens[0] is base[1]
+
+def test_empacotar_contexto_para_no_orcamento_de_tokens(monkeypatch):
+    monkeypatch.setattr(faq_service, "MAX_FAQS_CONTEXTO", 3)
+    itens = [_item(n, f"Pergunta {n}?", "resposta " * 20) for n in range(3)]
+    bloco = contar_tokens(f"Pergunta: Pergunta 0?\nResposta: {('resposta ' * 20).strip()}")
+    selecionados = faq_service.empacotar_contexto(itens, max_tokens=bloco * 2 + 1)
+    assert [item["faq_id"] for item, _ in selecionados] == [0, 1]
+    assert sum(contar_tokens(b) for _, b in selecionados) <= bloco * 2 + 1
+
+def test_faq_mais_relevante_maior_que_o_orcamento_entra_truncado(monkeypatch):
+    monkeypatch.setattr(tokens, "_carregar_encoding", lambda: _EncodingPorBytes())
+    itens = [_item(1, "Exame admissional?", "Avaliação clínica ocupacional " * 30), _item(2, "Curta?", "Sim.")]
+    selecionados = faq_service.empacotar_contexto(itens, max_tokens=46)
+    assert [item["faq_id"] for item, _ in selecionados] == [1]
+    primeiro = selecionados[0][1]
+    assert primeiro.startswith("Pergunta: Exame admissional?") and contar_tokens(primeiro) <= 46
+    # O corte caiu no meio de um caractere acentuado e não deixou bytes inválidos
+    assert "�" not in primeiro
+
+def test_truncar_tokens_sem_tiktoken_usa_a_estimativa(monkeypatch):
+    monkeypatch.setattr(tokens, "_carregar_encoding", lambda: None)
+    assert tokens.truncar_tokens("a" * 100, 10) == "a" * 40
+    assert tokens.truncar_tokens("curto", 10) == "curto"
@@ -0,0 +1,48 @@
+import json
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.api import v1_faq
+from app.core import llm
+from app.services import faq_service
+from tests.stubs import openai_falso
+
+PERGUNTA = "Qual documento levar no dia do exame periódico?"
+
+def _eventos_stream(monkeypatch) -> list:
+    """Chama /faq/stream contra a OpenAI simulada e devolve os eventos SSE decodificados."""
+    openai_falso.configurar(dimensao=faq_service.index.d, tokens_resposta=6, desvio_tokens=0)
+    faq_service.cache_semantico.limpar()
+    app = FastAPI()
+    app.include_router(v1_faq.router)
+
+    async def executar():
+        monkeypatch.setattr(llm, "client", openai_falso.criar_cliente())
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://teste") as cliente:
+            resposta = await cliente.post("/faq/stream", json={"pergunta": PERGUNTA})
+        assert resposta.status_code == 200
+        return [json.loads(linha[len("data: "):]) for linha in resposta.text.split("\n\n") if linha.startswith("data: ")]
+
+    return asyncio.run(executar())
+
+def test_stream_envia_metadados_trechos_e_fim_nessa_ordem(monkeypatch):
+    eventos = _eventos_stream(monkeypatch)
+    tipos = [evento["tipo"] for evento in eventos]
+    assert tipos[0] == "metadados" and tipos[-1] == "fim"
+    assert set(tipos[1:-1]) == {"token"} and len(tipos) >= 3
+    assert eventos[0]["pergunta_usuario"] == PERGUNTA
+    assert eventos[-1]["resposta_gerada"] == "".join(e["conteudo"] for e in eventos if e["tipo"] == "token")
+    assert openai_falso.contadores["chat_stream"] == 1
+
+def test_erro_no_meio_do_stream_vira_evento_de_erro_sem_fim(monkeypatch):
+    monkeypatch.setitem(openai_falso.config, "falha_stream_apos", 2)
+    eventos = _eventos_stream(monkeypatch)
+    tipos = [evento["tipo"] for evento in eventos]
+    # Os trechos já gerados chegam ao cliente; o evento de erro encerra o stream no lugar do 'fim'
+    assert tipos[0] == "metadados" and tipos[-1] == "erro" and "fim" not in tipos
+    assert tipos.count("token") >= 2
+    assert "resposta_gerada" not in eventos[-1]
+    # A resposta interrompida não entra no cache
+    assert faq_service.cache_semantico.estatisticas()["itens"] == 0
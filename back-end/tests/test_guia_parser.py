@@ -0,0 +1,25 @@
+from app.services.guia_parser import extrair_guia
+
+GUIA = (
+    "Imprimir guia de agendamento\n\n"
+    "1. Identificação / Identification:\n\n"
+    "Nome / Name: FULANO DE TAL\tIdentidade / ID Number:\n"
+    "CPF / Passport: 52998224725\tMatrícula / Register: 123\n\n"
+    "4. Exames / Exams:\n\n"
+    "4.1 Realizados na própria clínica / Performed at the clinic itself:\n\n"
+    "CREATININA / CREATININE\tCLÍNICO OCUPACIONAL * / CLINICAL EXAMINATION *\n"
+    "HEMOGRAMA COMPLETO COM PLAQUETAS / COMPLETE BLOOD COUNT WITH PLATELETS\tLIPIDOGRAMA (PERFIL LIPÍDICO) / LIPIDOGRAM\n"
+    "ELETROCARDIOGRAMA\n"
+    "ELETROCARDIOGRAMA / ELECTROCARDIOGRAM\n"
+    "GLICEMIA DE JEJUM / FASTING GLUCOSE\n"
+    "Evitar exercícios físicos antes do exame\n"
+    "Obrigatório * / Mandatory *\n"
+)
+
+def test_extrair_guia_nome_e_exames_sem_ruido():
+    resultado = extrair_guia(GUIA)
+    assert resultado["nome"] == "FULANO DE TAL"
+    assert resultado["exames"] == ["CREATININA", "HEMOGRAMA COMPLETO COM PLAQUETAS", "ELETROCARDIOGRAMA"]
+
+def test_extrair_guia_sem_secao_de_exames():
+    assert extrair_guia("Nome / Name: BELTRANO\n") == {"nome": "BELTRANO", "exames": []}
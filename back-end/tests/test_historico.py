@@ -0,0 +1,48 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from app.services import historico_service
+
+def _resposta(texto):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=texto))])
+
+def _conversa(turnos):
+    mensagens = []
+    for i in range(turnos):
+        mensagens.append({"role": "user", "content": f"Pergunta {i:02d} sobre o prazo do ASO " * 20})
+        mensagens.append({"role": "assistant", "content": f"Resposta {i:02d} sobre o prazo do ASO " * 20})
+    return mensagens
+
+def test_historico_longo_mantem_ultimos_turnos_e_tamanho_estavel():
+    historico_service._cache_resumos.clear()
+    mock = AsyncMock(return_value=_resposta("Usuário perguntou sobre prazos do ASO."))
+    with patch("app.core.llm.chat_completion", mock):
+        tamanhos = []
+        for turnos in (5, 10, 20):
+            resumo, recentes = asyncio.run(historico_service.compactar_historico(_conversa(turnos), tokens_reservados=500))
+            assert resumo == "Usuário perguntou sobre prazos do ASO."
+            assert recentes == _conversa(turnos)[-2 * historico_service.TURNOS_VERBATIM:]
+            tamanhos.append(historico_service.tokens_mensagens(recentes))
+    assert len(set(tamanhos)) == 1
+
+def test_resumo_incremental_reaproveita_prefixo_em_cache():
+    historico_service._cache_resumos.clear()
+    mock = AsyncMock(return_value=_resposta("resumo"))
+    with patch("app.core.llm.chat_completion", mock):
+        asyncio.run(historico_service.resumir(_conversa(4)))
+        asyncio.run(historico_service.resumir(_conversa(4)))
+        assert mock.await_count == 1
+        asyncio.run(historico_service.resumir(_conversa(5)))
+    # Só as duas mensagens novas são enviadas junto com o resumo anterior
+    enviado = mock.await_args.kwargs["messages"][1]["content"]
+    assert "Resumo existente:\nresumo" in enviado
+    assert "Pergunta 03" not in enviado and "Pergunta 04" in enviado
+
+def test_orcamento_estourado_move_mensagens_recentes_para_o_resumo():
+    historico_service._cache_resumos.clear()
+    with patch("app.core.llm.chat_completion", AsyncMock(return_value=_resposta("resumo"))):
+        _, recentes = asyncio.run(historico_service.compactar_historico(
+            _conversa(3), tokens_reservados=historico_service.MAX_TOKENS_PROMPT - 700
+        ))
+    assert historico_service.tokens_mensagens(recentes) + historico_service.MAX_TOKENS_RESUMO <= 700
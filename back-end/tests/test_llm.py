@@ -0,0 +1,98 @@
+import asyncio
+import time
+from app.core import llm
+
+# Teste unitário: conversão das durações informadas nos headers de rate limit
+def test_converter_duracao():
+    assert llm._converter_duracao("1s") == 1
+    assert llm._converter_duracao("6m0s") == 360
+    assert llm._converter_duracao("20ms") == 0.02
+    assert llm._converter_duracao("2.5") == 2.5
+    assert llm._converter_duracao(None) is None
+
+# Teste unitário: o bucket pausa quando os headers indicam cota esgotada
+def test_limitador_pausa_por_headers():
+    limitador = llm.LimitadorTaxa(requisicoes_por_minuto=6000, rajada_maxima=5)
+    limitador.atualizar_por_headers({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "200ms"})
+    inicio = time.monotonic()
+    asyncio.run(limitador.adquirir())
+    assert time.monotonic() - inicio >= 0.15
+
+# Teste unitário: a duplicata (hedge) vence quando a tentativa primária demora
+def test_hedge_usa_resposta_mais_rapida(monkeypatch):
+    monkeypatch.setattr(llm.settings, "LLM_HEDGE_ATRASO_PADRAO", 0.05)
+    monkeypatch.setattr(llm.settings, "LLM_HEDGE_FRACAO_MAXIMA", 1.0)
+    tentativas = []
+
+    class RespostaBruta:
+        headers = {}
+        def __init__(self, valor):
+            self.valor = valor
+        def parse(self):
+            return self.valor
+
+    async def chamada(**kwargs):
+        tentativas.append(kwargs["timeout"])
+        numero = len(tentativas)
+        await asyncio.sleep(0.5 if numero == 1 else 0.01)
+        return RespostaBruta(numero)
+
+    async def executar():
+        return await llm._executar_com_prazo("modelo-teste", "teste_hedge", chamada, 5, True)
+
+    assert asyncio.run(executar()) == 2
+    metricas = llm.obter_metricas_llm()["teste_hedge"]
+    assert metricas["hedges_disparados"] == 1
+    assert metricas["hedges_vencedores"] == 1
+
+# Teste unitário: chave do cache ignora quebras de linha e espaços nas pontas, preserva o layout e muda com a versão do prompt
+def test_chave_cache_normaliza_mensagens():
+    from app.core.cache_respostas import gerar_chave
+    formato = {"type": "json_object"}
+    chave = gerar_chave("gpt", [{"role": "user", "content": "Texto:\n  HEMOGRAMA"}], formato, "v1")
+    assert chave == gerar_chave("gpt", [{"role": "user", "content": " Texto:  \r\n  HEMOGRAMA\n"}], formato, "v1")
+    assert chave != gerar_chave("gpt", [{"role": "user", "content": "Texto: HEMOGRAMA"}], formato, "v1")
+    assert chave != gerar_chave("gpt", [{"role": "user", "content": "Texto:\n  HEMOGRAMA"}], formato, "v2")
+
+# Teste unitário: cache em disco sobrevive à perda da memória e respeita o TTL
+def test_cache_respostas_disco_e_ttl(tmp_path):
+    from app.core.cache_respostas import CacheRespostas
+    cache = CacheRespostas(str(tmp_path), ttl_segundos=60, max_itens_memoria=1, max_bytes_disco=1024 * 1024)
+    asyncio.run(cache.salvar("a", {"valor": 1}))
+    asyncio.run(cache.salvar("b", {"valor": 2}))  # expulsa "a" da memória
+    assert asyncio.run(cache.obter("a")) == {"valor": 1}
+    assert cache.acertos_disco == 1
+    cache.ttl_segundos = -1
+    assert asyncio.run(cache.obter("b")) is None
+
+# Teste unitário: o diretório do cache (respostas com dados pessoais) fica fora do git e a poda não o remove
+def test_cache_respostas_diretorio_privado(tmp_path):
+    from app.core.cache_respostas import CacheRespostas
+    diretorio = tmp_path / "cache_llm"
+    cache = CacheRespostas(str(diretorio), ttl_segundos=60, max_itens_memoria=1, max_bytes_disco=10)
+    asyncio.run(cache.salvar("a", {"cpf": "52998224725"}))
+    assert (diretorio / ".gitignore").read_text().splitlines()[-1] == "*"
+    assert oct(diretorio.stat().st_mode & 0o777) == "0o700"
+    assert not (diretorio / "a.json").exists() and (diretorio / ".gitignore").exists()
+
+# Teste unitário: o prazo da chamada não passa do prazo restante da requisição
+def test_prazo_da_requisicao_limita_a_chamada():
+    from app.core import prazo
+    timeouts = []
+
+    async def chamada(**kwargs):
+        timeouts.append(kwargs["timeout"])
+        await asyncio.sleep(1)
+
+    async def executar():
+        prazo.iniciar(0.1)
+        try:
+            await llm._executar_com_prazo("modelo-teste", "teste_prazo_requisicao", chamada, 30, False)
+        except asyncio.TimeoutError as e:
+            return e
+
+    inicio = time.monotonic()
+    erro = asyncio.run(executar())
+    assert isinstance(erro, asyncio.TimeoutError)
+    assert time.monotonic() - inicio < 0.5
+    assert timeouts[0] <= 0.1
@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import faiss
+import numpy as np
+
+from app.core import lotes, prazo
+
+def _resposta_embeddings(textos):
+    return SimpleNamespace(data=[
+        SimpleNamespace(index=i, embedding=[float(len(t)), float(i)]) for i, t in enumerate(textos)
+    ])
+
+def test_embeddings_concorrentes_viram_uma_chamada():
+    lotes._agrupadores_embeddings.clear()
+    mock = AsyncMock(side_effect=lambda **kw: _resposta_embeddings(kw["input"]))
+
+    async def cenario():
+        return await asyncio.gather(*[lotes.gerar_embedding(t, "modelo-teste") for t in ["a", "bb", "a", "ccc"]])
+
+    with patch("app.core.llm.criar_embeddings", mock):
+        vetores = asyncio.run(cenario())
+    assert mock.await_count == 1
+    assert mock.await_args.kwargs["input"] == ["a", "bb", "ccc"]
+    assert [v[0, 0] for v in vetores] == [1.0, 2.0, 1.0, 3.0]
+    assert all(v.shape == (1, 2) for v in vetores)
+
+def test_falha_do_lote_propaga_para_todos():
+    lotes._agrupadores_embeddings.clear()
+
+    async def cenario():
+        return await asyncio.gather(
+            *[lotes.gerar_embedding(t, "modelo-teste") for t in ["x", "y"]], return_exceptions=True
+        )
+
+    with patch("app.core.llm.criar_embeddings", AsyncMock(side_effect=RuntimeError("falhou"))):
+        resultados = asyncio.run(cenario())
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+
+def test_prazo_curto_de_uma_requisicao_nao_derruba_o_lote():
+    lotes._agrupadores_embeddings.clear()
+    prazos_no_lote = []
+
+    async def criar_embeddings(**kwargs):
+        prazos_no_lote.append(prazo.limitar(None))
+        await asyncio.sleep(0.1)
+        return _resposta_embeddings(kwargs["input"])
+
+    async def requisicao(texto: str, segundos: float):
+        prazo.iniciar(segundos)
+        return await lotes.gerar_embedding(texto, "modelo-teste")
+
+    async def cenario():
+        return await asyncio.gather(requisicao("a", 0.05), requisicao("bb", 5.0), return_exceptions=True)
+
+    with patch("app.core.llm.criar_embeddings", AsyncMock(side_effect=criar_embeddings)):
+        curta, longa = asyncio.run(cenario())
+    assert isinstance(curta, asyncio.TimeoutError)
+    assert longa[0, 0] == 2.0
+    # O lote usa o maior prazo restante entre as requisições, não o de quem o abriu
+    assert len(prazos_no_lote) == 1 and prazos_no_lote[0] > 4.0
+
+def test_buscas_faiss_concorrentes_equivalem_a_buscas_individuais():
+    lotes._agrupador_faiss = None
+    base = np.random.RandomState(0).rand(50, 4).astype("float32")
+    index = faiss.IndexFlatL2(4)
+    index.add(base)
+    consultas = [base[i:i + 1] + 0.01 for i in range(6)]
+
+    async def cenario():
+        return await asyncio.gather(*[lotes.buscar_faiss(index, c, 3 if i % 2 else 5) for i, c in enumerate(consultas)])
+
+    resultados = asyncio.run(cenario())
+    for i, (D, I) in enumerate(resultados):
+        esperado_D, esperado_I = index.search(consultas[i], 3 if i % 2 else 5)
+        assert np.array_equal(I, esperado_I)
+        assert np.allclose(D, esperado_D)
+    assert lotes._agrupador_faiss.lotes == 1
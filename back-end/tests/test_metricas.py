@@ -0,0 +1,43 @@
+from app.core import metricas
+
+def test_histograma_exporta_buckets_cumulativos_soma_e_contagem():
+    hist = metricas.Histograma("teste_duracao_segundos", "Duração de teste.", ("etapa",), buckets=(0.1, 1))
+    for valor in (0.05, 0.5, 0.5, 3):
+        hist.observar(valor, etapa="login")
+    texto = hist.exportar()
+    assert "# TYPE teste_duracao_segundos histogram" in texto
+    assert 'teste_duracao_segundos_bucket{etapa="login",le="0.1"} 1' in texto
+    assert 'teste_duracao_segundos_bucket{etapa="login",le="1"} 3' in texto
+    assert 'teste_duracao_segundos_bucket{etapa="login",le="+Inf"} 4' in texto
+    assert 'teste_duracao_segundos_sum{etapa="login"} 4.05' in texto
+    assert 'teste_duracao_segundos_count{etapa="login"} 4' in texto
+
+def test_contador_e_medidor_com_funcao():
+    contador = metricas.Contador("teste_acessos_total", "Acessos.", ("cache", "resultado"))
+    contador.inc(cache="llm", resultado="acerto")
+    contador.inc(2, cache="llm", resultado="acerto")
+    fila = []
+    medidor = metricas.Medidor("teste_fila_itens", "Itens na fila.", funcao=lambda: len(fila))
+    fila.extend([1, 2, 3])
+
+    assert contador.valor(cache="llm", resultado="acerto") == 3
+    assert 'teste_acessos_total{cache="llm",resultado="acerto"} 3' in contador.exportar()
+    assert "teste_fila_itens 3" in medidor.exportar()
+
+def test_cronometrar_registra_mesmo_com_excecao_e_exportacao_completa():
+    hist = metricas.Histograma("teste_bloco_segundos", "Bloco.")
+    try:
+        with hist.cronometrar():
+            raise ValueError()
+    except ValueError:
+        pass
+    assert hist.contagem() == 1
+    texto = metricas.exportar_texto()
+    assert "# HELP llm_chamada_duracao_segundos" in texto
+    assert "teste_bloco_segundos_count 1" in texto
+    assert texto.endswith("\n")
+
+def test_rotulos_sao_escapados():
+    contador = metricas.Contador("teste_erros_total", "Erros.", ("tipo",))
+    contador.inc(tipo='a"b\\c')
+    assert 'teste_erros_total{tipo="a\\"b\\\\c"} 1' in contador.exportar()
@@ -0,0 +1,41 @@
+import time
+import asyncio
+
+from app.core import monitor_loop
+
+def bloquear_com_chamada_sincrona():
+    time.sleep(0.3)
+
+def test_bloqueio_do_loop_e_capturado_com_a_pilha_da_chamada():
+    monitor = monitor_loop.MonitorLoop(intervalo=0.02, limite=0.1, max_capturas=5)
+
+    async def tarefa_bloqueante():
+        bloquear_com_chamada_sincrona()
+
+    async def executar():
+        monitor.iniciar()
+        await asyncio.sleep(0.1)
+        await asyncio.create_task(tarefa_bloqueante(), name="documento-1")
+        await asyncio.sleep(0.1)
+        await monitor.parar()
+        return monitor.estatisticas()
+
+    estatisticas = asyncio.run(executar())
+    assert estatisticas["bloqueios"] == 1 and not estatisticas["ativo"]
+    assert estatisticas["atraso_maximo_ms"] >= 200
+    captura = estatisticas["capturas"][0]
+    assert captura["tarefa"].startswith("documento-1")
+    assert any("bloquear_com_chamada_sincrona" in linha for linha in captura["pilha"])
+    assert monitor_loop.ATRASO_LOOP.contagem() >= estatisticas["amostras"]
+
+def test_loop_livre_nao_registra_bloqueios():
+    monitor = monitor_loop.MonitorLoop(intervalo=0.01, limite=0.2, max_capturas=5)
+
+    async def executar():
+        monitor.iniciar()
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+        await monitor.parar()
+
+    asyncio.run(executar())
+    assert monitor.bloqueios == 0 and monitor.amostras > 0
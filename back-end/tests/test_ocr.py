@@ -1,5 +1,6 @@
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from app.services import ocr_service
 from fastapi import status
 
@@ -18,7 +19,7 @@ def test_ocr_pipeline_success(mock_ia, mock_docling):
     assert "GLICOSE" in result["exames"]
 
 # Teste de fallback de CPF via regex
-@patch("app.services.ocr_service.processar_arquivo_docling", return_value="Paciente: Fulano CPF: 111.222.333-44\n## HEMOGRAMA")
+@patch("app.services.ocr_service.processar_arquivo_docling", return_value="Paciente: Fulano CPF: 529.982.247-25\n## HEMOGRAMA")
 @patch("app.services.ocr_service.extrair_info_ia", return_value={"cpf": None, "exames": ["HEMOGRAMA"]})
 def test_ocr_pipeline_fallback_cpf(mock_ia, mock_docling):
     class DummyFile:
@@ -27,9 +28,68 @@ def test_ocr_pipeline_fallback_cpf(mock_ia, mock_docling):
             with open(path, "w") as f:
                 f.write("dummy")
     result = ocr_service.ocr_pipeline(DummyFile(), salvar_markdown=False)
-    assert result["cpf"] == "11122233344"
+    assert result["cpf"] == "52998224725"
     assert "HEMOGRAMA" in result["exames"]
 
+# Teste unitário: validação dos dígitos verificadores do CPF
+def test_validar_cpf():
+    assert ocr_service.validar_cpf("67495788372")
+    assert not ocr_service.validar_cpf("67495788373")
+    assert not ocr_service.validar_cpf("11111111111")
+    assert not ocr_service.validar_cpf("1234567890")
+
+# Teste unitário: ranqueamento de candidatos a CPF
+def test_extrair_cpfs_candidatos_ranqueia_por_contexto():
+    markdown = (
+        "Laboratório CNPJ 529.982.247-25\n"
+        "Pedido 111.222.333-44\n"
+        "Paciente: ANA PAULA CPF: 956 593 663 68\n"
+        "Médico CE/67495788372\n"
+    )
+    candidatos = ocr_service.extrair_cpfs_candidatos(markdown)
+    assert candidatos[0] == "67495788372"
+    assert candidatos[1] == "95659366368"
+    assert "11122233344" not in candidatos  # dígitos verificadores inválidos
+    assert candidatos[-1] == "52998224725"
+    assert ocr_service.extrair_cpf_regex(markdown) == "67495788372"
+
+# Teste unitário: extração estruturada única e cacheada por documento
+def test_extracao_estruturada_reaproveita_cache():
+    resposta = MagicMock()
+    resposta.choices[0].message.content = (
+        '{"exames": ["HEMOGRAMA"], "cpf": "67495788372", '
+        '"cpfs": ["674.957.883-72", "95659366368"], "nome_paciente": "ANA PAULA"}'
+    )
+    markdown = "## HEMOGRAMA\nCE/67495788372 - documento de teste de cache"
+    with patch("app.core.llm.chat_completion", new=AsyncMock(return_value=resposta)) as mock_create:
+        exames = asyncio.run(ocr_service.extrair_exames_ia(markdown))
+        cpf = asyncio.run(ocr_service.extrair_cpf_ia(markdown))
+        cpfs = asyncio.run(ocr_service.extrair_todos_cpfs_ia(markdown, exclude_cpf="67495788372"))
+    assert exames["exames"] == ["HEMOGRAMA"]
+    assert cpf == "67495788372"
+    assert cpfs == ["95659366368"]
+    mock_create.assert_called_once()
+
+# Teste unitário: extrações simultâneas do mesmo documento fazem uma única chamada ao LLM
+def test_extracao_estruturada_concorrente_compartilha_a_chamada():
+    resposta = MagicMock()
+    resposta.choices[0].message.content = '{"exames": ["GLICOSE"], "cpf": null, "cpfs": [], "nome_paciente": null}'
+
+    async def chat_completion(**kwargs):
+        await asyncio.sleep(0.05)
+        return resposta
+
+    async def cenario():
+        return await asyncio.gather(*[
+            ocr_service.extrair_dados_documento_ia("## GLICOSE\ndocumento reenviado em paralelo") for _ in range(3)
+        ])
+
+    with patch("app.core.llm.chat_completion", new=AsyncMock(side_effect=chat_completion)) as mock_create:
+        resultados = asyncio.run(cenario())
+    assert all(r["exames"] == ["GLICOSE"] for r in resultados)
+    mock_create.assert_called_once()
+    assert ocr_service._extracoes_em_andamento == {}
+
 # Teste de integração da rota OCR
 @patch("app.services.ocr_service.ocr_pipeline", return_value={"cpf": "12345678900", "exames": ["HEMOGRAMA"]})
 def test_ocr_route(mock_pipeline, client):
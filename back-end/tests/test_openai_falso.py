@@ -0,0 +1,82 @@
+import json
+import asyncio
+
+import numpy as np
+
+from app.core import llm
+from tests.stubs import openai_falso
+
+def test_openai_falso_responde_pelo_sdk_de_forma_deterministica(monkeypatch):
+    openai_falso.configurar(latencia_chat=0.01, dimensao=16)
+
+    async def executar():
+        monkeypatch.setattr(llm, "client", openai_falso.criar_cliente())
+        extracao = await llm.chat_completion(
+            operacao="teste_extracao", model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "Paciente: FULANO DE TAL\nCPF 529.982.247-25\nHEMOGRAMA COMPLETO e CREATININA"}],
+            response_format={"type": "json_schema", "json_schema": {"name": "extracao_documento"}}
+        )
+        comparacao = await llm.chat_completion(
+            operacao="teste_comparacao", model="gpt-4o-mini",
+            messages=[{"role": "user", "content": '- Exames Obrigatórios: ["CREATININA", "AUDIOMETRIA"]\n- Exames Recebidos: ["Creatinina"]\n'}],
+            response_format={"type": "json_object"}
+        )
+        vetores = [
+            await llm.criar_embeddings(operacao="teste_embedding", model="text-embedding-3-large", input=["hemograma", "glicose"])
+            for _ in range(2)
+        ]
+        return extracao, comparacao, vetores
+
+    extracao, comparacao, vetores = asyncio.run(executar())
+    dados = json.loads(extracao.choices[0].message.content)
+    assert dados["cpf"] == "52998224725" and dados["exames"] == ["HEMOGRAMA COMPLETO", "CREATININA"]
+    assert dados["nome_paciente"] == "FULANO DE TAL" and extracao.usage.prompt_tokens > 0
+    status = {item["exame"]: item["status"] for item in json.loads(comparacao.choices[0].message.content)["exames"]}
+    assert status == {"CREATININA": "encontrado", "AUDIOMETRIA": "faltante"}
+    primeiro, segundo = ([np.array(d.embedding) for d in v.data] for v in vetores)
+    assert len(primeiro[0]) == 16 and np.allclose(primeiro[0], segundo[0]) and not np.allclose(primeiro[0], primeiro[1])
+    assert openai_falso.contadores["chat"] == 2 and openai_falso.contadores["textos_embedding"] == 4
+
+def test_stream_mede_span_e_tokens_na_leitura_inteira(tmp_path, monkeypatch):
+    from app.core import metricas, rastreamento
+    exportador = rastreamento.ExportadorJSONL(str(tmp_path / "spans.jsonl"), 1024 * 1024, 2)
+    monkeypatch.setattr(rastreamento, "_exportador", exportador)
+    openai_falso.configurar(tokens_resposta=12, desvio_tokens=0)
+
+    async def ler(operacao):
+        stream = await llm.chat_completion(
+            operacao=operacao, model="gpt-4o-mini", messages=[{"role": "user", "content": "Como agendar?"}],
+            temperature=0.7, stream=True, stream_options={"include_usage": True}
+        )
+        antes = metricas.DURACAO_LLM.contagem(tipo="chat", operacao=operacao)
+        trechos = []
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    trechos.append(chunk.choices[0].delta.content)
+        except Exception as e:
+            trechos.append(type(e).__name__)
+        return antes, trechos
+
+    async def executar():
+        monkeypatch.setattr(llm, "client", openai_falso.criar_cliente())
+        with rastreamento.span("raiz") as raiz:
+            completo = await ler("teste_stream")
+            monkeypatch.setitem(openai_falso.config, "falha_stream_apos", 3)
+            interrompido = await ler("teste_stream_falho")
+        return raiz.trace_id, completo, interrompido
+
+    trace_id, (antes, trechos), (antes_falho, trechos_falhos) = asyncio.run(executar())
+    exportador.descarregar()
+    spans = {s["nome"]: s for s in rastreamento.ler_spans(str(tmp_path / "spans.jsonl"), trace_id)}
+    exportador._ouvinte.stop()
+
+    # Nada é medido ao criar o stream; a duração e os tokens fecham com o último trecho
+    assert antes == 0 and metricas.DURACAO_LLM.contagem(tipo="chat", operacao="teste_stream") == 1
+    assert len(trechos) == 12 and metricas.TOKENS_LLM.valor(operacao="teste_stream", tipo="completion") > 0
+    assert spans["llm.teste_stream"]["atributos"]["tokens_completion"] > 0
+    assert spans["llm.teste_stream"]["fim_ns"] <= spans["raiz"]["fim_ns"]
+    # Erro no meio da leitura: trechos anteriores entregues, span marcado com falha e duração registrada
+    assert antes_falho == 0 and trechos_falhos[:3] == trechos[:3] and trechos_falhos[3] == "APIError"
+    assert spans["llm.teste_stream_falho"]["status"]["code"] == rastreamento.STATUS_ERRO
+    assert metricas.DURACAO_LLM.contagem(tipo="chat", operacao="teste_stream_falho") == 1
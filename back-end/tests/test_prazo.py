@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from app.core import prazo
+
+def test_limitar_sem_prazo_definido_mantem_o_timeout():
+    async def executar():
+        return prazo.limitar(30), prazo.limitar(None), prazo.esgotado()
+    assert asyncio.run(executar()) == (30, None, False)
+
+def test_limitar_usa_o_prazo_restante_e_propaga_para_tarefas():
+    async def executar():
+        orcamento = prazo.iniciar(0.2)
+        assert prazo.limitar(30) <= 0.2
+        assert prazo.limitar(0.05) == 0.05
+        # Tarefas criadas na requisição enxergam o mesmo prazo
+        async def ler_na_tarefa():
+            return prazo.limitar(None)
+        restante_na_tarefa = await asyncio.create_task(ler_na_tarefa())
+        assert 0 < restante_na_tarefa <= 0.2
+        await asyncio.sleep(0.21)
+        return orcamento
+    orcamento = asyncio.run(executar())
+    assert orcamento.esgotado() and orcamento.restante() == 0.0
+
+def test_marcar_registra_consumo_por_etapa():
+    orcamento = prazo.Orcamento(10)
+    time.sleep(0.02)
+    orcamento.marcar("ocr")
+    orcamento.marcar("brmed")
+    orcamento.marcar("ocr")
+    resumo = orcamento.resumo()
+    assert set(resumo["etapas"]) == {"ocr", "brmed"}
+    assert resumo["etapas"]["ocr"] >= 0.02
+    assert resumo["prazo_segundos"] == 10 and 0 < resumo["restante_segundos"] <= 10
+
+def test_embedding_com_prazo_esgotado_nao_tenta_de_novo(monkeypatch):
+    from tenacity import RetryError
+    from app.services import validacao_service
+    chamadas = []
+
+    async def gerar_embedding(texto, modelo, operacao=None):
+        chamadas.append(texto)
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(validacao_service.lotes, "gerar_embedding", gerar_embedding)
+
+    async def executar():
+        prazo.iniciar(0.0)
+        inicio = time.monotonic()
+        try:
+            await validacao_service.gerar_embedding("HEMOGRAMA")
+        except RetryError:
+            pass
+        return time.monotonic() - inicio
+
+    assert asyncio.run(executar()) < 0.5
+    assert chamadas == ["HEMOGRAMA"]
@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+from app.core.cache_respostas import CacheRespostas
+from app.services import brmed_service, prefetch_brmed
+
+class _PlaywrightFalso:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+class _NavegadorFalso:
+    async def close(self):
+        pass
+
+def _preparar(monkeypatch, tmp_path, consultas: list):
+    monkeypatch.setattr(brmed_service, "cache_guias", CacheRespostas(str(tmp_path), 3600, 100, 10 ** 6))
+    monkeypatch.setattr(brmed_service.settings, "BRMED_PREFETCH_CONTEXTOS", 2)
+    monkeypatch.setattr(brmed_service.settings, "BRMED_PREFETCH_INTERVALO", 0.05)
+    monkeypatch.setattr(prefetch_brmed, "async_playwright", _PlaywrightFalso)
+
+    async def abrir_navegador(p):
+        return _NavegadorFalso()
+
+    async def consultar_sem_cache(cpf, enxuto, browser=None, sessao=None):
+        consultas.append((cpf, time.monotonic(), browser))
+        if cpf == "11111111111":
+            return {"erro": "Paciente não encontrado"}
+        return {"nome": "FULANO", "exames": ["HEMOGRAMA"]}
+
+    monkeypatch.setattr(brmed_service, "abrir_navegador", abrir_navegador)
+    monkeypatch.setattr(brmed_service, "_consultar_exames_navegador", consultar_sem_cache)
+    monkeypatch.setattr(brmed_service.settings, "BRMED_MODO", "enxuto")
+
+def test_prefetch_preenche_o_cache_e_registra_erros_por_cpf(monkeypatch, tmp_path):
+    consultas = []
+    _preparar(monkeypatch, tmp_path, consultas)
+    estado = asyncio.run(prefetch_brmed.executar_prefetch(["529.982.247-25", "11111111111", "52998224725"]))
+
+    assert estado["status"] == "concluido"
+    assert estado["total"] == 2 and estado["concluidos"] == 2 and estado["sucesso"] == 1
+    assert set(estado["erros"]) == {"11111111111"}
+    # Um único navegador compartilhado e intervalo mínimo entre consultas
+    assert len({id(browser) for _, _, browser in consultas}) == 1
+    inicios = sorted(instante for _, instante, _ in consultas)
+    assert inicios[1] - inicios[0] >= 0.045
+
+    resultado = asyncio.run(brmed_service.consultar_exames_brmed("52998224725"))
+    assert resultado["origem"] == "cache" and resultado["exames"] == ["HEMOGRAMA"]
+    assert len(consultas) == 2
+
+def test_prefetch_pula_cpfs_ja_em_cache(monkeypatch, tmp_path):
+    consultas = []
+    _preparar(monkeypatch, tmp_path, consultas)
+    asyncio.run(prefetch_brmed.executar_prefetch(["52998224725"]))
+    estado = asyncio.run(prefetch_brmed.executar_prefetch(["52998224725"]))
+    assert estado["em_cache"] == 1 and estado["sucesso"] == 0
+    assert len(consultas) == 1
+
+GUIA = (
+    "Nome / Name: FULANO DE TAL\tIdentidade / ID Number:\n4. Exames / Exams:\n"
+    "CREATININA / CREATININE\nObrigatório * / Mandatory *"
+)
+
+class _PaginaPortal:
+    """Página do Playwright que percorre o portal sem rede: sempre encontra o paciente e a guia."""
+    url = "http://portal/operacoes/"
+
+    async def _nada(self, *args, **kwargs):
+        pass
+
+    goto = fill = click = reload = type = wait_for_selector = wait_for_load_state = wait_for_timeout = _nada
+    wait_for_function = scroll_into_view_if_needed = close = _nada
+
+    async def evaluate(self, script, *args):
+        return GUIA if "innerText" in script else None
+
+    async def query_selector(self, seletor):
+        return object()
+
+    def locator(self, seletor):
+        return self
+
+    def expect_navigation(self, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+class _EsperaPagina:
+    def __init__(self):
+        self.value = asyncio.sleep(0, result=_PaginaPortal())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+class _ContextoPortal:
+    def __init__(self, navegador):
+        self.navegador = navegador
+
+    def set_default_timeout(self, timeout):
+        pass
+
+    async def route(self, *args):
+        pass
+
+    async def new_page(self):
+        return _PaginaPortal()
+
+    def expect_page(self):
+        return _EsperaPagina()
+
+    async def close(self):
+        self.navegador.fechados += 1
+
+class _NavegadorPortal(_NavegadorFalso):
+    def __init__(self):
+        self.contextos = self.fechados = 0
+
+    async def new_context(self, **kwargs):
+        self.contextos += 1
+        return _ContextoPortal(self)
+
+def test_prefetch_faz_um_login_por_worker_e_nao_por_cpf(monkeypatch, tmp_path):
+    consultar_real = brmed_service._consultar_exames_navegador
+    _preparar(monkeypatch, tmp_path, [])
+    navegador = _NavegadorPortal()
+
+    async def abrir_navegador(p):
+        return navegador
+
+    async def consultar_navegador(cpf, enxuto, browser=None, sessao=None):
+        sessoes.add(id(sessao))
+        return await consultar_real(cpf, enxuto, browser, sessao)
+
+    sessoes = set()
+    monkeypatch.setattr(brmed_service, "abrir_navegador", abrir_navegador)
+    monkeypatch.setattr(brmed_service, "_consultar_exames_navegador", consultar_navegador)
+    monkeypatch.setattr(brmed_service.armazem_artefatos, "salvar", lambda *args, **kwargs: None)
+    monkeypatch.setattr(brmed_service.settings, "BRMED_PREFETCH_INTERVALO", 0.0)
+    monkeypatch.setattr(brmed_service.settings, "BRMED_DISJUNTOR_HABILITADO", False)
+
+    cpfs = [f"{n:011d}" for n in range(1, 6)]
+    estado = asyncio.run(prefetch_brmed.executar_prefetch(cpfs))
+
+    assert estado["sucesso"] == 5 and estado["erros"] == {}
+    # Dois workers: dois contextos autenticados reaproveitados pelos cinco CPFs, fechados ao final
+    assert len(sessoes) == 2 and navegador.contextos == 2 and navegador.fechados == 2
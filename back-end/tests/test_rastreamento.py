@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import rastreamento
+
+@pytest.fixture
+def arquivo_spans(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "spans.jsonl")
+    exportador = rastreamento.ExportadorJSONL(caminho, 1024 * 1024, 2)
+    monkeypatch.setattr(rastreamento, "_exportador", exportador)
+    yield caminho
+    exportador._ouvinte.stop()
+
+def test_spans_aninhados_compartilham_o_trace_e_apontam_o_pai(arquivo_spans):
+    async def etapa():
+        with rastreamento.span("filho", paginas=3) as filho:
+            filho.definir(cache_acerto=True)
+
+    async def executar():
+        with rastreamento.span("raiz") as raiz:
+            await asyncio.gather(etapa(), etapa())
+        return raiz.trace_id
+
+    trace_id = asyncio.run(executar())
+    rastreamento.descarregar()
+    spans = rastreamento.ler_spans(arquivo_spans, trace_id)
+    raiz = next(s for s in spans if s["nome"] == "raiz")
+    filhos = [s for s in spans if s["nome"] == "filho"]
+    assert len(trace_id) == 32 and raiz["pai_id"] is None
+    assert len(filhos) == 2 and all(s["pai_id"] == raiz["span_id"] for s in filhos)
+    assert filhos[0]["atributos"] == {"paginas": 3, "cache_acerto": True}
+    assert all(raiz["inicio_ns"] <= s["inicio_ns"] and s["fim_ns"] <= raiz["fim_ns"] for s in filhos)
+    assert rastreamento.trace_id_atual() is None
+
+def test_excecao_marca_o_span_com_erro_e_decorator_rastreia_funcoes(arquivo_spans):
+    @rastreamento.rastrear("etapa.sincrona")
+    def falhar():
+        raise ValueError("portal fora do ar")
+
+    with pytest.raises(ValueError):
+        with rastreamento.span("raiz", traceparent="00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"):
+            falhar()
+    rastreamento.descarregar()
+    spans = rastreamento.ler_spans(arquivo_spans, "0af7651916cd43dd8448eb211c80319c")
+    assert [s["nome"] for s in spans] == ["raiz", "etapa.sincrona"]
+    assert spans[0]["pai_id"] == "b7ad6b7169203331"
+    assert spans[1]["status"]["code"] == rastreamento.STATUS_ERRO
+    assert "portal fora do ar" in spans[1]["status"]["message"]
+
+def test_middleware_devolve_o_trace_id_e_registra_a_requisicao(arquivo_spans):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        with rastreamento.span("etapa"):
+            return {"trace_id": rastreamento.trace_id_atual()}
+
+    app.add_middleware(rastreamento.MiddlewareRastreamento)
+    resposta = TestClient(app).get("/ping")
+    trace_id = resposta.headers["x-trace-id"]
+    assert resposta.json()["trace_id"] == trace_id
+
+    rastreamento.descarregar()
+    spans = rastreamento.ler_spans(arquivo_spans, trace_id)
+    assert [s["nome"] for s in spans] == ["GET /ping", "etapa"]
+    assert spans[0]["atributos"]["http.status_code"] == 200